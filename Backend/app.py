@@ -1,15 +1,48 @@
 import os
+import hmac
 import json
+import time
+import atexit
+import functools
+import base64
+import binascii
+import tempfile
 import numpy as np
+from io import BytesIO
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Request, request, jsonify, Response, g, make_response, stream_with_context, current_app
+from werkzeug.datastructures import FileStorage
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 from config import config, MODEL_DIR
 from models.deception_detector import DeceptionDetector
+from models.result_cache import ResultCache, make_cache_key
+from models.history_store import HistoryStore, utc_timestamp
+from models.profiler import RequestProfiler
+from models.upload_validation import UploadRejected, validate_image
+from models.metrics import (REGISTRY, CONTENT_TYPE, STAGE_SECONDS, REQUESTS, REQUEST_SECONDS, REQUESTS_IN_FLIGHT,
+                            ANALYSES_IN_FLIGHT, VERDICTS, IMAGE_BYTES)
+
+class UploadRequest(Request):
+    """
+    Request with bounded form parsing memory
+
+    Text fields are limited to MAX_FORM_MEMORY_SIZE bytes (a 413 beyond
+    that), and uploaded files are buffered in memory only up to
+    UPLOAD_SPOOL_SIZE bytes before moving to a temporary file.
+    """
+
+    @property
+    def max_form_memory_size(self):
+        return current_app.config['MAX_FORM_MEMORY_SIZE']
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=current_app.config['UPLOAD_SPOOL_SIZE'], mode='rb+')
 
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest
 
 # Get configuration based on environment
 env = os.getenv('FLASK_ENV', 'development')
@@ -19,23 +52,163 @@ app.config.from_object(config[env])
 CORS(app, origins=app.config['CORS_ORIGINS'].split(','))
 
 # Initialize deception detector
-detector = DeceptionDetector()
+detector = DeceptionDetector(
+    text_index_memory_mb=app.config['TEXT_INDEX_MEMORY_MB'],
+    image_workers=app.config['IMAGE_POOL_WORKERS'],
+    image_timeout=app.config['IMAGE_POOL_TIMEOUT'],
+    text_scoring=app.config['TEXT_SCORING'],
+    text_model_weight=app.config['TEXT_MODEL_WEIGHT'],
+    image_scoring=app.config['IMAGE_SCORING'],
+    image_model_weight=app.config['IMAGE_MODEL_WEIGHT'],
+    keep_versions=app.config['MODEL_KEEP_VERSIONS'],
+    max_image_pixels=app.config['MAX_IMAGE_PIXELS'],
+    cascade=app.config['CASCADE_SCORING']
+)
+
+# Load the models and exercise the analysis paths in the background; the
+# instance reports ready (GET /api/health/ready) once this finishes
+detector.start_warm_up()
+
+# Pick up newly exported text models without a restart
+detector.start_model_watcher(app.config['MODEL_WATCH_INTERVAL'])
+
+# Result cache in front of detector.analyze, keyed on content and detector version
+result_cache = ResultCache(
+    max_entries=app.config['RESULT_CACHE_SIZE'],
+    ttl=app.config['RESULT_CACHE_TTL']
+)
+
+# Analysis history, written to DATABASE_URL by a background thread
+analysis_history = HistoryStore(
+    app.config['DATABASE_URL'],
+    max_rows=app.config['HISTORY_MAX_ROWS'],
+    max_age_days=app.config['HISTORY_MAX_AGE_DAYS']
+)
+atexit.register(analysis_history.close)
 
-# Analysis history storage (in-memory for demo, replace with database)
-analysis_history = []
+# cProfile capture of live /api/analyze requests, armed on demand
+request_profiler = RequestProfiler(app.config['PROFILE_DIR'])
+
+# Latency histograms of the request handling stages around detector.analyze
+HANDLER_STAGES = {stage: STAGE_SECONDS.labels(stage)
+                  for stage in ('parse', 'validate', 'cache_key', 'history', 'serialize')}
+
+# ==================== METRICS ====================
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - g.metrics_start)
+    REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    if 'metrics_start' in g:
+        REQUESTS_IN_FLIGHT.dec()
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Request, verdict, image size and per-stage latency metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+def record_analysis(result, image_file=None):
+    """Count the verdict served and the size of the analyzed image"""
+    VERDICTS.labels(result['verdict']).inc()
+    if image_file is not None:
+        stream = image_file.stream
+        IMAGE_BYTES.observe(stream.seek(0, os.SEEK_END))
+        stream.seek(0)
 
 # ==================== HEALTH CHECK ====================
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """
+    Liveness check endpoint
+
+    Answers as soon as the process can serve requests, while models may
+    still be warming up; 'readiness' reports the warm-up state.
+    """
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'readiness': detector.readiness()
     }), 200
 
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness check endpoint: 503 until the warm-up pass has finished"""
+    readiness = detector.readiness()
+    return jsonify(readiness), 200 if readiness['ready'] else 503
+
+# ==================== PROFILING ====================
+def profiled(view):
+    """
+    Profile a view while request_profiler is armed, or for a request sent
+    with 'X-Profile: 1' when PROFILE_HEADER is enabled (not in production)
+
+    The capture's file name is returned in the X-Profile-Name header.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        forced = app.config['PROFILE_HEADER'] and request.headers.get('X-Profile') == '1'
+        session = request_profiler.begin(forced)
+        if session is None:
+            return view(*args, **kwargs)
+        with session:
+            response = make_response(view(*args, **kwargs))
+        if session.saved:
+            response.headers['X-Profile-Name'] = session.name
+        return response
+    return wrapper
+
+def admin_required(view):
+    """
+    Require 'Authorization: Bearer <ADMIN_TOKEN>'
+
+    Without an ADMIN_TOKEN configured the admin endpoints do not exist (404).
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config['ADMIN_TOKEN']
+        if not token:
+            return jsonify({'error': 'Endpoint not found'}), 404
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+            return jsonify({'error': 'Admin token required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/admin/profile', methods=['GET', 'POST', 'DELETE'])
+@admin_required
+def admin_profile():
+    """
+    Profile live /api/analyze requests
+
+    GET returns the profiler state and the most recent captures. POST
+    arms it, with a body of {"requests": N} (the next N requests) or
+    {"seconds": S} (every request for S seconds, one at a time). DELETE
+    disarms it. Captures are written to PROFILE_DIR as <name>.pstats and
+    <name>.collapsed.
+    """
+    if request.method == 'GET':
+        return jsonify(request_profiler.status()), 200
+    if request.method == 'DELETE':
+        return jsonify(request_profiler.disarm()), 200
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(request_profiler.arm(data.get('requests'), data.get('seconds'))), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 # ==================== ANALYSIS ENDPOINTS ====================
 @app.route('/api/analyze', methods=['POST'])
+@profiled
 def analyze():
     """
     Main analysis endpoint
@@ -54,58 +227,236 @@ def analyze():
         - imageScore: (int) Image analysis risk 0-100
         - trustScore: (int) Account trust 0-100
         - reasons: (array) Explanation of findings
+        - skippedStages: (array) With CASCADE_SCORING, the stages skipped
+          because they could not change the verdict (imageScore is then
+          absent and riskScoreRange gives the risk scores they allowed)
     """
     try:
-        # Get text content
-        text_content = request.form.get('text', '').strip()
+        with HANDLER_STAGES['parse'].time():
+            # Get text content (reading the form parses the upload)
+            text_content = request.form.get('text', '').strip()
+
+            # Get image if provided
+            image_file = None
+            if 'image' in request.files:
+                image_file = request.files['image']
+                if image_file.filename == '':
+                    image_file = None
+
+            # Get metadata selections
+            use_followers = request.form.get('followers') == 'true'
+            use_account_age = request.form.get('accountAge') == 'true'
+            use_engagement_rate = request.form.get('engagementRate') == 'true'
+
         if not text_content:
             return jsonify({'error': 'Text content is required'}), 400
 
-        # Get image if provided
-        image_file = None
-        if 'image' in request.files:
-            image_file = request.files['image']
-            if image_file.filename == '':
-                image_file = None
-
-        # Get metadata selections
-        use_followers = request.form.get('followers') == 'true'
-        use_account_age = request.form.get('accountAge') == 'true'
-        use_engagement_rate = request.form.get('engagementRate') == 'true'
-
-        # Run analysis
-        result = detector.analyze(
-            text=text_content,
-            image=image_file,
-            use_followers=use_followers,
-            use_account_age=use_account_age,
-            use_engagement_rate=use_engagement_rate
-        )
+        # Reject unsupported or oversized images from their header, before decoding
+        if image_file is not None:
+            with HANDLER_STAGES['validate'].time():
+                validate_upload(image_file)
+
+        # Run analysis (identical concurrent requests share one computation)
+        with HANDLER_STAGES['cache_key'].time():
+            cache_key = make_cache_key(
+                detector.version, text_content, image_file,
+                use_followers, use_account_age, use_engagement_rate
+            )
+        computed = []
+
+        def compute():
+            computed.append(True)
+            with ANALYSES_IN_FLIGHT.track():
+                return detector.analyze(
+                    text=text_content,
+                    image=image_file,
+                    use_followers=use_followers,
+                    use_account_age=use_account_age,
+                    use_engagement_rate=use_engagement_rate
+                )
+
+        result = result_cache.get_or_compute(cache_key, compute)
+        if not computed:
+            # Served from cache: still count the repost in its text cluster
+            detector.refresh_text_cluster(result, text_content)
+        record_analysis(result, image_file)
 
         # Store in history
-        history_entry = {
-            'timestamp': datetime.now().isoformat(),
-            'content_preview': text_content[:50] + '...' if len(text_content) > 50 else text_content,
-            'risk_score': result['riskScore'],
-            'status': result['verdict']
-        }
-        analysis_history.append(history_entry)
+        with HANDLER_STAGES['history'].time():
+            analysis_history.add(make_history_entry(text_content, result))
 
-        return jsonify(result), 200
+        with HANDLER_STAGES['serialize'].time():
+            response = jsonify(result)
+        return response, 200
 
+    except UploadRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Request too large'}), 413
     except Exception as e:
         print(f"Error during analysis: {str(e)}")
         return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
 
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Streaming batch analysis endpoint
+    
+    Request (application/x-ndjson body, or multipart/form-data with the
+    NDJSON in an 'items' field or file), one JSON object per line:
+        - text: (string) Social media content to analyze
+        - imageBase64: (string) Optional base64-encoded image
+        - imageRef: (string) Optional name of a multipart file field
+        - followers / accountAge / engagementRate: (boolean) Metadata flags
+        - id: (any) Optional client identifier echoed back
+    
+    Response (application/x-ndjson), one line per item in input order:
+        - index: (int) 0-based line number of the item in the request
+        - id: (any) Client identifier, if given
+        - the /api/analyze response fields, or error: (string)
+    
+    Items are read and analyzed in chunks of BATCH_CHUNK_SIZE, so memory
+    stays bounded regardless of how many items are sent.
+    """
+    files = {}
+    if request.mimetype == 'multipart/form-data':
+        # The streamed response outlives the request, which closes the
+        # uploads in request.files on teardown, so the form is parsed here
+        # and its uploads stay with the generator until the response closes
+        _, form, uploads = request.make_form_data_parser().parse_from_environ(request.environ)
+        files = uploads.to_dict()
+        if 'items' in files:
+            lines = files['items'].stream
+        else:
+            lines = BytesIO(form.get('items', '').encode('utf-8'))
+    else:
+        lines = request.stream
+
+    chunk_size = app.config['BATCH_CHUNK_SIZE']
+
+    def generate():
+        chunk = []
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            chunk.append((index, line))
+            if len(chunk) >= chunk_size:
+                yield from analyze_chunk(chunk, files)
+                chunk = []
+        if chunk:
+            yield from analyze_chunk(chunk, files)
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    for upload in files.values():
+        response.call_on_close(upload.close)
+    return response
+
+def analyze_chunk(chunk, files):
+    """Analyze one chunk of NDJSON lines and yield NDJSON result lines"""
+    outputs = {}
+    groups = {}
+    for index, line in chunk:
+        try:
+            item = json.loads(line)
+            text_content = str(item.get('text') or '').strip()
+            if not text_content:
+                raise ValueError('Text content is required')
+            flags = (item.get('followers') is True, item.get('accountAge') is True,
+                     item.get('engagementRate') is True)
+            image_file = load_batch_image(item, files)
+        except (ValueError, TypeError, AttributeError, binascii.Error) as e:
+            outputs[index] = {'index': index, 'error': str(e)}
+            continue
+        groups.setdefault(flags, []).append((index, item.get('id'), text_content, image_file))
+
+    # Items sharing the same metadata selection are scored in one batch
+    history_entries = {}
+    for flags, items in groups.items():
+        try:
+            with ANALYSES_IN_FLIGHT.track():
+                results = detector.analyze_batch(
+                    [text for _, _, text, _ in items],
+                    [image for _, _, _, image in items],
+                    *flags
+                )
+        except Exception as e:
+            print(f"Error during batch analysis: {str(e)}")
+            for index, _, _, _ in items:
+                outputs[index] = {'index': index, 'error': f'Analysis failed: {str(e)}'}
+            continue
+        for (index, item_id, text_content, image_file), result in zip(items, results):
+            record_analysis(result, image_file)
+            history_entries[index] = make_history_entry(text_content, result)
+            output = {'index': index}
+            if item_id is not None:
+                output['id'] = item_id
+            output.update(result)
+            outputs[index] = output
+
+    # Record history once per chunk, in input order
+    analysis_history.add_many(history_entries[index] for index in sorted(history_entries))
+
+    for index, _ in chunk:
+        yield json.dumps(outputs[index]) + '\n'
+
+def load_batch_image(item, files):
+    """Resolve an item's base64 or multipart image reference to a FileStorage"""
+    if item.get('imageBase64'):
+        data = base64.b64decode(item['imageBase64'], validate=True)
+        return validate_upload(FileStorage(stream=BytesIO(data), filename='upload'))
+    if item.get('imageRef'):
+        image_file = files.get(item['imageRef'])
+        if image_file is None or image_file.filename == '':
+            raise ValueError(f"Unknown imageRef: {item['imageRef']}")
+        image_file.stream.seek(0)
+        return validate_upload(image_file)
+    return None
+
+def validate_upload(image_file):
+    """Check an uploaded image's header against the upload limits (raises UploadRejected)"""
+    validate_image(image_file, app.config['ALLOWED_EXTENSIONS'], app.config['MAX_IMAGE_PIXELS'],
+                   app.config['MAX_IMAGE_FRAMES'])
+    return image_file
+
+def make_history_entry(text_content, result):
+    """Build the analysis history record for one analyzed post"""
+    return {
+        'timestamp': utc_timestamp(),
+        'content_preview': text_content[:50] + '...' if len(text_content) > 50 else text_content,
+        'risk_score': result['riskScore'],
+        'status': result['verdict']
+    }
+
 # ==================== HISTORY ENDPOINTS ====================
 @app.route('/api/analysis-history', methods=['GET'])
 def get_history():
-    """Get analysis history"""
+    """
+    Get analysis history, newest first
+
+    Query parameters:
+        - limit: (int) Page size, at most 1000
+        - before: (int) Return entries older than this id (nextBefore of
+          the previous page)
+        - status: (string) Only entries with this verdict
+        - since / until: (string) ISO timestamp range (UTC unless an
+          offset is given)
+    """
     try:
         limit = request.args.get('limit', default=10, type=int)
+        status = request.args.get('status')
+        history = analysis_history.query(
+            limit=limit,
+            status=status.upper() if status else None,
+            before=request.args.get('before', type=int),
+            since=request.args.get('since'),
+            until=request.args.get('until')
+        )
         return jsonify({
-            'history': list(reversed(analysis_history[-limit:]))
+            'history': history,
+            'nextBefore': history[-1]['id'] if history else None
         }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -113,28 +464,64 @@ def get_history():
 def clear_history():
     """Clear analysis history"""
     try:
-        global analysis_history
-        analysis_history = []
+        analysis_history.clear()
         return jsonify({'message': 'History cleared'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# ==================== CACHE ====================
+@app.route('/api/cache-stats', methods=['GET'])
+def cache_stats():
+    """Get result cache size and hit/miss counters"""
+    return jsonify(dict(
+        result_cache.stats(),
+        detector_version=detector.version,
+        text_index=detector.text_index.stats()
+    )), 200
+
 # ==================== MODEL STATUS ====================
 @app.route('/api/model-status', methods=['GET'])
 def model_status():
-    """Get model status and performance metrics"""
+    """Get the active model versions, kept versions and the last reload"""
     try:
-        return jsonify({
-            'text_model': detector.get_text_model_status(),
-            'image_model': detector.get_image_model_status(),
-            'ensemble': detector.get_ensemble_status(),
-            'last_trained': '2026-02-27',
-            'accuracy': {
-                'text': 0.88,
-                'image': 0.82,
-                'ensemble': 0.85
-            }
-        }), 200
+        return jsonify(detector.model_status()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/model/reload', methods=['POST'])
+@admin_required
+def reload_model():
+    """
+    Load and activate a text model without a restart
+
+    Body (optional): {"version": "<artifact version>"}; without a version
+    the artifact named by text_model.current is loaded. The model is
+    checked on canary texts before it replaces the active one.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(detector.reload_text_model(data.get('version'))), 200
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/model/rollback', methods=['POST'])
+@admin_required
+def rollback_model():
+    """
+    Reactivate a kept text model
+
+    Body (optional): {"version": "<kept version>"}; defaults to the model
+    that was active before the current one.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(detector.rollback_text_model(data.get('version'))), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -143,6 +530,10 @@ def model_status():
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def too_large(error):
+    return jsonify({'error': 'Request too large'}), 413
+
 @app.errorhandler(500)
 def server_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -0,0 +1,347 @@
+"""
+ASGI entry point for the deception detection API
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+POST /api/analyze is served natively. The upload body is awaited chunk by
+chunk without holding a thread. The text and image are then scored at the
+same time on a thread pool and fused when both finish, so a text+image
+request takes about as long as the slower of the two rather than their
+sum. All other routes are passed to the Flask app in app.py, so both
+entry points share one detector, result cache and history.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+import tempfile
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+
+import app as flask_module
+from app import (detector, result_cache, analysis_history, make_history_entry, record_analysis, validate_upload,
+                 HANDLER_STAGES)
+from models.upload_validation import UploadRejected
+from models.result_cache import make_cache_key
+from models.metrics import REQUESTS, REQUEST_SECONDS, REQUESTS_IN_FLIGHT, ANALYSES_IN_FLIGHT
+
+flask_app = flask_module.app
+
+# Request bodies larger than this are spooled to a temporary file
+SPOOL_SIZE = 1024 * 1024
+
+# Response chunks a Flask route may get ahead of the client by; the
+# thread iterating a streamed response waits while this many are unsent
+RESPONSE_QUEUE_CHUNKS = 4
+
+# Threads for analysis, form parsing and the Flask routes
+executor = ThreadPoolExecutor(max_workers=int(os.getenv('ASGI_THREADS', '16')))
+
+CORS_ORIGINS = set(flask_app.config['CORS_ORIGINS'].split(','))
+
+
+class ClientDisconnected(Exception):
+    """The client went away before sending the whole request body"""
+
+
+async def read_body(receive, limit):
+    """
+    Await the request body into a spooled temporary file
+
+    Returns:
+        file: Body rewound to the start, or None if it exceeds limit bytes
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            raise ClientDisconnected()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if limit is not None and size > limit:
+            body.close()
+            return None
+        body.write(chunk)
+        more_body = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+def upload_stream(total_content_length, content_type, filename=None, content_length=None):
+    """Buffer for an uploaded file in the form, spooled like the body"""
+    return tempfile.SpooledTemporaryFile(max_size=flask_app.config['UPLOAD_SPOOL_SIZE'], mode='rb+')
+
+
+def make_environ(scope, body):
+    """Build a WSGI environ for an ASGI HTTP request"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,  # The whole body is buffered, length header or not
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def get_header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value
+    return None
+
+
+async def send_json(scope, send, payload, status):
+    """Send a JSON response (with the CORS headers the Flask app would add)"""
+    body = json.dumps(payload).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    origin = get_header(scope, b'origin')
+    if origin is not None and ('*' in CORS_ORIGINS or origin.decode('latin-1') in CORS_ORIGINS):
+        headers += [(b'access-control-allow-origin', origin), (b'vary', b'Origin')]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def analyze(scope, receive, send):
+    """
+    POST /api/analyze with concurrent text and image scoring
+
+    Same request and response as the Flask endpoint in app.py.
+    """
+    loop = asyncio.get_running_loop()
+    body = await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+    if body is None:
+        await send_json(scope, send, {'error': 'File too large'}, 413)
+        return
+
+    files = None
+    try:
+        with HANDLER_STAGES['parse'].time():
+            _, form, files = await loop.run_in_executor(executor, functools.partial(
+                parse_form_data, make_environ(scope, body), stream_factory=upload_stream,
+                max_form_memory_size=flask_app.config['MAX_FORM_MEMORY_SIZE']))
+
+        # Get text content
+        text_content = form.get('text', '').strip()
+        if not text_content:
+            await send_json(scope, send, {'error': 'Text content is required'}, 400)
+            return
+
+        # Get image if provided
+        image_file = files.get('image')
+        if image_file is not None and image_file.filename == '':
+            image_file = None
+
+        # Get metadata selections
+        use_followers = form.get('followers') == 'true'
+        use_account_age = form.get('accountAge') == 'true'
+        use_engagement_rate = form.get('engagementRate') == 'true'
+
+        # Reject unsupported or oversized images from their header, before decoding
+        if image_file is not None:
+            with HANDLER_STAGES['validate'].time():
+                await loop.run_in_executor(executor, validate_upload, image_file)
+
+        # Hashing a large image is worth keeping off the event loop
+        with HANDLER_STAGES['cache_key'].time():
+            cache_key = await loop.run_in_executor(
+                executor, make_cache_key, detector.version, text_content, image_file,
+                use_followers, use_account_age, use_engagement_rate
+            )
+        computed = []
+
+        async def compute():
+            computed.append(True)
+            with ANALYSES_IN_FLIGHT.track():
+                # Text and image are scored at the same time and fused when both
+                # finish. Cascade scoring starts the image only once the text
+                # score shows that it could still change the verdict
+                text_task = loop.run_in_executor(executor, detector.score_text, text_content)
+                image_task = None
+                if image_file is not None and not detector.cascade:
+                    image_task = loop.run_in_executor(executor, detector.score_image_file, image_file)
+                text_score, cluster_size = await text_task
+                risk_range = None
+                if image_file is not None and detector.cascade:
+                    risk_range = detector.settled_risk_range(text_score, use_followers, use_account_age,
+                                                             use_engagement_rate)
+                    if risk_range is None:
+                        image_task = loop.run_in_executor(executor, detector.score_image_file, image_file)
+                image_score = await image_task if image_task is not None else None
+                return detector.combine_scores(
+                    text_content, text_score, cluster_size, image_score,
+                    use_followers, use_account_age, use_engagement_rate, risk_range=risk_range
+                )
+
+        result = await result_cache.get_or_compute_async(cache_key, compute)
+        if not computed:
+            # Served from cache: still count the repost in its text cluster
+            detector.refresh_text_cluster(result, text_content)
+        record_analysis(result, image_file)
+
+        # Store in history
+        with HANDLER_STAGES['history'].time():
+            analysis_history.add(make_history_entry(text_content, result))
+
+        await send_json(scope, send, result, 200)
+
+    except UploadRejected as e:
+        await send_json(scope, send, {'error': str(e)}, e.status)
+    except RequestEntityTooLarge:
+        await send_json(scope, send, {'error': 'Request too large'}, 413)
+    except Exception as e:
+        print(f"Error during analysis: {str(e)}")
+        await send_json(scope, send, {'error': f'Analysis failed: {str(e)}'}, 500)
+    finally:
+        if files is not None:
+            for upload in files.values():
+                upload.close()
+        body.close()
+
+
+async def call_flask(scope, receive, send):
+    """
+    Serve a request with the Flask app on the thread pool
+
+    The whole WSGI call, including iterating a streamed response, runs in
+    one executor thread (Flask's request context must stay on one thread);
+    chunks are handed back to the event loop through a bounded queue, so
+    a slow client holds up the thread rather than the whole response
+    piling up in memory.
+    """
+    loop = asyncio.get_running_loop()
+    body = await read_body(receive, flask_app.config['MAX_CONTENT_LENGTH'])
+    if body is None:
+        await send_json(scope, send, {'error': 'File too large'}, 413)
+        return
+    queue = asyncio.Queue(maxsize=RESPONSE_QUEUE_CHUNKS)
+    abandoned = threading.Event()
+
+    def put(item):
+        # Blocks the executor thread while the queue is full
+        if not abandoned.is_set():
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def start_response(status, headers, exc_info=None):
+        put({
+            'type': 'http.response.start',
+            'status': int(status.split(' ', 1)[0]),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+
+    def run():
+        try:
+            iterable = flask_app(make_environ(scope, body), start_response)
+            try:
+                for chunk in iterable:
+                    if abandoned.is_set():
+                        break
+                    if chunk:
+                        put(chunk)
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        finally:
+            body.close()
+            put(None)
+
+    task = loop.run_in_executor(executor, run)
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, dict):
+                await send(item)
+            else:
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+    except BaseException:
+        # The response cannot be sent: stop the thread and free its queue
+        # slot so a put it is blocked in returns
+        abandoned.set()
+        while not queue.empty():
+            queue.get_nowait()
+        raise
+    await task
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def observe_request(endpoint, handler, scope, receive, send):
+    """Run a native handler, recording the request metrics app.py records for Flask routes"""
+    statuses = []
+
+    async def send_observed(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+        await send(message)
+
+    start = time.perf_counter()
+    with REQUESTS_IN_FLIGHT.track():
+        try:
+            await handler(scope, receive, send_observed)
+        finally:
+            REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+            # 499: the client disconnected before a response was started
+            REQUESTS.labels(endpoint, scope['method'], statuses[0] if statuses else 499).inc()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            if detector.image_pool is not None:
+                detector.image_pool.shutdown()
+            executor.shutdown(wait=False)
+            analysis_history.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    try:
+        if scope['method'] == 'POST' and scope['path'] == '/api/analyze':
+            await observe_request('/api/analyze', analyze, scope, receive, send)
+        else:
+            await call_flask(scope, receive, send)
+    except ClientDisconnected:
+        pass
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for DeceptionDetector.analyze_batch
+
+Compares a Python loop over analyze() with analyze_batch() on text-only
+posts for increasing batch sizes.
+"""
+
+import sys
+import os
+import time
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.deception_detector import DeceptionDetector
+
+POSTS = [
+    "The server maintenance is scheduled for March 2nd, and services may be unavailable for one hour.",
+    "A recent study found that network latency improves by 12% after protocol optimization.",
+    "URGENT ALERT: Your BANK ACCOUNT is BLOCKED due to a CATASTROPHIC security breach!!! VERIFY IMMEDIATELY!!",
+    "Your tax refund is on hold. Enter your ATM PIN and CVV to release the payment instantly.",
+    "Congratulations! You're selected for an EXCLUSIVE offer. Click the link to receive your reward instantly!",
+    "🚨🚨 BREAKING NEWS 🚨🚨 You won't believe what they found!!! 😱😱",
+    "Your subscription will renew next month unless cancelled.",
+]
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+
+def items_per_second(func, count, repeat=3):
+    """Best-of-repeat processed items per second, after one warm-up call"""
+    func()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+
+def main():
+    print("=" * 80)
+    print("BATCH SCORING THROUGHPUT")
+    print("=" * 80)
+
+    detector = DeceptionDetector()
+    random.seed(42)
+
+    print(f"\n{'batch size':>10} | {'analyze loop':>14} | {'analyze_batch':>14} | {'speedup':>8}")
+    print("-" * 80)
+    for size in BATCH_SIZES:
+        texts = [random.choice(POSTS) for _ in range(size)]
+        loop_rate = items_per_second(lambda: [detector.analyze(t) for t in texts], size)
+        batch_rate = items_per_second(lambda: detector.analyze_batch(texts), size)
+        print(f"{size:>10} | {loop_rate:>10.0f} /s | {batch_rate:>10.0f} /s | {batch_rate / loop_rate:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
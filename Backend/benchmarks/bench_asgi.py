@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark for text+image request latency, WSGI versus ASGI
+
+Sends the same multipart POST /api/analyze requests (a long text and a
+12MP JPEG) to the Flask app and to the ASGI app in asgi.py, driven
+in-process, and reports p50/p99 latency. The Flask view scores image and
+text one after the other; the ASGI view scores them concurrently, so its
+latency should approach max(text, image) rather than the sum.
+"""
+
+import sys
+import os
+import glob
+import time
+import json
+import asyncio
+import numpy as np
+from io import BytesIO
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import EnvironBuilder
+import asgi
+from app import app, detector
+from models.deception_detector import NEAR_DUPLICATE_DISTANCE
+from models.image_hash_index import ImageHashIndex
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REQUESTS = 30
+TEXT = ("URGENT!!! Limited time offer, click here to claim your FREE prize 🎉 before midnight. "
+        "Scientists HATE this miracle trick, act now or regret it forever!!! ") * 2000
+
+
+def jpeg_12mp():
+    sample = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', 'real', '*')))[0]
+    buffer = BytesIO()
+    Image.open(sample).convert('RGB').resize((4000, 3000), Image.BICUBIC).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def multipart(text, image_bytes):
+    """Encoded multipart body and content type for an analyze request"""
+    builder = EnvironBuilder(method='POST', data={'text': text, 'image': (BytesIO(image_bytes), 'photo.jpg')})
+    environ = builder.get_environ()
+    return environ['wsgi.input'].read(), environ['CONTENT_TYPE']
+
+
+async def asgi_request(body, content_type):
+    """Drive one request through the ASGI app and return (status, json)"""
+    chunks = [body[i:i + 65536] for i in range(0, len(body), 65536)]
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+        'path': '/api/analyze', 'raw_path': b'/api/analyze', 'query_string': b'', 'root_path': '',
+        'headers': [(b'content-type', content_type.encode()), (b'content-length', str(len(body)).encode())],
+        'server': ('localhost', 5000), 'client': ('127.0.0.1', 50000),
+    }
+    await asgi.app(scope, receive, send)
+    return sent[0]['status'], json.loads(b''.join(m.get('body', b'') for m in sent[1:]))
+
+
+def fresh_request(i, image_bytes):
+    # Unique text and an emptied image index, so no cache or index short-circuits
+    detector.image_index = ImageHashIndex(max_distance=NEAR_DUPLICATE_DISTANCE)
+    return multipart(f"{TEXT} #{i}", image_bytes)
+
+
+def main():
+    image_bytes = jpeg_12mp()
+    client = app.test_client()
+
+    print("=" * 80)
+    print(f"TEXT+IMAGE LATENCY ({len(TEXT) // 1000} KB text, 12MP JPEG, {os.cpu_count()} CPUs)")
+    print("=" * 80)
+
+    # Per-modality cost, for reference
+    text_ms = []
+    image_ms = []
+    for i in range(5):
+        start = time.perf_counter()
+        detector.score_text(f"{TEXT} ~{i}")
+        text_ms.append((time.perf_counter() - start) * 1000)
+        detector.image_index = ImageHashIndex(max_distance=NEAR_DUPLICATE_DISTANCE)
+        start = time.perf_counter()
+        detector.score_image_file(FileStorage(stream=BytesIO(image_bytes), filename='photo.jpg'))
+        image_ms.append((time.perf_counter() - start) * 1000)
+    print(f"Text alone: {np.median(text_ms):.1f} ms   Image alone: {np.median(image_ms):.1f} ms")
+    print()
+
+    print(f"{'Entry point':<14} {'p50 (ms)':>10} {'p99 (ms)':>10}")
+    print("-" * 36)
+    wsgi_results, asgi_results = [], []
+    latencies = {'WSGI (Flask)': [], 'ASGI': []}
+    for i in range(REQUESTS):
+        body, content_type = fresh_request(i, image_bytes)
+        start = time.perf_counter()
+        response = client.post('/api/analyze', data=body, content_type=content_type)
+        latencies['WSGI (Flask)'].append((time.perf_counter() - start) * 1000)
+        wsgi_results.append(response.get_json())
+
+        body, content_type = fresh_request(REQUESTS + i, image_bytes)
+        start = time.perf_counter()
+        status, result = asyncio.run(asgi_request(body, content_type))
+        latencies['ASGI'].append((time.perf_counter() - start) * 1000)
+        asgi_results.append(result)
+
+    for label, values in latencies.items():
+        print(f"{label:<14} {np.percentile(values, 50):>10.1f} {np.percentile(values, 99):>10.1f}")
+
+    same = all(w['riskScore'] == a['riskScore'] and w['imageScore'] == a['imageScore']
+               for w, a in zip(wsgi_results, asgi_results))
+    print()
+    print(f"Same scores from both entry points: {same}")
+
+
+if __name__ == '__main__':
+    main()
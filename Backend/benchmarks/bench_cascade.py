@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark for cascaded early-exit scoring
+
+Analyzes a mix of posts that all carry a dataset image, with the texts of
+test_categorized.py (authentic, suspicious and deceptive in about equal
+parts) and metadata selected on a quarter of them, once with a full
+detector and once with a cascade detector. Reports the share of image
+decodes the cascade avoids (overall and by verdict), whether every
+verdict matches, and the latency of analyze() and analyze_batch().
+"""
+
+import sys
+import os
+import io
+import glob
+import time
+import random
+import shutil
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Both detectors start without a seeded image index
+MODEL_DIR = tempfile.mkdtemp(prefix='bench-cascade-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector, STAGES
+from test_categorized import test_statements
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+POSTS = 600
+METADATA_SHARE = 0.25
+BATCH_SIZE = 64
+
+
+def make_posts(rng):
+    """(text, image bytes, metadata flags) per post; every image is a different file"""
+    paths = rng.sample(sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*'))), POSTS)
+    posts = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        text = rng.choice(test_statements)[0]
+        flags = (True, True, True) if rng.random() < METADATA_SHARE else (False, False, False)
+        posts.append((text, data, flags))
+    return posts
+
+
+def upload(data):
+    return FileStorage(stream=io.BytesIO(data), filename='upload.jpg')
+
+
+def decoded_images():
+    return STAGES['image_decode'].snapshot()[0][-1]
+
+
+def run_single(detector, posts):
+    """Results, image decodes and per-post latencies of one analyze() call per post"""
+    decoded = decoded_images()
+    results, latencies = [], []
+    for text, data, flags in posts:
+        image = upload(data)
+        start = time.perf_counter()
+        results.append(detector.analyze(text, image, *flags))
+        latencies.append(time.perf_counter() - start)
+    return results, decoded_images() - decoded, np.array(latencies)
+
+
+def run_batches(detector, posts):
+    """Seconds per post of analyze_batch over chunks of BATCH_SIZE (one metadata selection per call)"""
+    elapsed = 0.0
+    for flags in {flags for _, _, flags in posts}:
+        selected = [(text, data) for text, data, post_flags in posts if post_flags == flags]
+        for i in range(0, len(selected), BATCH_SIZE):
+            chunk = selected[i:i + BATCH_SIZE]
+            images = [upload(data) for _, data in chunk]
+            start = time.perf_counter()
+            detector.analyze_batch([text for text, _ in chunk], images, *flags)
+            elapsed += time.perf_counter() - start
+    return elapsed / len(posts)
+
+
+def main():
+    print("=" * 80)
+    print("CASCADED EARLY-EXIT SCORING")
+    print("=" * 80)
+
+    posts = make_posts(random.Random(0))
+    full, cascade = DeceptionDetector(), DeceptionDetector(cascade=True)
+    full.warm_up()
+    cascade.warm_up()
+
+    full_results, full_decoded, full_latencies = run_single(full, posts)
+    cascade_results, cascade_decoded, cascade_latencies = run_single(cascade, posts)
+    mismatches = sum(a['verdict'] != b['verdict'] for a, b in zip(full_results, cascade_results))
+
+    print(f"\n{POSTS} posts with an image, {METADATA_SHARE:.0%} with metadata")
+    print(f"Image decodes: {full_decoded} full, {cascade_decoded} cascade "
+          f"({1 - cascade_decoded / full_decoded:.1%} avoided)")
+    print(f"Verdict mismatches: {mismatches}")
+
+    print(f"\n{'Verdict':<12} {'posts':>6} {'images skipped':>15}")
+    print("-" * 35)
+    for verdict in ('AUTHENTIC', 'SUSPICIOUS', 'DECEPTIVE'):
+        results = [result for result in cascade_results if result['verdict'] == verdict]
+        skipped = sum(result['skippedStages'] == ['image'] for result in results)
+        print(f"{verdict:<12} {len(results):>6} {skipped / max(len(results), 1):>15.1%}")
+
+    # Fresh detectors, so the text index state matches between the two runs
+    full_batch, cascade_batch = DeceptionDetector(), DeceptionDetector(cascade=True)
+    full_per_post, cascade_per_post = run_batches(full_batch, posts), run_batches(cascade_batch, posts)
+
+    print(f"\n{'Latency per post':<28} {'full':>10} {'cascade':>10} {'speedup':>8}")
+    print("-" * 60)
+    for name, full_value, cascade_value in [
+            ("analyze() median", np.median(full_latencies), np.median(cascade_latencies)),
+            ("analyze() mean", full_latencies.mean(), cascade_latencies.mean()),
+            (f"analyze_batch({BATCH_SIZE})", full_per_post, cascade_per_post)]:
+        print(f"{name:<28} {full_value * 1e3:>7.3f} ms {cascade_value * 1e3:>7.3f} ms "
+              f"{full_value / cascade_value:>7.2f}x")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
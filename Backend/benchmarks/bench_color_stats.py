@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the unique-colour count used by _analyze_image
+
+Compares a row-wise np.unique over all pixels with color_statistics, with
+and without the 50-colour early stop, on photo-like and flat images.
+"""
+
+import sys
+import os
+import glob
+import timeit
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from models.image_features import color_statistics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESOLUTIONS = [(640, 480), (2048, 1536), (4000, 3000)]
+
+
+def photo(size):
+    """Upscaled dataset image as an RGB array"""
+    sample = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', 'real', '*')))[0]
+    return np.asarray(Image.open(sample).convert('RGB').resize(size, Image.BICUBIC))
+
+
+def flat(size):
+    """Blocky image with a 20-colour palette"""
+    rs = np.random.RandomState(0)
+    palette = rs.randint(0, 256, (20, 3)).astype(np.uint8)
+    blocks = rs.randint(0, 20, (size[1] // 100 + 1, size[0] // 100 + 1))
+    return palette[np.kron(blocks, np.ones((100, 100), dtype=int))[:size[1], :size[0]]]
+
+
+def best_ms(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    print("=" * 80)
+    print("UNIQUE COLOUR COUNT")
+    print("=" * 80)
+    print(f"\n{'image':>16} | {'np.unique':>10} | {'exact':>10} | {'stop at 50':>10}")
+    print("-" * 80)
+    for size in RESOLUTIONS:
+        for name, make in (('photo', photo), ('flat', flat)):
+            img_array = make(size)
+            sort_ms = best_ms(lambda: np.unique(img_array.reshape(-1, 3), axis=0), repeat=1)
+            exact_ms = best_ms(lambda: color_statistics(img_array))
+            early_ms = best_ms(lambda: color_statistics(img_array, max_colors=50))
+            label = f"{name} {size[0]}x{size[1]}"
+            print(f"{label:>16} | {sort_ms:>7.1f} ms | {exact_ms:>7.1f} ms | {early_ms:>7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
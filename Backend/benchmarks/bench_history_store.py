@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the SQLite analysis history store
+
+Measures what a request pays to record history (a queue put, compared with
+a synchronous INSERT and COMMIT), the background writer's throughput, and
+query latency on a 10M-row history: the newest page, a page deep in the
+history, pages filtered by verdict and a time-range page. Finally trims the
+table with the retention policy and checks that refilling it reuses the
+freed pages instead of growing the file.
+
+Usage:
+    python benchmarks/bench_history_store.py [rows] [database_path]
+"""
+
+import sys
+import os
+import time
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.history_store import HistoryStore, utc_timestamp
+
+ROWS = 10000000
+LOAD_BLOCK = 200000
+REQUESTS = 20000
+QUERY_REPEATS = 200
+VERDICTS = ['AUTHENTIC', 'SUSPICIOUS', 'DECEPTIVE']
+START = datetime(2026, 1, 1)
+
+
+def make_entry(i):
+    score = (i * 37) % 100
+    return {
+        'timestamp': utc_timestamp(START + timedelta(seconds=i)),
+        'content_preview': f"Post number {i} about a limited offer, claim your reward before...",
+        'risk_score': score,
+        'status': VERDICTS[score * 3 // 100]
+    }
+
+
+def percentiles_us(samples):
+    samples = np.array(samples) * 1e6
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+def file_mb(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix)) / 2 ** 20
+
+
+def bulk_load(path, rows):
+    """Fill the table directly (much faster than queueing 10M entries)"""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA synchronous=OFF")
+    for block in range(0, rows, LOAD_BLOCK):
+        entries = [make_entry(i) for i in range(block, min(block + LOAD_BLOCK, rows))]
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO analysis_history (timestamp, content_preview, risk_score, status) VALUES (?, ?, ?, ?)",
+            [(e['timestamp'], e['content_preview'], e['risk_score'], e['status']) for e in entries]
+        )
+        conn.execute("COMMIT")
+    conn.close()
+
+
+def time_query(store, **kwargs):
+    samples = []
+    for _ in range(QUERY_REPEATS):
+        start = time.perf_counter()
+        store.query(**kwargs)
+        samples.append(time.perf_counter() - start)
+    return percentiles_us(samples)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    workdir = tempfile.mkdtemp(prefix='history-bench-')
+    path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(workdir, 'history.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    print("=" * 80)
+    print("ANALYSIS HISTORY STORE")
+    print("=" * 80)
+
+    # Request-path cost: queueing an entry vs writing it synchronously
+    store = HistoryStore(f"sqlite:///{path}", max_rows=None, queue_size=REQUESTS)
+    entries = [make_entry(i) for i in range(REQUESTS)]
+    samples = []
+    start_all = time.perf_counter()
+    for entry in entries:
+        start = time.perf_counter()
+        store.add(entry)
+        samples.append(time.perf_counter() - start)
+    store.flush()
+    writer_rate = REQUESTS / (time.perf_counter() - start_all)
+    queued_p50, queued_p99 = percentiles_us(samples)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    samples = []
+    for entry in entries[:2000]:
+        start = time.perf_counter()
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO analysis_history (timestamp, content_preview, risk_score, status) "
+                     "VALUES (?, ?, ?, ?)",
+                     (entry['timestamp'], entry['content_preview'], entry['risk_score'], entry['status']))
+        conn.execute("COMMIT")
+        samples.append(time.perf_counter() - start)
+    conn.execute("DELETE FROM analysis_history")
+    conn.close()
+    sync_p50, sync_p99 = percentiles_us(samples)
+
+    print(f"{'Request-side write':<40} {'p50 (us)':>12} {'p99 (us)':>12}")
+    print("-" * 66)
+    print(f"{'HistoryStore.add (queued)':<40} {queued_p50:>12.1f} {queued_p99:>12.1f}")
+    print(f"{'Synchronous INSERT + COMMIT':<40} {sync_p50:>12.1f} {sync_p99:>12.1f}")
+    print(f"Background writer throughput: {writer_rate:,.0f} entries/s "
+          f"({store.stats()['dropped']} dropped)")
+    print()
+
+    # Query latency on a large history
+    start = time.perf_counter()
+    bulk_load(path, rows)
+    print(f"Loaded {rows:,} rows in {time.perf_counter() - start:.1f}s ({file_mb(path):,.0f} MB on disk)")
+    print()
+
+    newest = rows
+    middle = rows // 2
+    since = utc_timestamp(START + timedelta(seconds=middle))
+    until = utc_timestamp(START + timedelta(seconds=middle + 3600))
+    queries = [
+        ('Newest page (limit 10)', dict(limit=10)),
+        ('Newest page (limit 100)', dict(limit=100)),
+        ('Page at the middle (before=id)', dict(limit=10, before=middle)),
+        ('Oldest page (before=id)', dict(limit=10, before=11)),
+        ('Newest DECEPTIVE page', dict(limit=10, status='DECEPTIVE')),
+        ('DECEPTIVE page at the middle', dict(limit=10, status='DECEPTIVE', before=middle)),
+        ('One-hour range at the middle', dict(limit=100, since=since, until=until)),
+    ]
+    print(f"{'Query':<40} {'p50 (us)':>12} {'p99 (us)':>12}")
+    print("-" * 66)
+    for label, kwargs in queries:
+        p50, p99 = time_query(store, **kwargs)
+        print(f"{label:<40} {p50:>12.1f} {p99:>12.1f}")
+    start = time.perf_counter()
+    count = store.count(status='DECEPTIVE')
+    print(f"{'Count DECEPTIVE (full index scan)':<40} {(time.perf_counter() - start) * 1e6:>12.1f}"
+          f"   ({count:,} rows)")
+    print()
+
+    # Retention: trim to 90% of the rows, then refill and check the file
+    keep = rows * 9 // 10
+    size_before = file_mb(path)
+    store.max_rows = keep
+    start = time.perf_counter()
+    deleted = store.apply_retention()
+    trim_seconds = time.perf_counter() - start
+    for block in range(newest, newest + rows - keep, store.queue_size):
+        store.add_many(make_entry(i) for i in range(block, min(block + store.queue_size, newest + rows - keep)))
+        store.flush()
+    store.apply_retention()
+    size_after = file_mb(path)
+    print(f"Retention trimmed {deleted:,} rows in {trim_seconds:.1f}s "
+          f"({deleted / max(trim_seconds, 1e-9):,.0f} rows/s); {store.count():,} rows kept")
+    print(f"Database file: {size_before:,.0f} MB before trim, {size_after:,.0f} MB after refilling")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
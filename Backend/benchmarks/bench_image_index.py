@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the perceptual-hash near-duplicate index
+
+Indexes the dataset images, then measures lookup latency and how often
+recompressed, rescaled and slightly cropped copies are found, plus the
+_analyze_image latency for a fresh image versus a near-duplicate.
+"""
+
+import sys
+import os
+import glob
+import timeit
+import numpy as np
+from io import BytesIO
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector, NEAR_DUPLICATE_DISTANCE
+from models.image_features import dhash
+from models.image_hash_index import ImageHashIndex
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_SIZE = 300
+
+
+def load(path):
+    return np.asarray(Image.open(path).convert('RGB'))
+
+
+def variants(img_array):
+    """Near-duplicate edits of an image, as RGB arrays"""
+    image = Image.fromarray(img_array)
+    width, height = image.size
+
+    def jpeg(img, quality):
+        buffer = BytesIO()
+        img.save(buffer, 'JPEG', quality=quality)
+        return np.asarray(Image.open(buffer).convert('RGB'))
+
+    dx, dy = max(width // 50, 1), max(height // 50, 1)
+    return {
+        'jpeg q50': jpeg(image, 50),
+        'rescale 50%': np.asarray(image.resize((width // 2, height // 2), Image.BICUBIC)),
+        'rescale 200%': np.asarray(image.resize((width * 2, height * 2), Image.BICUBIC)),
+        'crop 2%': np.asarray(image.crop((dx, dy, width - dx, height - dy))),
+    }
+
+
+def jpeg_bytes(img_array):
+    buffer = BytesIO()
+    Image.fromarray(img_array).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def upload(data):
+    return FileStorage(stream=BytesIO(data), filename='upload.jpg')
+
+
+def main():
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    rs = np.random.RandomState(0)
+
+    print("=" * 80)
+    print(f"IMAGE HASH INDEX (max distance {NEAR_DUPLICATE_DISTANCE})")
+    print("=" * 80)
+
+    index = ImageHashIndex(max_distance=NEAR_DUPLICATE_DISTANCE)
+    hashes = [dhash(load(path)) for path in paths]
+    for i, image_hash in enumerate(hashes):
+        index.add(image_hash, i)
+    print(f"Indexed {len(index)} distinct hashes from {len(paths)} images")
+
+    # Lookup latency: stored hashes with a few flipped bits, and random hashes
+    near = [h ^ (1 << int(rs.randint(64))) ^ (1 << int(rs.randint(64))) for h in hashes[:1000]]
+    random_hashes = [int(x) for x in rs.randint(0, 2 ** 63, 1000, dtype=np.int64)]
+    for label, queries in (('near-duplicate', near), ('unrelated', random_hashes)):
+        seconds = min(timeit.repeat(lambda: [index.find(q) for q in queries], number=1, repeat=5))
+        found = sum(index.find(q) is not None for q in queries)
+        print(f"{label:<16} lookup: {seconds / len(queries) * 1e6:7.1f} us   found {found}/{len(queries)}")
+
+    # Recall on edited copies of a sample of dataset images
+    print()
+    print(f"{'Edit':<14} {'Found':>8} {'Mean distance':>15}")
+    print("-" * 40)
+    sample = rs.choice(len(paths), SAMPLE_SIZE, replace=False)
+    distances = {}
+    for i in sample:
+        for name, edited in variants(load(paths[i])).items():
+            distances.setdefault(name, []).append((dhash(edited) ^ hashes[i]).bit_count())
+    for name, values in distances.items():
+        values = np.array(values)
+        found = np.mean(values <= NEAR_DUPLICATE_DISTANCE)
+        print(f"{name:<14} {found:>7.0%} {values.mean():>15.2f}")
+
+    # End-to-end _analyze_image latency, fresh image versus near-duplicate
+    print()
+    detector = DeceptionDetector()
+    photo = np.asarray(Image.open(paths[0]).convert('RGB').resize((4000, 3000), Image.BICUBIC))
+    original = jpeg_bytes(photo)
+    duplicate = jpeg_bytes(variants(photo)['jpeg q50'])
+
+    def fresh(data):
+        detector.image_index = ImageHashIndex(max_distance=NEAR_DUPLICATE_DISTANCE)
+        return detector._analyze_image(upload(data))
+
+    fresh_ms = min(timeit.repeat(lambda: fresh(original), number=1, repeat=3)) * 1000
+    fresh_duplicate_score = fresh(duplicate)
+    score = fresh(original)
+    reuse_ms = min(timeit.repeat(lambda: detector._analyze_image(upload(duplicate)), number=1, repeat=3)) * 1000
+    print(f"_analyze_image 12MP fresh:          {fresh_ms:8.1f} ms")
+    print(f"_analyze_image 12MP near-duplicate: {reuse_ms:8.1f} ms")
+    print(f"Near-duplicate scored fresh: {fresh_duplicate_score}, reused: {detector._analyze_image(upload(duplicate))} "
+          f"(original: {score})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Benchmark for image model inference
+
+Splits the per-image cost of image model scoring on dataset images into
+decoding (what score_image already pays for the rule score), computing the
+model features from the decoded image, and classifying the feature rows:
+one image at a time, as /api/analyze does, and in batches of 64, as
+/api/analyze-batch does. Uses models/image_model.npz when present,
+otherwise fits a model on the sampled images.
+
+Usage:
+    python benchmarks/bench_image_model.py
+"""
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+from config import MODEL_DIR
+from build_image_index import DEFAULT_DIRS, iter_images
+from models.deception_detector import IMAGE_DECODE_SIZE
+from models.image_features import model_features
+from models.image_model import ImageModel, IMAGE_MODEL_FILE
+
+SAMPLE = 200
+BATCH = 64
+
+
+def decode(path):
+    """Decode as score_image does"""
+    with Image.open(path) as image:
+        size = image.size
+        image.draft('RGB', IMAGE_DECODE_SIZE)
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        rgb.load()
+    return rgb, size
+
+
+def load_or_fit(paths, features):
+    path = os.path.join(MODEL_DIR, IMAGE_MODEL_FILE)
+    if os.path.exists(path):
+        return ImageModel.load(path), 'models/image_model.npz'
+    labels = np.array([os.path.basename(os.path.dirname(p)) == 'fake' for p in paths], dtype=int)
+    scaler = StandardScaler().fit(features)
+    classifier = LogisticRegression(max_iter=2000).fit(scaler.transform(features), labels)
+    return ImageModel.from_sklearn(scaler, classifier), 'model fitted on the sample'
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    paths = list(iter_images(DEFAULT_DIRS))
+    if not paths:
+        print("No dataset images found")
+        sys.exit(1)
+    paths = paths[::max(len(paths) // SAMPLE, 1)][:SAMPLE]
+
+    decode_seconds, feature_seconds, rows = [], [], []
+    for path in paths:
+        start = time.perf_counter()
+        rgb, (width, height) = decode(path)
+        decoded = time.perf_counter()
+        rows.append(model_features(rgb, width, height, os.path.getsize(path)))
+        decode_seconds.append(decoded - start)
+        feature_seconds.append(time.perf_counter() - decoded)
+    features = np.array(rows)
+    model, source = load_or_fit(paths, features)
+
+    single = best_of(lambda: [model.predict_proba(row) for row in features[:BATCH]], 20) / BATCH
+    batch = best_of(lambda: model.predict_proba(features[:BATCH]), 200) / BATCH
+
+    decode_ms = np.median(decode_seconds) * 1000
+    print("=" * 80)
+    print("IMAGE MODEL INFERENCE")
+    print("=" * 80)
+    print(f"Model: {source}; {len(paths)} dataset images, {features.shape[1]} features")
+    print()
+    print(f"{'Per image':<36} {'median (ms)':>12} {'vs decode':>10}")
+    print("-" * 60)
+    for label, ms in (("Decode (draft-reduced)", decode_ms),
+                      ("Model features", np.median(feature_seconds) * 1000),
+                      ("Classify, one image at a time", single * 1000),
+                      (f"Classify, batch of {BATCH}", batch * 1000)):
+        print(f"{label:<36} {ms:>12.4f} {ms / decode_ms:>9.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark for text-only request latency while large images are analyzed
+
+One thread keeps analyzing a large PNG (PNG has no reduced-scale decode)
+while the main thread times text-only analyze() calls on the same
+detector, with images scored inline and in an image pool. Inline, the
+image work holds the GIL and the text requests queue behind it.
+
+Usage:
+    python benchmarks/bench_image_pool.py [workers]
+"""
+
+import sys
+import os
+import glob
+import time
+import threading
+import numpy as np
+from io import BytesIO
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector, NEAR_DUPLICATE_DISTANCE
+from models.image_hash_index import ImageHashIndex
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DURATION = 5.0
+TEXT = "URGENT!!! Your account will be suspended, click here http://verify.xyz to claim your reward 🚨"
+
+
+def large_png():
+    sample = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', 'real', '*')))[0]
+    rs = np.random.RandomState(0)
+    pixels = np.asarray(Image.open(sample).convert('RGB').resize((4000, 3000), Image.BICUBIC)).astype(np.int16)
+    noisy = np.clip(pixels + rs.randint(-8, 9, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = BytesIO()
+    Image.fromarray(noisy).save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def run(detector, image_bytes):
+    """Text-only latencies (ms) while another thread analyzes images"""
+    stop = threading.Event()
+    images_done = []
+
+    def image_load():
+        while not stop.is_set():
+            # Fresh text per request, so the repost index does not short-circuit
+            detector.analyze(f"Photo upload {len(images_done)}",
+                             FileStorage(stream=BytesIO(image_bytes), filename='large.png'))
+            # Forget the image so the next upload is scored again
+            detector.image_index = ImageHashIndex(max_distance=NEAR_DUPLICATE_DISTANCE)
+            images_done.append(1)
+
+    worker = threading.Thread(target=image_load)
+    worker.start()
+    latencies = []
+    deadline = time.perf_counter() + DURATION
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        detector.analyze(f"{TEXT} #{len(latencies)}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)  # Requests arrive every ~5 ms
+    stop.set()
+    worker.join()
+    return np.array(latencies), len(images_done)
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    image_bytes = large_png()
+
+    print("=" * 80)
+    print(f"TEXT LATENCY UNDER IMAGE LOAD ({len(image_bytes) / 1e6:.1f} MB 12MP PNG, {os.cpu_count()} CPUs)")
+    print("=" * 80)
+    print(f"{'Mode':<20} {'Text p50 (ms)':>14} {'Text p99 (ms)':>14} {'Text max (ms)':>14} {'Images/s':>10}")
+    print("-" * 76)
+
+    for label, detector in (("inline", DeceptionDetector()),
+                            (f"pool ({workers} workers)", DeceptionDetector(image_workers=workers, image_timeout=60))):
+        # Warm up (starts the pool's worker processes)
+        detector.analyze("warm up", FileStorage(stream=BytesIO(image_bytes), filename='large.png'))
+        latencies, images = run(detector, image_bytes)
+        print(f"{label:<20} {np.percentile(latencies, 50):>14.2f} {np.percentile(latencies, 99):>14.2f} "
+              f"{latencies.max():>14.2f} {images / DURATION:>10.2f}")
+        if detector.image_pool is not None:
+            detector.image_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
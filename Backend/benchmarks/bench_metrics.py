@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Overhead benchmark for the request metrics (models/metrics.py)
+
+Measures the cost of each recording operation, then the latency of
+text-only analyses with the metrics recorded and with every recording
+operation replaced by a no-op, in alternating rounds:
+
+- detector.analyze() (the 'text' and 'fusion' stages)
+- POST /api/analyze through the Flask test client (request hooks,
+  handler stages, verdict counter and in-flight gauges as well)
+
+Every post is a new text, so the result cache and the near-duplicate
+index never answer instead of the detector.
+"""
+
+import sys
+import os
+import time
+import random
+import string
+import tempfile
+import contextlib
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the history writes of the Flask runs out of the working tree
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{tempfile.mkdtemp(prefix='bench-metrics-')}/history.db")
+
+from models import metrics
+from models.metrics import Registry
+
+ROUNDS = 30
+CALLS_PER_ROUND = 200
+OPERATIONS = 200000
+
+WORDS = "urgent verify account offer meeting report weather study click free winner project".split()
+
+
+def new_text(rng):
+    """A post of about 50 words that no earlier call has seen"""
+    words = [rng.choice(WORDS) if rng.random() < 0.5 else ''.join(rng.choices(string.ascii_lowercase, k=6))
+             for _ in range(50)]
+    return ' '.join(words) + '!!!'
+
+
+@contextlib.contextmanager
+def metrics_disabled():
+    """Replace every recording operation with a no-op"""
+    null = contextlib.nullcontext()
+    patches = [(metrics._CounterChild, 'inc', lambda self, amount=1: None),
+               (metrics._GaugeChild, 'dec', lambda self, amount=1: None),
+               (metrics._GaugeChild, 'track', lambda self: null),
+               (metrics._HistogramChild, 'observe', lambda self, value: None),
+               (metrics._HistogramChild, 'time', lambda self: null)]
+    saved = [(cls, name, cls.__dict__[name]) for cls, name, _ in patches]
+    for cls, name, replacement in patches:
+        setattr(cls, name, replacement)
+    try:
+        yield
+    finally:
+        for cls, name, original in saved:
+            setattr(cls, name, original)
+
+
+def per_operation_ns(func):
+    start = time.perf_counter()
+    for _ in range(OPERATIONS):
+        func()
+    return (time.perf_counter() - start) / OPERATIONS * 1e9
+
+
+def alternating_rounds(call, rng):
+    """
+    Median per-call seconds with and without the metrics, from rounds
+    run alternately so drift in machine speed affects both alike
+    """
+    for _ in range(CALLS_PER_ROUND):
+        call(new_text(rng))
+    timings = {True: [], False: []}
+    for round_index in range(2 * ROUNDS):
+        enabled = round_index % 2 == 0
+        texts = [new_text(rng) for _ in range(CALLS_PER_ROUND)]
+        with contextlib.nullcontext() if enabled else metrics_disabled():
+            start = time.perf_counter()
+            for text in texts:
+                call(text)
+            timings[enabled].append((time.perf_counter() - start) / CALLS_PER_ROUND)
+    return float(np.median(timings[True])), float(np.median(timings[False]))
+
+
+def main():
+    print("=" * 80)
+    print("METRICS OVERHEAD")
+    print("=" * 80)
+
+    registry = Registry()
+    histogram = registry.histogram('bench_seconds', 'Benchmark histogram', ('stage',)).labels('text')
+    counter = registry.counter('bench_total', 'Benchmark counter', ('verdict',))
+    gauge = registry.gauge('bench_in_flight', 'Benchmark gauge')
+
+    def timed_block():
+        with histogram.time():
+            pass
+
+    def tracked_block():
+        with gauge.track():
+            pass
+
+    print(f"\n{'Operation':<44} {'ns/op':>8}")
+    print("-" * 53)
+    for name, func in [("histogram.observe(value)", lambda: histogram.observe(0.0003)),
+                       ("with histogram.time(): (incl. perf_counter)", timed_block),
+                       ("counter.labels(value).inc()", lambda: counter.labels('AUTHENTIC').inc()),
+                       ("with gauge.track():", tracked_block)]:
+        print(f"{name:<44} {per_operation_ns(func):>8.0f}")
+
+    from app import app, detector
+    detector.wait_until_ready()
+    client = app.test_client()
+    rng = random.Random(0)
+
+    print(f"\n{'Text-only latency':<28} {'recorded':>10} {'no-op':>10} {'overhead':>9}")
+    print("-" * 60)
+    for name, call in [("detector.analyze()", detector.analyze),
+                       ("POST /api/analyze", lambda text: client.post('/api/analyze', data={'text': text}))]:
+        recorded, disabled = alternating_rounds(call, rng)
+        print(f"{name:<28} {recorded * 1e6:>7.1f} µs {disabled * 1e6:>7.1f} µs {(recorded / disabled - 1):>+9.2%}")
+
+
+if __name__ == '__main__':
+    main()
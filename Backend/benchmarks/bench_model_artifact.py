@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the memory-mapped text model artifact
+
+Fits a TF-IDF + logistic regression model with a large vocabulary on a
+synthetic corpus, saves it both as pickles and as an artifact, then loads
+each form in fresh worker processes. Reports load time and the private
+memory each worker adds: unpickled models are private to every worker,
+while the artifact's arrays are shared page cache.
+
+Usage:
+    python benchmarks/bench_model_artifact.py [max_features]
+"""
+
+import sys
+import os
+import json
+import pickle
+import tempfile
+import subprocess
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from models.text_model import export_text_model
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_FEATURES = 200000
+DOCUMENTS = 20000
+WORKERS = 4
+
+# Loads a model the way a server worker would, touches every array page,
+# and reports the time and the growth of its anonymous and resident memory
+WORKER = '''
+import json, os, sys, time, pickle
+import numpy as np
+from models.text_model import TextModel
+
+def private_kb():
+    with open('/proc/self/smaps_rollup') as f:
+        fields = dict(line.split(':', 1) for line in f if ':' in line)
+    # Anonymous memory (heap) cannot be shared; file-backed pages can
+    return int(fields['Anonymous'].split()[0])
+
+def rss_kb():
+    with open('/proc/self/smaps_rollup') as f:
+        fields = dict(line.split(':', 1) for line in f if ':' in line)
+    return int(fields['Rss'].split()[0])
+
+import sklearn.feature_extraction.text, sklearn.linear_model
+private_before, rss_before = private_kb(), rss_kb()
+start = time.perf_counter()
+if sys.argv[1] == 'pickle':
+    with open(os.path.join(sys.argv[2], 'vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open(os.path.join(sys.argv[2], 'text_classifier.pkl'), 'rb') as f:
+        classifier = pickle.load(f)
+    checksum = float(vectorizer.idf_.sum() + classifier.coef_.sum())
+else:
+    model = TextModel.load(sys.argv[2])
+    checksum = float(sum(np.asarray(getattr(model, name), dtype=np.float64).sum()
+                         for name in ('term_hashes', 'term_columns', 'term_offsets', 'term_bytes', 'idf', 'coef')))
+load = time.perf_counter() - start
+print(json.dumps({'load': load, 'private_mb': (private_kb() - private_before) / 1024,
+                  'rss_mb': (rss_kb() - rss_before) / 1024}))
+'''
+
+
+def make_corpus(rs):
+    words = [f"w{i:x}" for i in range(60000)]
+    # Zipf-like word frequencies, so bigrams repeat and the vocabulary fills
+    weights = 1.0 / np.arange(1, len(words) + 1)
+    weights /= weights.sum()
+    return [' '.join(rs.choice(words, size=40, p=weights)) for _ in range(DOCUMENTS)]
+
+
+def main():
+    max_features = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_FEATURES
+    rs = np.random.RandomState(0)
+    workdir = tempfile.mkdtemp(prefix='artifact-bench-')
+
+    print("=" * 80)
+    print("TEXT MODEL ARTIFACT")
+    print("=" * 80)
+
+    texts = make_corpus(rs)
+    labels = rs.randint(0, 2, len(texts))
+    vectorizer = TfidfVectorizer(max_features=max_features, ngram_range=(1, 2))
+    classifier = LogisticRegression(max_iter=200).fit(vectorizer.fit_transform(texts), labels)
+
+    with open(os.path.join(workdir, 'vectorizer.pkl'), 'wb') as f:
+        pickle.dump(vectorizer, f)
+    with open(os.path.join(workdir, 'text_classifier.pkl'), 'wb') as f:
+        pickle.dump(classifier, f)
+    artifact = export_text_model(vectorizer, classifier, workdir)
+
+    pickle_mb = sum(os.path.getsize(os.path.join(workdir, name))
+                    for name in ('vectorizer.pkl', 'text_classifier.pkl')) / 2 ** 20
+    artifact_mb = sum(os.path.getsize(os.path.join(artifact, name)) for name in os.listdir(artifact)) / 2 ** 20
+    print(f"Vocabulary: {len(vectorizer.vocabulary_):,} terms; pickles {pickle_mb:.1f} MB, "
+          f"artifact {artifact_mb:.1f} MB")
+    print()
+
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, PYTHONWARNINGS='ignore')
+    print(f"{'Format':<12} {'Load (ms)':>10} {'Private / worker (MB)':>22} {'RSS / worker (MB)':>18} "
+          f"{'Private x ' + str(WORKERS) + ' (MB)':>16}")
+    print("-" * 82)
+    for label, mode, path in (('pickle', 'pickle', workdir), ('artifact', 'artifact', artifact)):
+        runs = []
+        for _ in range(WORKERS):
+            output = subprocess.run([sys.executable, '-c', WORKER, mode, path], cwd=BACKEND_DIR, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        load = np.median([r['load'] for r in runs]) * 1000
+        private = np.median([r['private_mb'] for r in runs])
+        rss = np.median([r['rss_mb'] for r in runs])
+        print(f"{label:<12} {load:>10.1f} {private:>22.1f} {rss:>18.1f} {private * WORKERS:>16.1f}")
+    print()
+    print("Private memory is anonymous (heap) memory, which no other worker can share. The artifact's")
+    print("pages are file-backed: they count toward RSS but are one page-cache copy for every worker.")
+
+
+if __name__ == '__main__':
+    main()
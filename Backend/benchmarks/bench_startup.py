@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark for cold start
+
+Starts fresh interpreters and measures how long until the Flask app answers
+its liveness check, how long until the background warm-up makes it ready,
+and what the first text+image request costs on a warmed instance compared
+with one that skipped the warm-up. Models are loaded from MODEL_DIR (pass a
+directory to benchmark with trained model files present).
+
+Usage:
+    python benchmarks/bench_startup.py [model_dir]
+"""
+
+import sys
+import os
+import json
+import subprocess
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNS = 5
+
+# Times are measured from interpreter start (the child's first statement)
+SERVE = '''
+import json, time
+start = time.perf_counter()
+import app
+client = app.app.test_client()
+assert client.get('/api/health').status_code == 200
+live = time.perf_counter() - start
+not_ready = client.get('/api/health/ready').status_code == 503
+app.detector.wait_until_ready()
+ready = time.perf_counter() - start
+print(json.dumps({'live': live, 'ready': ready, 'not_ready_before': not_ready}))
+'''
+
+FIRST_REQUEST = '''
+import json, sys, time, glob, os
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector
+detector = DeceptionDetector()
+if sys.argv[1] == 'warm':
+    detector.warm_up()
+images = sorted(glob.glob(os.path.join('final datasets', '*', '*')))
+timings = []
+for i in range(2):
+    with open(images[i], 'rb') as f:
+        start = time.perf_counter()
+        detector.analyze(f"Limited offer {i}, verify your account now!!!", FileStorage(stream=f, filename='upload'))
+        timings.append(time.perf_counter() - start)
+print(json.dumps({'first': timings[0], 'second': timings[1]}))
+'''
+
+
+def run(code, *args, env=None):
+    output = subprocess.run([sys.executable, '-c', code, *args], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, PYTHONWARNINGS='ignore')
+    if len(sys.argv) > 1:
+        env['MODEL_DIR'] = os.path.abspath(sys.argv[1])
+    model_dir = env.get('MODEL_DIR', os.path.join(BACKEND_DIR, 'models'))
+    model_files = [name for name in ('text_model.current', 'vectorizer.pkl', 'text_classifier.pkl',
+                                     'image_model.npz')
+                   if os.path.exists(os.path.join(model_dir, name))]
+
+    print("=" * 80)
+    print("COLD START")
+    print("=" * 80)
+    print(f"Model directory: {model_dir} ({', '.join(model_files) or 'no model files'})")
+    print()
+
+    serve = [run(SERVE, env=env) for _ in range(RUNS)]
+    print(f"{'Milestone (median of ' + str(RUNS) + ' starts)':<44} {'Seconds':>10}")
+    print("-" * 56)
+    print(f"{'Liveness (app imported, /api/health 200)':<44} {np.median([r['live'] for r in serve]):>10.3f}")
+    print(f"{'Ready (warm-up finished)':<44} {np.median([r['ready'] for r in serve]):>10.3f}")
+    print(f"/api/health/ready answered 503 before warm-up finished: "
+          f"{sum(r['not_ready_before'] for r in serve)}/{RUNS} starts")
+    print()
+
+    print(f"{'First text+image analyze':<44} {'First (ms)':>10} {'Second (ms)':>12}")
+    print("-" * 68)
+    for label, mode in (('Without warm-up', 'cold'), ('After warm_up()', 'warm')):
+        timings = [run(FIRST_REQUEST, mode, env=env) for _ in range(RUNS)]
+        first = np.median([t['first'] for t in timings]) * 1000
+        second = np.median([t['second'] for t in timings]) * 1000
+        print(f"{label:<44} {first:>10.1f} {second:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark for out-of-core text model training
+
+Writes synthetic labelled CSVs of increasing size and trains on each twice,
+in a fresh process every time: once in memory the way train_text_model.py
+does (whole CSV read into lists, TfidfVectorizer + LogisticRegression), and
+once with train_text_model_streaming.py. Reports the peak RSS and wall
+time of every run. The in-memory peak grows with the dataset; the
+streaming peak stays flat.
+
+Usage:
+    python benchmarks/bench_streaming_train.py [rows ...]
+"""
+
+import sys
+import os
+import csv
+import time
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROWS = (25000, 100000, 400000)
+EPOCHS = 2
+
+NEUTRAL = ("weather park meeting project coffee book team sprint report garden music river "
+           "study research data results journal quarterly the a and of to in for").split()
+DECEPTIVE = "offer urgent free winner prize claim limited guaranteed miracle shocking exclusive secret".split()
+AUTHENTIC = "published evidence scientists documentary learned recommend delivered schedule".split()
+
+IN_MEMORY = '''
+import csv, sys, numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+csv.field_size_limit(sys.maxsize)
+with open(sys.argv[1], newline='', encoding='utf-8') as f:
+    rows = [(row['text'], int(row['label'])) for row in csv.DictReader(f)]
+texts, labels = zip(*rows)
+vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2))
+LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(texts), np.array(labels))
+'''
+
+
+def write_csv(path, rows, rng):
+    """Posts of 20-60 words; label-specific words make up about a tenth"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['text', 'label'])
+        for i in range(rows):
+            label = int(rng.integers(2))
+            length = int(rng.integers(20, 60))
+            words = rng.choice(NEUTRAL, size=length)
+            marked = rng.random(length) < 0.1
+            words[marked] = rng.choice(DECEPTIVE if label else AUTHENTIC, size=int(marked.sum()))
+            writer.writerow([' '.join(words) + f" #{i}", label])
+
+
+def measure(args, env):
+    """Run a process; return (peak RSS in MB, seconds)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{args} exited with {process.returncode}")
+    return usage.ru_maxrss / 1024, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_ROWS
+    workdir = tempfile.mkdtemp(prefix='bench-streaming-')
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR, PYTHONWARNINGS='ignore', MODEL_DIR=workdir)
+    rng = np.random.default_rng(0)
+    try:
+        print("=" * 80)
+        print(f"OUT-OF-CORE TEXT TRAINING ({EPOCHS} streaming epochs)")
+        print("=" * 80)
+        print(f"{'Rows':>9} {'CSV (MB)':>9} {'In-memory RSS':>14} {'time':>8} {'Streaming RSS':>14} {'time':>8}")
+        print("-" * 68)
+        for rows in sizes:
+            path = os.path.join(workdir, f"posts-{rows}.csv")
+            write_csv(path, rows, rng)
+            in_memory = measure([sys.executable, '-c', IN_MEMORY, path], env)
+            streaming = measure([sys.executable, 'train_text_model_streaming.py', path,
+                                 '--epochs', str(EPOCHS), '--model-dir', workdir], env)
+            print(f"{rows:>9,} {os.path.getsize(path) / 2 ** 20:>9.1f} {in_memory[0]:>11.0f} MB {in_memory[1]:>7.1f}s "
+                  f"{streaming[0]:>11.0f} MB {streaming[1]:>7.1f}s")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
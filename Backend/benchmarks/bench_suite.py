@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark suite for the detector
+
+Runs synthetic workloads generated locally and writes the results as JSON:
+
+- text/<tier>: _analyze_text on posts of four length tiers
+- image/<format>-<size>: _analyze_image on dataset sample images
+  re-encoded as JPEG, PNG and WebP at three resolutions
+- analyze/<modalities>: analyze() on text only, text + image,
+  text + metadata, and all three
+- construct/detector: DeceptionDetector() plus load_models()
+
+Every call scores new content: texts are generated per call (so the
+near-duplicate text index never matches), and the near-duplicate image
+index is emptied before each image call, outside the timed region.
+
+Each case reports the median, p95 and mean latency and calls per second.
+With a baseline (a results file saved earlier with --save-baseline) the
+medians are compared, and the run exits with status 1 if any case is
+slower than its baseline by more than --threshold (default 25%).
+Baselines are specific to a machine; record one on the machine that runs
+the comparison.
+
+Usage:
+    python benchmarks/bench_suite.py [--quick] [--filter text/] [--threshold 0.25]
+    python benchmarks/bench_suite.py --save-baseline
+"""
+
+import sys
+import os
+import glob
+import json
+import time
+import random
+import string
+import argparse
+import platform
+from io import BytesIO
+from datetime import datetime
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector
+from models.image_hash_index import ImageHashIndex
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'final datasets')
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+FORMAT_VERSION = 1
+
+# Approximate characters per post
+TEXT_TIERS = {'short': 80, 'medium': 400, 'long': 2000, 'very_long': 10000}
+IMAGE_SIZES = (256, 1024, 2048)
+IMAGE_FORMATS = {'jpeg': dict(format='JPEG', quality=90), 'png': dict(format='PNG'), 'webp': dict(format='WEBP')}
+SAMPLE_IMAGES = 5
+
+KEYWORDS = ("urgent guaranteed exclusive limited offer click verify account bank winner free miracle "
+            "shocking secret breaking news meeting project report quarterly results weather study").split()
+EMOJIS = ["😱", "🚨", "🔥", "💰", "⚠️", "🎉"]
+
+# Timed samples per case (divided by 5 with --quick)
+SAMPLES = {'text': 100, 'image': 30, 'analyze': 50, 'construct': 10}
+
+
+def make_text(rng, length):
+    """A post of about length characters, distinct from every other"""
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        if rng.random() < 0.4:
+            word = rng.choice(KEYWORDS)
+        else:
+            word = ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9)))
+        if rng.random() < 0.1:
+            word = word.upper()
+        words.append(word)
+        if rng.random() < 0.05:
+            words.append(rng.choice(EMOJIS) + rng.choice('!?.') * rng.randint(1, 4))
+    return ' '.join(words)
+
+
+def sample_images(count=SAMPLE_IMAGES):
+    """One image per source photo (the datasets hold augmented variants of each)"""
+    originals = {}
+    for path in sorted(glob.glob(os.path.join(DATASET_DIR, '*', '*'))):
+        originals.setdefault(os.path.basename(path).split('.rf.')[0], path)
+    paths = list(originals.values())
+    return paths[::max(len(paths) // count, 1)][:count]
+
+
+def encode_images(paths, size, options):
+    """Sample images scaled to size pixels on the longer side and re-encoded"""
+    encoded = []
+    for path in paths:
+        with Image.open(path) as image:
+            image = image.convert('RGB')
+            scale = size / max(image.size)
+            image = image.resize((max(round(image.width * scale), 1), max(round(image.height * scale), 1)),
+                                 Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, **options)
+            encoded.append(buffer.getvalue())
+    return encoded
+
+
+def upload(data, name='upload.jpg'):
+    return FileStorage(stream=BytesIO(data), filename=name)
+
+
+def measure(call, samples, prepare=None, warmup=3, min_sample_ms=2.0):
+    """
+    Time call(prepare(i)) over samples timed batches, after warm-up calls
+
+    Calls faster than min_sample_ms are timed in batches long enough to
+    reach it, so timer resolution and scheduling noise do not dominate;
+    each sample is the mean time per call of its batch. prepare runs
+    outside the timed region.
+
+    Returns:
+        dict: samples, batch, median_ms, p95_ms, mean_ms, ops_per_sec
+    """
+    prepare = prepare or (lambda i: i)
+    start = time.perf_counter()
+    for i in range(warmup):
+        call(prepare(-1 - i))
+    per_call = (time.perf_counter() - start) / warmup
+    batch = max(1, min(int(min_sample_ms / 1000 / max(per_call, 1e-9)), 1000))
+
+    times = np.empty(samples)
+    for sample in range(samples):
+        arguments = [prepare(sample * batch + i) for i in range(batch)]
+        start = time.perf_counter()
+        for argument in arguments:
+            call(argument)
+        times[sample] = (time.perf_counter() - start) / batch
+    return {
+        'samples': samples,
+        'batch': batch,
+        'median_ms': float(np.median(times) * 1000),
+        'p95_ms': float(np.percentile(times, 95) * 1000),
+        'mean_ms': float(times.mean() * 1000),
+        'ops_per_sec': float(1 / np.median(times)),
+    }
+
+
+def cases(detector, quick):
+    """Yield (name, run) for every benchmark case; run() returns measure()'s dict"""
+    scale = 5 if quick else 1
+    samples = {kind: max(count // scale, 3) for kind, count in SAMPLES.items()}
+    rng = random.Random(0)
+
+    for tier, length in TEXT_TIERS.items():
+        yield f"text/{tier}", lambda length=length: measure(
+            detector._analyze_text, samples['text'], lambda i: make_text(rng, length))
+
+    def fresh_upload(images, name):
+        def prepare(i):
+            # Empty the near-duplicate index so every call scores the image
+            detector.image_index = ImageHashIndex(version=detector.image_version)
+            return upload(images[i % len(images)], name)
+        return prepare
+
+    paths = sample_images()
+    for size in IMAGE_SIZES:
+        for format_name, options in IMAGE_FORMATS.items():
+            def run(size=size, format_name=format_name, options=options):
+                images = encode_images(paths, size, options)
+                return measure(detector._analyze_image, samples['image'],
+                               fresh_upload(images, f"upload.{format_name}"))
+            yield f"image/{format_name}-{size}", run
+
+    jpegs = encode_images(paths, 1024, IMAGE_FORMATS['jpeg'])
+    image_upload = fresh_upload(jpegs, 'upload.jpg')
+    modalities = {
+        'text': lambda i: (make_text(rng, 400), None, False),
+        'text+image': lambda i: (make_text(rng, 400), image_upload(i), False),
+        'text+metadata': lambda i: (make_text(rng, 400), None, True),
+        'text+image+metadata': lambda i: (make_text(rng, 400), image_upload(i), True),
+    }
+    for name, prepare in modalities.items():
+        yield f"analyze/{name}", lambda prepare=prepare: measure(
+            lambda args: detector.analyze(args[0], args[1], args[2], args[2], args[2]),
+            samples['analyze'], prepare)
+
+    def construct(_):
+        DeceptionDetector().load_models()
+    yield "construct/detector", lambda: measure(construct, samples['construct'], warmup=1)
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median latencies with a baseline
+
+    Returns:
+        list: (case, baseline_ms, current_ms, change, status) per case
+    """
+    rows = []
+    for name in sorted(set(results) | set(baseline)):
+        if name not in results:
+            rows.append((name, baseline[name]['median_ms'], None, None, 'missing'))
+        elif name not in baseline:
+            rows.append((name, None, results[name]['median_ms'], None, 'new'))
+        else:
+            before, after = baseline[name]['median_ms'], results[name]['median_ms']
+            change = after / before - 1
+            rows.append((name, before, after, change, 'REGRESSION' if change > threshold else 'ok'))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='results JSON to write')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='largest accepted slowdown of a median (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='also write the results as the baseline')
+    parser.add_argument('--filter', default='', help='only run cases whose name starts with this')
+    parser.add_argument('--quick', action='store_true', help='a fifth of the samples')
+    args = parser.parse_args()
+
+    detector = DeceptionDetector()
+    detector.load_models()
+
+    print("=" * 80)
+    print("DETECTOR BENCHMARK SUITE")
+    print("=" * 80)
+    print(f"{'Case':<32} {'median ms':>10} {'p95 ms':>10} {'calls/s':>10}")
+    print("-" * 66)
+    results = {}
+    for name, run in cases(detector, args.quick):
+        if not name.startswith(args.filter):
+            continue
+        results[name] = run()
+        print(f"{name:<32} {results[name]['median_ms']:>10.3f} {results[name]['p95_ms']:>10.3f} "
+              f"{results[name]['ops_per_sec']:>10,.0f}")
+
+    report = {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+        },
+        'detector': {
+            'version': detector.version,
+            'text_scoring': detector.text_scoring,
+            'image_scoring': detector.image_scoring,
+        },
+        'quick': args.quick,
+        'results': results,
+    }
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.save_baseline:
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; record one with --save-baseline")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    if args.filter:
+        baseline = {name: value for name, value in baseline.items() if name.startswith(args.filter)}
+    rows = compare(results, baseline, args.threshold)
+
+    print()
+    print(f"Against {args.baseline} (threshold +{args.threshold:.0%}):")
+    print(f"{'Case':<32} {'baseline ms':>12} {'current ms':>11} {'change':>8}  status")
+    print("-" * 76)
+    for name, before, after, change, status in rows:
+        print(f"{name:<32} {'-' if before is None else f'{before:.3f}':>12} {'-' if after is None else f'{after:.3f}':>11} "
+              f"{'-' if change is None else f'{change:+.1%}':>8}  {status}")
+    regressions = [row for row in rows if row[4] == 'REGRESSION']
+    if regressions:
+        print(f"\n{len(regressions)} cases slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the single-pass keyword matcher
+
+Compares KeywordMatcher.find against one substring search per keyword and
+times the full rule-based text score at 100 chars, 10 KB and 1 MB.
+"""
+
+import sys
+import os
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.deception_detector import DeceptionDetector
+
+SAMPLE = (
+    "Breaking news: our research team published data showing a 12% improvement. "
+    "Click here to verify your account! 🚨 "
+)
+SIZES = [100, 10_000, 1_000_000]
+
+
+def make_text(size):
+    """Repeat the sample post up to the requested length"""
+    return (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+
+def time_call(func, size):
+    """Average milliseconds per call, with more repeats for short inputs"""
+    number = max(1, 2_000_000 // size)
+    return timeit.timeit(func, number=number) / number * 1000
+
+
+def main():
+    print("=" * 80)
+    print("TEXT FEATURE MICROBENCHMARK")
+    print("=" * 80)
+
+    detector = DeceptionDetector()
+    matcher = detector.text_features.matcher
+    keywords = matcher.keywords
+
+    backend = 'aho-corasick' if matcher._automaton is not None else 'regex'
+    print(f"\n{len(keywords)} keywords compiled into one {backend} matcher\n")
+    print(f"{'size':>10} | {'per-keyword in':>15} | {'single pass':>12} | {'speedup':>8} | {'_analyze_text':>14}")
+    print("-" * 80)
+    for size in SIZES:
+        text_lower = make_text(size).lower()
+        naive_ms = time_call(lambda: {k for k in keywords if k in text_lower}, size)
+        matcher_ms = time_call(lambda: matcher.find(text_lower), size)
+        text = make_text(size)
+        score_ms = time_call(lambda: detector._analyze_text(text), size)
+        print(f"{size:>10} | {naive_ms:>12.3f} ms | {matcher_ms:>9.3f} ms | {naive_ms / matcher_ms:>7.2f}x | {score_ms:>11.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the MinHash-LSH near-duplicate text index
+
+Grows the index to a million entries and measures lookup latency at each
+size (it should stay flat, since a lookup only touches the buckets of the
+query), the memory used per entry, and how often lightly edited copies of
+a scam text are recognized.
+
+Usage:
+    python benchmarks/bench_text_lsh.py [max_entries]
+"""
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.text_lsh_index import TextLSHIndex
+
+SIZES = [10000, 100000, 1000000]
+FILL_BLOCK = 100000
+QUERIES = 2000
+
+BASE = ("URGENT!!! Your bank account has been suspended due to unusual activity. "
+        "Click here http://secure-login.xyz to verify your identity now or lose access forever!")
+EDITS = {
+    'case change': BASE.replace("URGENT", "Urgent"),
+    'word swap': BASE.replace("forever", "permanently"),
+    'new url': BASE.replace("http://secure-login.xyz", "http://verify-acct.biz"),
+    'emoji added': BASE + " 🚨🚨🚨",
+    'truncated': BASE[:120],
+    'unrelated': "The quarterly meeting went well and we agreed on the roadmap for the next release.",
+}
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def main():
+    max_entries = int(sys.argv[1]) if len(sys.argv) > 1 else SIZES[-1]
+    sizes = [size for size in SIZES if size <= max_entries]
+    rs = np.random.RandomState(0)
+
+    print("=" * 80)
+    print("TEXT NEAR-DUPLICATE INDEX")
+    print("=" * 80)
+
+    # Budget the index to hold the largest size without evicting
+    probe = TextLSHIndex(memory_budget_mb=1)
+    budget_mb = max_entries / probe.capacity + 1
+    rss_before = rss_mb()
+    index = TextLSHIndex(memory_budget_mb=budget_mb)
+
+    texts = [f"Limited offer {i}: claim your reward code {i * 7919} before midnight at example{i}.biz"
+             for i in range(QUERIES)]
+    signatures = [index.signature(text) for text in texts]
+    start = time.perf_counter()
+    for text in texts[:200]:
+        index.signature(text)
+    signature_us = (time.perf_counter() - start) / 200 * 1e6
+    print(f"Signature of a ~80 character text: {signature_us:.1f} us")
+    print()
+    print(f"{'Entries':>10} {'Find hit (us)':>15} {'Find miss (us)':>15} {'Add (us)':>10} {'RSS (MB)':>10}")
+    print("-" * 66)
+
+    for signature in signatures:
+        index.add(signature, 80)
+    for size in sizes:
+        # Random signatures stand in for unrelated traffic
+        add_start = time.perf_counter()
+        filler = size - len(index)
+        for block in range(0, filler, FILL_BLOCK):
+            rows = rs.randint(0, 2 ** 32, (min(FILL_BLOCK, filler - block), index.num_perm), dtype=np.uint64)
+            for row in rows.astype(np.uint32):
+                index.add(row, 10)
+        add_us = (time.perf_counter() - add_start) / max(filler, 1) * 1e6
+
+        misses = rs.randint(0, 2 ** 32, (QUERIES, index.num_perm), dtype=np.uint64).astype(np.uint32)
+        start = time.perf_counter()
+        found = sum(index.find(signature) is not None for signature in signatures)
+        hit_us = (time.perf_counter() - start) / QUERIES * 1e6
+        start = time.perf_counter()
+        false_hits = sum(index.find(signature) is not None for signature in misses)
+        miss_us = (time.perf_counter() - start) / QUERIES * 1e6
+        assert found == QUERIES and false_hits == 0
+        print(f"{len(index):>10} {hit_us:>15.1f} {miss_us:>15.1f} {add_us:>10.1f} {rss_mb() - rss_before:>10.0f}")
+
+    print()
+    print(f"Capacity for a {budget_mb:.0f} MB budget: {index.capacity} entries")
+    print()
+
+    # Recognition of edited copies
+    index = TextLSHIndex(memory_budget_mb=16)
+    index.add(index.signature(BASE), 100)
+    print(f"{'Edit':<14} {'Found':>6} {'Similarity':>11}")
+    print("-" * 33)
+    for name, text in EDITS.items():
+        match = index.find(index.signature(text))
+        similarity = f"{match['similarity']:.2f}" if match else '-'
+        print(f"{name:<14} {str(match is not None):>6} {similarity:>11}")
+
+
+if __name__ == '__main__':
+    main()
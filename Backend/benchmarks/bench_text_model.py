@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark for text model inference
+
+Compares scikit-learn (vectorizer.transform + predict_proba) with the NumPy
+TextModel on the same fitted model: latency for one document, which is what
+/api/analyze pays, and throughput for batches of 64 and 1000 documents.
+Uses the pickled model in models/ when present, otherwise fits one on a
+synthetic corpus with the train_text_model.py settings.
+
+Usage:
+    python benchmarks/bench_text_model.py
+"""
+
+import sys
+import os
+import time
+import pickle
+import warnings
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from config import MODEL_DIR
+from models.text_model import TextModel
+
+WORDS = (
+    "offer account bank verify click urgent free winner prize claim limited deal "
+    "weather park meeting project coffee book team sprint report garden music river "
+    "shocking exclusive secret miracle cure doctors hate trick guaranteed money fast "
+    "study research scientists data evidence results published journal quarterly"
+).split()
+
+
+def make_texts(rs, count):
+    return [' '.join(rs.choice(WORDS, size=rs.randint(8, 40))) + f" #{i}" for i in range(count)]
+
+
+def load_or_fit(rs):
+    vectorizer_path = os.path.join(MODEL_DIR, 'vectorizer.pkl')
+    classifier_path = os.path.join(MODEL_DIR, 'text_classifier.pkl')
+    if os.path.exists(vectorizer_path) and os.path.exists(classifier_path):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            with open(vectorizer_path, 'rb') as f:
+                vectorizer = pickle.load(f)
+            with open(classifier_path, 'rb') as f:
+                classifier = pickle.load(f)
+        return vectorizer, classifier, 'pickled model in MODEL_DIR'
+    texts = make_texts(rs, 5000)
+    vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
+    classifier = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(texts), rs.randint(0, 2, len(texts)))
+    return vectorizer, classifier, 'synthetic model'
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    rs = np.random.RandomState(0)
+    vectorizer, classifier, source = load_or_fit(rs)
+    model = TextModel.from_sklearn(vectorizer, classifier)
+    texts = make_texts(rs, 1000)
+
+    def sklearn_proba(batch):
+        return classifier.predict_proba(vectorizer.transform(batch))[:, 1]
+
+    print("=" * 80)
+    print("TEXT MODEL INFERENCE")
+    print("=" * 80)
+    print(f"Model: {source}, {len(vectorizer.vocabulary_):,} features")
+    error = np.abs(sklearn_proba(texts) - model.predict_proba(texts)).max()
+    print(f"Max |probability difference| over {len(texts)} texts: {error:.2e}")
+    print()
+
+    print(f"{'Workload':<28} {'scikit-learn':>14} {'NumPy':>12} {'Speedup':>9}")
+    print("-" * 66)
+    single = texts[0]
+    sk = best_of(lambda: sklearn_proba([single]), 200) * 1e6
+    np_time = best_of(lambda: model.predict_proba([single]), 200) * 1e6
+    print(f"{'1 document (us)':<28} {sk:>14.1f} {np_time:>12.1f} {sk / np_time:>8.1f}x")
+    for size in (64, 1000):
+        batch = texts[:size]
+        sk = size / best_of(lambda: sklearn_proba(batch), 10)
+        np_rate = size / best_of(lambda: model.predict_proba(batch), 10)
+        print(f"{f'Batch of {size} (docs/s)':<28} {sk:>14,.0f} {np_rate:>12,.0f} {np_rate / sk:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Seed the perceptual-hash image index from the image datasets
+
+Scores every image under final datasets/{fake,real} with the detector,
+which adds each one to its near-duplicate index, and saves the index to
+the model directory. The detector is configured like the app's (FLASK_ENV
+picks the configuration, so IMAGE_SCORING and IMAGE_MODEL_WEIGHT apply),
+and the app loads the index on startup as long as the image scoring code,
+those settings and the image model have not changed since it was built.
+
+Usage:
+    python build_image_index.py [dataset_dir ...]
+"""
+
+import os
+import sys
+import time
+from werkzeug.datastructures import FileStorage
+from config import config
+from models.deception_detector import DeceptionDetector, IMAGE_INDEX_FILE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIRS = [
+    os.path.join(BASE_DIR, 'final datasets', 'fake'),
+    os.path.join(BASE_DIR, 'final datasets', 'real'),
+]
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+def iter_images(directories):
+    """Yield image paths under the given directories in a stable order"""
+    for directory in directories:
+        for root, _, files in sorted(os.walk(directory)):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+
+def main():
+    directories = sys.argv[1:] or DEFAULT_DIRS
+    settings = config[os.getenv('FLASK_ENV', 'development')]
+    detector = DeceptionDetector(
+        text_scoring=settings.TEXT_SCORING,
+        text_model_weight=settings.TEXT_MODEL_WEIGHT,
+        image_scoring=settings.IMAGE_SCORING,
+        image_model_weight=settings.IMAGE_MODEL_WEIGHT,
+        max_image_pixels=settings.MAX_IMAGE_PIXELS,
+        cascade=settings.CASCADE_SCORING
+    )
+    detector.load_models()
+    start_size = len(detector.image_index)
+
+    print(f"Seeding image index from {len(directories)} directories...")
+    start = time.perf_counter()
+    scanned = 0
+    for path in iter_images(directories):
+        with open(path, 'rb') as f:
+            detector._analyze_image(FileStorage(stream=f, filename=os.path.basename(path)))
+        scanned += 1
+    elapsed = time.perf_counter() - start
+
+    added = len(detector.image_index) - start_size
+    print(f"Scanned {scanned} images in {elapsed:.1f}s ({scanned / max(elapsed, 1e-9):.0f} images/sec)")
+    print(f"Indexed {added} distinct images ({scanned - added} near-duplicates)")
+
+    detector.save_image_index()
+    print(f"Index saved to {os.path.join(detector.model_dir, IMAGE_INDEX_FILE)}")
+
+
+if __name__ == '__main__':
+    main()
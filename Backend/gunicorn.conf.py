@@ -0,0 +1,71 @@
+"""
+Gunicorn configuration for production serving
+
+    gunicorn -c gunicorn.conf.py app:app
+
+preload_app imports app.py in the master process, so the detector and its
+models are loaded once before the workers fork and every worker shares
+those pages copy-on-write instead of loading its own copy. Each worker then
+serves requests from several threads; the detector keeps no per-request
+state, so one instance is safe to share between them.
+
+The result cache and near-duplicate indexes are per worker: after the fork
+each worker fills its own copy.
+
+The master finishes the detector's warm-up (model loading) before the first
+fork, so the loaded models are among the shared pages and no worker forks
+while the warm-up thread holds a lock. It waits at most
+GUNICORN_WARM_UP_TIMEOUT seconds in total; past that (or if the warm-up
+failed) it logs a warning and forks anyway, and the workers load the
+models themselves. Each worker then runs its own short
+warm-up, starting its image pool, before /api/health/ready reports it ready.
+
+Every worker also runs its own model watcher, so a new text model exported
+to MODEL_DIR (or selected through /api/model/reload in any one worker) is
+picked up by all of them within MODEL_WATCH_INTERVAL seconds.
+"""
+
+import gc
+import multiprocessing
+import os
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+
+# Load models once in the master before forking
+preload_app = True
+
+# Seconds the master waits for the detector warm-up, over all forks
+WARM_UP_TIMEOUT = float(os.getenv('GUNICORN_WARM_UP_TIMEOUT', '120'))
+_warm_up_deadline = None
+
+
+def pre_fork(server, worker):
+    global _warm_up_deadline
+    from app import detector
+    if _warm_up_deadline is None:
+        _warm_up_deadline = time.monotonic() + WARM_UP_TIMEOUT
+    if not detector.wait_until_ready(max(_warm_up_deadline - time.monotonic(), 0)):
+        if detector.warm_up_error:
+            server.log.warning("Detector warm-up failed (%s); forking worker without preloaded models",
+                               detector.warm_up_error)
+        else:
+            server.log.warning("Detector warm-up not finished after %ss; forking worker anyway", WARM_UP_TIMEOUT)
+    if detector.image_pool is not None:
+        # Workers start their own pools; the master's would sit idle
+        detector.image_pool.shutdown()
+
+    # Move everything loaded so far out of the garbage collector's tracked
+    # generations; otherwise the first collection in each worker writes to
+    # every object header and un-shares the pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    from app import app, detector
+    detector.start_warm_up()
+    detector.start_model_watcher(app.config['MODEL_WATCH_INTERVAL'])
@@ -1,4 +1,5 @@
 """Models package for deception detection"""
 from .deception_detector import DeceptionDetector
+from .result_cache import ResultCache, make_cache_key
 
-__all__ = ['DeceptionDetector']
+__all__ = ['DeceptionDetector', 'ResultCache', 'make_cache_key']
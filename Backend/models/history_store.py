@@ -0,0 +1,475 @@
+"""
+Persistent analysis history backed by SQLite
+
+Requests only put their history entry on a queue; a background writer
+thread drains it and inserts whatever has accumulated in one transaction,
+so request latency does not include a database write and bursts are
+written in large batches. The database runs in WAL mode, so reads from
+request threads are not blocked by the writer.
+
+Rows are indexed by timestamp and by verdict, and pages are fetched with
+an id cursor (?before=<id>), so the newest page, a filtered page or a page
+deep in the history all cost one index range scan. Timestamps are stored
+in UTC (see utc_timestamp). Several server processes may write to one
+database, each committing its own batches, so ids follow commit order
+rather than timestamp order: time ranges are always matched on the
+timestamp itself (a range query reads the range from the timestamp index
+and sorts it by id). A retention policy
+(maximum row count and maximum age) is applied by the writer, keeping the
+database file bounded: SQLite reuses the pages freed by deleted rows.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from .metrics import STAGE_SECONDS
+
+# Latency of the writer's insert transactions (one per drained batch)
+WRITE_STAGE = STAGE_SECONDS.labels('history_write')
+
+# Largest page a single query returns
+MAX_PAGE_SIZE = 1000
+
+# Rows deleted per transaction when applying retention, so a large trim
+# does not hold the write lock for long
+RETENTION_CHUNK = 50000
+
+# Seconds between retention passes
+RETENTION_INTERVAL = 60
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS analysis_history (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT NOT NULL,
+        content_preview TEXT NOT NULL,
+        risk_score INTEGER NOT NULL,
+        status TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON analysis_history (timestamp)",
+    # Index entries end with the rowid, so this also serves "newest first" per verdict
+    "CREATE INDEX IF NOT EXISTS idx_history_status ON analysis_history (status)",
+)
+
+COLUMNS = ('id', 'timestamp', 'content_preview', 'risk_score', 'status')
+
+
+def utc_timestamp(moment=None):
+    """
+    Timestamp as stored in the history: UTC ISO 8601 with microseconds
+
+    Fixed-width, so stored timestamps sort as text in time order.
+
+    Args:
+        moment (datetime): Defaults to now; a naive datetime is taken as UTC
+    """
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def normalize_timestamp(text):
+    """
+    Convert an ISO 8601 timestamp from a query to the stored form
+
+    A timestamp without an offset is taken as UTC.
+
+    Raises:
+        ValueError: text is not an ISO 8601 timestamp
+    """
+    try:
+        return utc_timestamp(datetime.fromisoformat(text))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid timestamp: {text!r}")
+
+
+class UnsupportedDatabaseError(ValueError):
+    """DATABASE_URL names a database other than SQLite"""
+
+
+def parse_database_url(url):
+    """
+    Get the SQLite database path from a DATABASE_URL
+
+    Args:
+        url (str): sqlite:///relative/path.db, sqlite:////absolute/path.db
+            or sqlite:///:memory:
+
+    Returns:
+        str: File path, or ':memory:'
+
+    Raises:
+        UnsupportedDatabaseError: url is not a sqlite:/// URL (the message
+            names the scheme only, never credentials in the URL)
+    """
+    prefix = 'sqlite:///'
+    if not url.startswith(prefix):
+        scheme = url.split(':', 1)[0]
+        raise UnsupportedDatabaseError(
+            f"DATABASE_URL is a '{scheme}' URL, but only SQLite is supported: set DATABASE_URL to "
+            f"a sqlite:/// URL such as sqlite:///deceptra.db")
+    path = url[len(prefix):]
+    if not path:
+        raise ValueError("DATABASE_URL has no database path")
+    return path
+
+
+class _Command:
+    """A control message for the writer thread, in order with the rows"""
+
+    def __init__(self, name):
+        self.name = name
+        self.done = threading.Event()
+
+
+class HistoryStore:
+    """
+    Analysis history in SQLite with a batched background writer
+
+    Entries become visible to queries once the writer has committed them,
+    normally within milliseconds; flush() waits for that. The writer thread
+    is started on first use in the process that uses it, so a store created
+    before a pre-fork server forks (gunicorn preload_app) gets its own
+    writer in each server worker.
+    """
+
+    def __init__(self, database_url, max_rows=1000000, max_age_days=None, queue_size=10000,
+                 batch_size=1000):
+        """
+        Args:
+            database_url (str): sqlite:/// URL (see parse_database_url)
+            max_rows (int): Rows kept; older rows are deleted (None keeps all)
+            max_age_days (float): Rows older than this are deleted (None keeps all)
+            queue_size (int): Entries waiting for the writer before new
+                entries are dropped
+            batch_size (int): Most entries inserted per transaction
+        """
+        self.path = parse_database_url(database_url)
+        self.max_rows = max_rows
+        self.max_age_days = max_age_days
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._writer = None
+        self._local = threading.local()
+
+        # An in-memory database exists per connection, so every thread
+        # shares one connection to it
+        self._shared = None
+        self._shared_lock = threading.Lock()
+        if self.path == ':memory:':
+            self._shared = self._connect()
+        else:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = self._connect()
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        if self.path != ':memory:':
+            conn.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL only syncs at checkpoints and stays crash-safe
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA journal_size_limit=67108864")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """The calling thread's connection (reopened after a fork)"""
+        if self._shared is not None:
+            with self._shared_lock:
+                yield self._shared
+            return
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._local.conn = self._connect()
+            self._local.pid = os.getpid()
+        yield conn
+
+    def _get_queue(self):
+        with self._lock:
+            if self._writer is None or self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.queue_size)
+                self._writer = threading.Thread(
+                    target=self._run, args=(self._queue,), name='history-writer', daemon=True
+                )
+                self._pid = os.getpid()
+                self._writer.start()
+            return self._queue
+
+    # ==================== WRITES ====================
+
+    def add(self, entry):
+        """
+        Queue one history entry for writing (never blocks)
+
+        Args:
+            entry (dict): timestamp (from utc_timestamp), content_preview,
+                risk_score and status
+        """
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        """Queue several history entries, in order"""
+        items = self._get_queue()
+        for entry in entries:
+            try:
+                items.put_nowait((entry['timestamp'], entry['content_preview'],
+                                  entry['risk_score'], entry['status']))
+            except queue.Full:
+                # The writer is behind (e.g. the disk stalled); shed history
+                # rather than make requests wait
+                with self._lock:
+                    self.dropped += 1
+
+    def flush(self, timeout=None):
+        """Wait until every entry queued so far is committed"""
+        return self._command('flush', timeout)
+
+    def clear(self):
+        """Delete all history, including entries still queued"""
+        self._command('clear')
+
+    def close(self):
+        """Write pending entries and stop the writer thread"""
+        with self._lock:
+            running = self._writer is not None and self._pid == os.getpid()
+        if running:
+            self._command('stop')
+            self._writer.join()
+        with self._lock:
+            self._writer = None
+
+    def _command(self, name, timeout=None):
+        command = _Command(name)
+        # Blocks while the queue is full: commands must not be dropped
+        self._get_queue().put(command)
+        return command.done.wait(timeout)
+
+    def _run(self, items):
+        """Writer thread: insert queued entries in batches and apply retention"""
+        next_retention = 0
+        with self._writer_connection() as conn:
+            while True:
+                batch = [items.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(items.get_nowait())
+                    except queue.Empty:
+                        break
+
+                rows = []
+                stop = False
+                for item in batch:
+                    if not isinstance(item, _Command):
+                        rows.append(item)
+                        continue
+                    self._insert(conn, rows)
+                    rows = []
+                    if item.name == 'clear':
+                        self._execute(conn, "DELETE FROM analysis_history")
+                    elif item.name == 'stop':
+                        stop = True
+                    item.done.set()
+                self._insert(conn, rows)
+                if stop:
+                    return
+
+                if time.monotonic() >= next_retention:
+                    self.apply_retention(conn)
+                    next_retention = time.monotonic() + RETENTION_INTERVAL
+
+    @contextmanager
+    def _writer_connection(self):
+        if self._shared is not None:
+            yield self._shared
+            return
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _insert(self, conn, rows):
+        if not rows:
+            return
+        start = time.perf_counter()
+        written = self._execute(conn, "INSERT INTO analysis_history (timestamp, content_preview, risk_score, status) "
+                                      "VALUES (?, ?, ?, ?)", rows)
+        WRITE_STAGE.observe(time.perf_counter() - start)
+        if written is not None:
+            self.written += len(rows)
+        else:
+            with self._lock:
+                self.dropped += len(rows)
+
+    def _execute(self, conn, sql, rows=None):
+        """
+        Run one write transaction; errors are logged, not raised, so the writer keeps going
+
+        Returns:
+            int: Rows changed, or None if the transaction failed
+        """
+        lock = self._shared_lock if self._shared is not None else None
+        try:
+            if lock:
+                lock.acquire()
+            conn.execute("BEGIN IMMEDIATE")
+            if rows is None:
+                cursor = conn.execute(sql)
+            elif isinstance(rows, tuple):
+                cursor = conn.execute(sql, rows)
+            else:
+                cursor = conn.executemany(sql, rows)
+            changed = cursor.rowcount
+            conn.execute("COMMIT")
+            return changed
+        except sqlite3.Error as e:
+            print(f"Error writing analysis history: {str(e)}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return None
+        finally:
+            if lock:
+                lock.release()
+
+    def apply_retention(self, conn=None):
+        """
+        Delete rows beyond max_rows or older than max_age_days
+
+        Called periodically by the writer thread; the oldest rows are
+        deleted in chunks of RETENTION_CHUNK.
+
+        Returns:
+            int: Rows deleted
+        """
+        if conn is None:
+            with self._writer_connection() as conn:
+                return self.apply_retention(conn)
+
+        deleted = 0
+        if self.max_rows is not None:
+            # SQLite gives every inserted row the next id after the largest
+            # one, whichever process commits it, and only the oldest rows
+            # are deleted, so the newest max_rows rows are those above this id
+            with self._connection_lock():
+                newest = conn.execute("SELECT MAX(id) FROM analysis_history").fetchone()[0]
+            if newest is not None:
+                deleted += self._delete_chunks(conn, "id <= ?", newest - self.max_rows)
+        if self.max_age_days is not None:
+            # Matched on the timestamp: ids follow commit order, which can
+            # differ from timestamp order across server processes
+            cutoff = utc_timestamp(datetime.now(timezone.utc) - timedelta(days=self.max_age_days))
+            deleted += self._delete_chunks(conn, "timestamp < ?", cutoff)
+        return deleted
+
+    def _delete_chunks(self, conn, condition, value):
+        """Delete the rows matching condition, RETENTION_CHUNK rows per transaction"""
+        sql = (f"DELETE FROM analysis_history WHERE id IN "
+               f"(SELECT id FROM analysis_history WHERE {condition} LIMIT {RETENTION_CHUNK})")
+        deleted = 0
+        while True:
+            changed = self._execute(conn, sql, (value,))
+            if changed is None:
+                return deleted
+            deleted += changed
+            if changed < RETENTION_CHUNK:
+                return deleted
+
+    @contextmanager
+    def _connection_lock(self):
+        if self._shared is not None:
+            with self._shared_lock:
+                yield
+        else:
+            yield
+
+    # ==================== READS ====================
+
+    def query(self, limit=10, status=None, before=None, since=None, until=None):
+        """
+        Get history entries, newest first
+
+        Args:
+            limit (int): Page size (capped at MAX_PAGE_SIZE)
+            status (str): Only entries with this verdict
+            before (int): Only entries with a smaller id (the last id of
+                the previous page)
+            since (str): Only entries at or after this ISO timestamp
+                (UTC unless it has an offset)
+            until (str): Only entries before this ISO timestamp
+
+        Raises:
+            ValueError: since or until is not an ISO timestamp
+
+        Returns:
+            list: Entry dicts with id, timestamp, content_preview,
+                risk_score and status
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        where, params = self._filters(status, before, since, until)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM analysis_history{where} ORDER BY id DESC LIMIT ?"
+        with self._connection() as conn:
+            rows = conn.execute(sql, params + [limit]).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def count(self, status=None, since=None, until=None):
+        """Number of stored entries matching the filters"""
+        where, params = self._filters(status, None, since, until)
+        with self._connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM analysis_history{where}", params).fetchone()[0]
+
+    @staticmethod
+    def _filters(status, before, since, until):
+        clauses = []
+        params = []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(int(before))
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(normalize_timestamp(since))
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(normalize_timestamp(until))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+        return where, params
+
+    def stats(self):
+        """
+        Get writer counters
+
+        Returns:
+            dict: Entries queued, written and dropped, and the database size
+        """
+        with self._lock:
+            queued = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+        size = 0
+        if self._shared is None:
+            for suffix in ('', '-wal'):
+                if os.path.exists(self.path + suffix):
+                    size += os.path.getsize(self.path + suffix)
+        return {
+            'queued': queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'max_rows': self.max_rows,
+            'max_age_days': self.max_age_days,
+            'database_bytes': size
+        }
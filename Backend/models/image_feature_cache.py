@@ -0,0 +1,266 @@
+"""
+Columnar on-disk cache of image features, keyed by file content
+
+For every distinct image file (the SHA-256 of its bytes) the cache holds
+the features score_image looks at (dimensions, file size, distinct
+colours, perceptual hash), a joint colour histogram and the image model's
+feature vector (model_features). Each feature is
+one array in an .npz file, one row per distinct file, so training code
+reads a whole column at once.
+
+A second table maps file paths to content hashes, with the size and
+modification time each file had when it was hashed. An update only reads
+files that were added or changed, and only decodes content that is not in
+the cache yet. Identical files (the same image saved twice) share one
+row and are decoded once.
+
+Hashing and feature extraction run in a process pool: decoding holds the
+GIL, so threads would not help.
+"""
+
+import os
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from .image_features import color_statistics, dhash, model_features, MODEL_FEATURE_NAMES
+from .deception_detector import IMAGE_DECODE_SIZE
+
+CACHE_FILE = 'image_features.npz'
+
+# Bump when extract_features changes; a cache of another version is rebuilt
+FEATURE_VERSION = 3
+
+# Bits per channel of the colour histogram (512 bins)
+HISTOGRAM_BITS = 3
+
+HASH_DTYPE = 'S32'
+
+# Feature columns, one row per distinct file
+COLUMNS = {
+    'width': np.int32,
+    'height': np.int32,
+    'file_size': np.int64,
+    'unique_colors': np.int32,
+    'dhash': np.uint64,
+    'histogram': np.float32,
+    'model_features': np.float64,
+    'valid': bool,
+}
+
+# Widths of the columns that hold a vector per file
+VECTOR_WIDTHS = {
+    'histogram': 1 << (3 * HISTOGRAM_BITS),
+    'model_features': len(MODEL_FEATURE_NAMES),
+}
+
+
+def hash_file(path):
+    """
+    Hash one file (runs in a pool worker)
+
+    Returns:
+        tuple: (path, size, mtime_ns, SHA-256 digest)
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return path, stat.st_size, stat.st_mtime_ns, digest.digest()
+
+
+def extract_features(path):
+    """
+    Compute the feature row of one image file (runs in a pool worker)
+
+    The image is decoded the way score_image decodes it, so the features
+    match what the detector sees. A file that cannot be decoded gets a
+    row of zeros with valid=False.
+
+    Returns:
+        dict: One value per COLUMNS entry
+    """
+    from PIL import Image
+
+    row = {name: 0 for name in COLUMNS}
+    for name, width in VECTOR_WIDTHS.items():
+        row[name] = np.zeros(width, dtype=COLUMNS[name])
+    row['valid'] = False
+    try:
+        row['file_size'] = os.path.getsize(path)
+        with Image.open(path) as image:
+            row['width'], row['height'] = image.size
+            image.draft('RGB', IMAGE_DECODE_SIZE)
+            rgb = image if image.mode == 'RGB' else image.convert('RGB')
+            img_array = np.asarray(rgb)
+            row['model_features'] = model_features(rgb, row['width'], row['height'], row['file_size'])
+        stats = color_statistics(img_array, histogram_bits=HISTOGRAM_BITS)
+        row['unique_colors'] = stats['unique_colors']
+        row['histogram'] = stats['histogram'].astype(np.float32)
+        row['dhash'] = dhash(img_array)
+        row['valid'] = True
+    except Exception as e:
+        print(f"Error extracting features from {path}: {str(e)}")
+    return row
+
+
+class ImageFeatureCache:
+    """Feature columns by content hash, plus the path -> content hash table"""
+
+    def __init__(self, columns=None, paths=None):
+        """
+        Args:
+            columns (dict): 'content_hash' and every COLUMNS array, aligned
+            paths (dict): 'path', 'size', 'mtime_ns' and 'content_hash'
+                arrays, aligned
+        """
+        self.columns = columns or self._empty_columns(0)
+        self.paths = paths or {
+            'path': np.zeros(0, dtype=str),
+            'size': np.zeros(0, dtype=np.int64),
+            'mtime_ns': np.zeros(0, dtype=np.int64),
+            'content_hash': np.zeros(0, dtype=HASH_DTYPE),
+        }
+        self._rows = {digest: row for row, digest in enumerate(self.columns['content_hash'].tolist())}
+
+    def __len__(self):
+        return len(self.columns['content_hash'])
+
+    @staticmethod
+    def _empty_columns(count):
+        columns = {'content_hash': np.zeros(count, dtype=HASH_DTYPE)}
+        for name, dtype in COLUMNS.items():
+            shape = (count, VECTOR_WIDTHS[name]) if name in VECTOR_WIDTHS else count
+            columns[name] = np.zeros(shape, dtype=dtype)
+        return columns
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a cache written by save()
+
+        Returns:
+            ImageFeatureCache: The cache, or an empty one when the file is
+                missing or holds another FEATURE_VERSION
+        """
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path, allow_pickle=False) as data:
+            if (int(data['feature_version']) != FEATURE_VERSION or int(data['histogram_bits']) != HISTOGRAM_BITS
+                    or data['model_features'].shape[1:] != (len(MODEL_FEATURE_NAMES),)):
+                print("Image feature cache was built by another feature version; rebuilding")
+                return cls()
+            columns = {name: data[name] for name in ('content_hash', *COLUMNS)}
+            paths = {name: data[f"path_{name}"] for name in ('path', 'size', 'mtime_ns', 'content_hash')}
+        return cls(columns, paths)
+
+    def save(self, path):
+        """
+        Write the cache to an .npz file (written to a temporary file and
+        renamed, so readers never see a partial cache)
+        """
+        arrays = dict(self.columns)
+        arrays.update({f"path_{name}": values for name, values in self.paths.items()})
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, feature_version=FEATURE_VERSION, histogram_bits=HISTOGRAM_BITS, **arrays)
+        os.replace(tmp_path, path)
+
+    def update(self, paths, workers=None, chunksize=16):
+        """
+        Bring the cache up to date with a set of image files
+
+        Files whose size and modification time are unchanged keep their
+        content hash; the rest are hashed. Content that is not cached yet is
+        decoded once, however many files hold it. Rows of content that no
+        longer appears in paths are dropped.
+
+        Args:
+            paths (list): Image file paths (the whole corpus)
+            workers (int): Pool processes (default os.cpu_count(); 0 runs
+                in this process)
+            chunksize (int): Files handed to a worker at a time
+
+        Returns:
+            dict: files, distinct, duplicates, hashed, extracted, failed,
+                seconds and images_per_sec (extracted images per second)
+        """
+        start = time.perf_counter()
+        paths = list(paths)
+        known = {path: (size, mtime_ns, digest) for path, size, mtime_ns, digest in zip(
+            self.paths['path'].tolist(), self.paths['size'].tolist(),
+            self.paths['mtime_ns'].tolist(), self.paths['content_hash'].tolist())}
+
+        entries = {}
+        to_hash = []
+        for path in paths:
+            stat = os.stat(path)
+            cached = known.get(path)
+            if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+                entries[path] = (stat.st_size, stat.st_mtime_ns, cached[2])
+            else:
+                to_hash.append(path)
+
+        workers = os.cpu_count() if workers is None else workers
+        pool = ProcessPoolExecutor(workers) if workers > 0 else None
+        try:
+            run = (lambda fn, items: pool.map(fn, items, chunksize=chunksize)) if pool else map
+            for path, size, mtime_ns, digest in run(hash_file, to_hash):
+                entries[path] = (size, mtime_ns, digest)
+
+            # One representative file per distinct content
+            distinct = {}
+            for path in paths:
+                distinct.setdefault(entries[path][2], path)
+            missing = [digest for digest in distinct if digest not in self._rows]
+            extract_start = time.perf_counter()
+            rows = list(run(extract_features, [distinct[digest] for digest in missing]))
+            extract_seconds = time.perf_counter() - extract_start
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        # Rebuild the columns: kept rows in their old order, then new ones
+        kept = [self._rows[digest] for digest in distinct if digest in self._rows]
+        columns = self._empty_columns(len(kept) + len(missing))
+        for name, values in self.columns.items():
+            columns[name][:len(kept)] = values[kept]
+        columns['content_hash'][len(kept):] = missing
+        for name in COLUMNS:
+            if rows:
+                columns[name][len(kept):] = np.array([row[name] for row in rows], dtype=COLUMNS[name])
+        self.columns = columns
+        self._rows = {digest: row for row, digest in enumerate(columns['content_hash'].tolist())}
+        self.paths = {
+            'path': np.array(paths, dtype=str),
+            'size': np.array([entries[path][0] for path in paths], dtype=np.int64),
+            'mtime_ns': np.array([entries[path][1] for path in paths], dtype=np.int64),
+            'content_hash': np.array([entries[path][2] for path in paths], dtype=HASH_DTYPE),
+        }
+
+        return {
+            'files': len(paths),
+            'distinct': len(distinct),
+            'duplicates': len(paths) - len(distinct),
+            'hashed': len(to_hash),
+            'extracted': len(rows),
+            'failed': sum(not row['valid'] for row in rows),
+            'seconds': time.perf_counter() - start,
+            'images_per_sec': len(rows) / extract_seconds if rows else 0.0,
+        }
+
+    def features_for(self, paths):
+        """
+        Feature rows of files covered by the last update
+
+        Args:
+            paths (list): File paths
+
+        Returns:
+            dict: Each feature column indexed to the given paths
+        """
+        hash_of_path = dict(zip(self.paths['path'].tolist(), self.paths['content_hash'].tolist()))
+        rows = np.array([self._rows[hash_of_path[path]] for path in paths], dtype=np.int64)
+        return {name: values[rows] for name, values in self.columns.items()}
@@ -0,0 +1,246 @@
+"""
+Pixel statistics shared by the image analysis features
+
+Colours are packed into 24-bit integers so distinct colours can be counted
+with a bitmap lookup instead of a row-wise sort of every pixel.
+"""
+
+import functools
+import numpy as np
+
+# Pixels packed and checked against the bitmap per step
+CHUNK_PIXELS = 1 << 16
+
+# Pixels in the strided sample checked first; a photo usually exceeds any
+# small colour limit within it
+SAMPLE_PIXELS = 1 << 12
+
+
+def pack_rgb(pixels):
+    """
+    Pack an (N, 3) uint8 RGB array into N 24-bit colour integers
+    """
+    pixels = pixels.astype(np.uint32)
+    return (pixels[:, 0] << 16) | (pixels[:, 1] << 8) | pixels[:, 2]
+
+
+def color_statistics(img_array, max_colors=None, histogram_bits=None):
+    """
+    Count distinct colours and optionally build a colour histogram
+
+    Args:
+        img_array (np.ndarray): (H, W, 3) uint8 RGB image
+        max_colors (int): Stop counting once this many distinct colours are
+            found; the count is then a lower bound
+        histogram_bits (int): Bits kept per channel for the histogram
+            (e.g. 4 gives 4096 bins); None skips the histogram
+
+    Returns:
+        dict: unique_colors (int), complete (bool, False when counting
+            stopped early at max_colors) and histogram (normalized
+            np.ndarray of 2 ** (3 * histogram_bits) bins, or None)
+    """
+    pixels = img_array.reshape(-1, 3)
+    if max_colors is None:
+        # A full count: one scatter into a byte per possible colour (16 MB,
+        # zeroed lazily by the OS) beats deduplicating chunk by chunk
+        packed = pack_rgb(pixels)
+        seen = np.zeros(1 << 24, dtype=bool)
+        seen[packed] = True
+        return {
+            'unique_colors': int(np.count_nonzero(seen)),
+            'complete': True,
+            'histogram': _packed_histogram(packed, histogram_bits) if histogram_bits is not None else None
+        }
+
+    # One bit per possible colour (2 MB)
+    seen = np.zeros(1 << 21, dtype=np.uint8)
+    unique_colors = 0
+
+    def add(colors):
+        nonlocal unique_colors
+        bits = (1 << (colors & 7)).astype(np.uint8)
+        new = np.unique(colors[(seen[colors >> 3] & bits) == 0])
+        np.bitwise_or.at(seen, new >> 3, (1 << (new & 7)).astype(np.uint8))
+        unique_colors += len(new)
+        return max_colors is not None and unique_colors >= max_colors
+
+    # Any subset has at most as many colours as the whole image, so a
+    # strided sample settles the limit for most photos without a full pass
+    step = max(len(pixels) // SAMPLE_PIXELS, 1)
+    stopped = add(pack_rgb(pixels[::step]))
+    for start in range(0, len(pixels), CHUNK_PIXELS):
+        if stopped:
+            break
+        stopped = add(pack_rgb(pixels[start:start + CHUNK_PIXELS]))
+
+    histogram = None
+    if histogram_bits is not None:
+        histogram = color_histogram(pixels, histogram_bits)
+
+    return {
+        'unique_colors': unique_colors,
+        'complete': not stopped,
+        'histogram': histogram
+    }
+
+
+def color_histogram(pixels, bits=4):
+    """
+    Normalized joint RGB histogram keeping the top `bits` bits per channel
+
+    Args:
+        pixels (np.ndarray): (N, 3) uint8 RGB array
+        bits (int): Bits kept per channel
+
+    Returns:
+        np.ndarray: float64 array of 2 ** (3 * bits) bins summing to 1
+    """
+    shift = 8 - bits
+    quantized = (pixels >> shift).astype(np.uint32)
+    bins = (quantized[:, 0] << (2 * bits)) | (quantized[:, 1] << bits) | quantized[:, 2]
+    counts = np.bincount(bins, minlength=1 << (3 * bits))
+    return counts / max(len(pixels), 1)
+
+
+def _packed_histogram(packed, bits):
+    """color_histogram of pixels already packed by pack_rgb"""
+    shift = 8 - bits
+    mask = (1 << bits) - 1
+    bins = ((((packed >> (16 + shift)) & mask) << (2 * bits))
+            | (((packed >> (8 + shift)) & mask) << bits)
+            | ((packed >> shift) & mask))
+    counts = np.bincount(bins, minlength=1 << (3 * bits))
+    return counts / max(len(packed), 1)
+
+
+def dhash(img_array, hash_size=8):
+    """
+    Difference hash of an RGB image
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale grid and
+    each bit records whether a cell is brighter than its right neighbour.
+    Recompression, rescaling and small crops flip only a few bits, so near
+    duplicates are within a small Hamming distance of each other.
+
+    Args:
+        img_array (np.ndarray): (H, W, 3) uint8 RGB image
+        hash_size (int): Grid height; the hash has hash_size ** 2 bits
+
+    Returns:
+        int: hash_size ** 2 bit hash
+    """
+    from PIL import Image
+
+    grid = Image.fromarray(img_array).convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    cells = np.asarray(grid, dtype=np.int16)
+    bits = (cells[:, 1:] > cells[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+# Side the image is subsampled towards before the model features are
+# computed (and the size of the centre crop the spectrum is taken of)
+MODEL_FEATURE_SIZE = 128
+
+# Bits per channel of the coarse histogram among the model features
+MODEL_HISTOGRAM_BITS = 2
+
+# Upper edges of the radial spatial-frequency bands, in cycles per pixel
+SPECTRUM_BANDS = (1 / 16, 1 / 8, 1 / 4)
+
+MODEL_FEATURE_NAMES = (
+    'log_width', 'log_height', 'log_aspect_ratio',
+    'log_file_size', 'log_bytes_per_pixel',
+    'mean_r', 'mean_g', 'mean_b', 'std_r', 'std_g', 'std_b',
+    'saturation_mean', 'saturation_std',
+    'log_unique_colors', 'histogram_entropy', 'gradient_mean',
+    *(f"log_spectrum_band_{band}" for band in range(len(SPECTRUM_BANDS) + 1)),
+    *(f"histogram_{bin}" for bin in range(1 << (3 * MODEL_HISTOGRAM_BITS))),
+)
+
+
+@functools.lru_cache(maxsize=64)
+def _spectrum_bands(shape):
+    """SPECTRUM_BANDS band of every rfft2 coefficient of an array of this shape"""
+    radius = np.hypot(np.fft.fftfreq(shape[0])[:, None], np.fft.rfftfreq(shape[1])[None, :])
+    return np.searchsorted(SPECTRUM_BANDS, radius.ravel())
+
+
+def _halve_histogram(histogram):
+    """
+    Merge pairs of bins along each axis of a cubic joint histogram (one bit
+    less per channel); adding strided slices beats a multi-axis sum
+    """
+    histogram = histogram[0::2] + histogram[1::2]
+    histogram = histogram[:, 0::2] + histogram[:, 1::2]
+    return histogram[:, :, 0::2] + histogram[:, :, 1::2]
+
+
+def model_features(image, width, height, file_size):
+    """
+    Colour, compression, dimension and frequency features for the image model
+
+    Pixel features are computed on the image subsampled by an integer
+    factor to roughly MODEL_FEATURE_SIZE, so they cost a fraction of
+    decoding it.
+
+    Args:
+        image (PIL.Image.Image): Decoded RGB image (possibly draft-reduced)
+        width (int): Full-size width from the header
+        height (int): Full-size height from the header
+        file_size (int): Bytes in the file
+
+    Returns:
+        np.ndarray: float64 vector in MODEL_FEATURE_NAMES order
+    """
+    from PIL import Image
+
+    factor = max(min(image.size) // MODEL_FEATURE_SIZE, 1)
+    if factor > 1:
+        # Nearest-neighbour subsampling: a quarter of the cost of box
+        # averaging, and it keeps the pixel-level noise and compression
+        # artifacts the frequency features look for
+        image = image.resize((image.width // factor, image.height // factor), Image.NEAREST)
+    small = np.asarray(image)
+    packed = pack_rgb(small.reshape(-1, 3))
+    # One contiguous row per channel: reductions along a row are several
+    # times faster than across the columns of an (N, 3) array
+    channels = small.reshape(-1, 3).T.astype(np.float32, order='C') / 255
+    red, green, blue = channels
+
+    # Colour
+    channel_max = np.maximum(np.maximum(red, green), blue)
+    channel_min = np.minimum(np.minimum(red, green), blue)
+    saturation = np.where(channel_max > 0, 1 - channel_min / np.maximum(channel_max, 1e-6), 0)
+    # One 5-bit histogram; the 4- and 2-bit ones are sums of its bins
+    histogram5 = _packed_histogram(packed, 5).reshape(32, 32, 32)
+    unique_colors = np.count_nonzero(histogram5)
+    fine = _halve_histogram(histogram5)
+    coarse = fine
+    for _ in range(4 - MODEL_HISTOGRAM_BITS):
+        coarse = _halve_histogram(coarse)
+    fine = fine[fine > 0]
+    entropy = float(-(fine * np.log2(fine)).sum())
+    coarse = coarse.ravel()
+
+    # Frequency: gradient energy, and the share of spectral energy per band
+    # in the centre crop
+    gray = (0.299 * red + 0.587 * green + 0.114 * blue).reshape(small.shape[:2])
+    gradient = (np.abs(np.diff(gray, axis=0)).mean() if gray.shape[0] > 1 else 0) + \
+               (np.abs(np.diff(gray, axis=1)).mean() if gray.shape[1] > 1 else 0)
+    top = max((gray.shape[0] - MODEL_FEATURE_SIZE) // 2, 0)
+    left = max((gray.shape[1] - MODEL_FEATURE_SIZE) // 2, 0)
+    crop = gray[top:top + MODEL_FEATURE_SIZE, left:left + MODEL_FEATURE_SIZE]
+    power = np.abs(np.fft.rfft2(crop - crop.mean())) ** 2
+    energy = np.bincount(_spectrum_bands(crop.shape), weights=power.ravel(), minlength=len(SPECTRUM_BANDS) + 1)
+    energy = energy / energy.sum() if energy.sum() > 0 else energy
+
+    pixel_count = max(width * height, 1)
+    return np.concatenate([
+        [np.log(max(width, 1)), np.log(max(height, 1)), np.log(max(width, 1) / max(height, 1)),
+         np.log(max(file_size, 1)), np.log(max(file_size, 1) / pixel_count)],
+        channels.mean(axis=1), channels.std(axis=1),
+        [saturation.mean(), saturation.std(), np.log(unique_colors), entropy, gradient],
+        np.log10(energy + 1e-8),
+        np.sqrt(coarse),
+    ]).astype(np.float64)
@@ -0,0 +1,132 @@
+"""
+Near-duplicate image lookup by perceptual hash
+
+Image scores are stored under the 64-bit dHash of the image. A lookup
+returns the score of any stored image within a small Hamming distance, so
+re-uploads with different compression, scaling or slight crops reuse the
+earlier score instead of running the pixel features again.
+
+Lookups use a multi-index hash table: the hash is split into
+max_distance + 1 chunks, and by the pigeonhole principle any hash within
+max_distance bits agrees exactly with the query on at least one chunk.
+Only the entries sharing a chunk value are compared bit by bit.
+"""
+
+import os
+import threading
+import numpy as np
+
+HASH_BITS = 64
+
+
+class ImageHashIndex:
+    """
+    Thread-safe Hamming-distance index from image hashes to image scores
+    """
+
+    def __init__(self, max_distance=4, max_entries=200000, version=None):
+        """
+        Args:
+            max_distance (int): Largest Hamming distance treated as the same image
+            max_entries (int): New hashes are ignored once the index holds this many
+            version (str): Image scoring version the stored scores were computed with
+        """
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.version = version
+        bounds = np.linspace(0, HASH_BITS, max_distance + 2).astype(int)
+        self._chunks = [(int(lo), (1 << int(hi - lo)) - 1) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self._tables = [{} for _ in self._chunks]
+        self._hashes = []
+        self._scores = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def _keys(self, image_hash):
+        return [(image_hash >> shift) & mask for shift, mask in self._chunks]
+
+    def find(self, image_hash):
+        """
+        Find the closest stored image within max_distance
+
+        Args:
+            image_hash (int): 64-bit dHash
+
+        Returns:
+            tuple: (score, distance) of the closest match, or None
+        """
+        best = None
+        with self._lock:
+            seen = set()
+            for table, key in zip(self._tables, self._keys(image_hash)):
+                for entry in table.get(key, ()):
+                    if entry in seen:
+                        continue
+                    seen.add(entry)
+                    distance = (self._hashes[entry] ^ image_hash).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (self._scores[entry], distance)
+                        if distance == 0:
+                            return best
+        return best
+
+    def add(self, image_hash, score):
+        """
+        Store the score of an image
+
+        Exact duplicates of a stored hash are not added again.
+
+        Returns:
+            bool: True if the hash was added
+        """
+        keys = self._keys(image_hash)
+        with self._lock:
+            if len(self._hashes) >= self.max_entries:
+                return False
+            if any(self._hashes[entry] == image_hash for entry in self._tables[0].get(keys[0], ())):
+                return False
+            entry = len(self._hashes)
+            self._hashes.append(image_hash)
+            self._scores.append(int(score))
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, []).append(entry)
+        return True
+
+    def save(self, path):
+        """
+        Write the index to an .npz file (written to a temporary file and
+        renamed, so readers never see a partial index)
+        """
+        with self._lock:
+            hashes = np.array(self._hashes, dtype=np.uint64)
+            scores = np.array(self._scores, dtype=np.int16)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, hashes=hashes, scores=scores,
+                     max_distance=self.max_distance, version=str(self.version or ''))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, version=None, max_entries=200000):
+        """
+        Read an index written by save()
+
+        Args:
+            path (str): .npz file
+            version (str): Expected image scoring version; an index built by a
+                different version holds stale scores and is not loaded
+
+        Returns:
+            ImageHashIndex: The loaded index, or None if it is stale
+        """
+        with np.load(path) as data:
+            saved_version = str(data['version'])
+            if version is not None and saved_version != version:
+                return None
+            index = cls(max_distance=int(data['max_distance']), max_entries=max_entries,
+                        version=saved_version)
+            for image_hash, score in zip(data['hashes'].tolist(), data['scores'].tolist()):
+                index.add(image_hash, score)
+        return index
@@ -0,0 +1,97 @@
+"""
+Logistic regression image model over model_features
+
+train.py fits it on the feature cache of the labelled image datasets (see
+image_feature_cache.py) and saves it as plain arrays in one .npz file, so
+loading it unpickles nothing: the feature names, the standardization
+(mean and scale per feature), the coefficients and the intercept. Scoring
+a batch of images is one matrix product, microseconds per image next to
+the milliseconds it takes to decode one.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from .image_features import MODEL_FEATURE_NAMES
+
+IMAGE_MODEL_FILE = 'image_model.npz'
+FORMAT_VERSION = 1
+
+
+class ImageModel:
+    """Standardized logistic regression giving P(fake) per feature row"""
+
+    def __init__(self, feature_names, mean, scale, coef, intercept, metrics=None):
+        """
+        Args:
+            feature_names (list): Feature order the model was fitted with
+            mean (np.ndarray): Per-feature mean subtracted before scoring
+            scale (np.ndarray): Per-feature standard deviation divided by
+            coef (np.ndarray): Coefficient per standardized feature
+            intercept (float): Logistic regression intercept
+            metrics (dict): Evaluation results recorded at training time
+        """
+        if tuple(feature_names) != MODEL_FEATURE_NAMES:
+            raise ValueError("Image model was trained on other features; retrain it with train.py")
+        self.feature_names = tuple(feature_names)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.metrics = metrics or {}
+        # Folding the standardization into the weights leaves one product
+        self._weights = self.coef / self.scale
+        self._bias = self.intercept - float(self.mean @ self._weights)
+        digest = hashlib.sha256()
+        for array in (self.mean, self.scale, self.coef, np.array([self.intercept])):
+            digest.update(array.tobytes())
+        self.version = digest.hexdigest()[:16]
+
+    @classmethod
+    def from_sklearn(cls, scaler, classifier, metrics=None):
+        """
+        Build from a fitted StandardScaler and binary LogisticRegression
+        (class 1 = fake)
+        """
+        if list(classifier.classes_) != [0, 1]:
+            raise ValueError("Image classifier must be fitted on labels 0 (real) and 1 (fake)")
+        return cls(MODEL_FEATURE_NAMES, scaler.mean_, scaler.scale_, classifier.coef_[0],
+                   classifier.intercept_[0], metrics)
+
+    def save(self, path):
+        """
+        Write the model to an .npz file (written to a temporary file and
+        renamed, so a reader never sees a partial model)
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, format_version=FORMAT_VERSION, feature_names=np.array(self.feature_names),
+                     mean=self.mean, scale=self.scale, coef=self.coef, intercept=self.intercept,
+                     metrics=json.dumps(self.metrics))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Read a model written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"{path} is not a version {FORMAT_VERSION} image model")
+            return cls(data['feature_names'].tolist(), data['mean'], data['scale'], data['coef'],
+                       float(data['intercept']), json.loads(str(data['metrics'])))
+
+    def predict_proba(self, features):
+        """
+        Probability that each image is fake
+
+        Args:
+            features (np.ndarray): (n, len(MODEL_FEATURE_NAMES)) rows from
+                model_features
+
+        Returns:
+            np.ndarray: n probabilities
+        """
+        scores = np.atleast_2d(features) @ self._weights + self._bias
+        with np.errstate(over='ignore'):
+            return 1 / (1 + np.exp(-scores))
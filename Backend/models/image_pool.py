@@ -0,0 +1,215 @@
+"""
+Process pool for CPU-bound image scoring
+
+Decoding and pixel statistics hold the GIL for long stretches, so a large
+upload analyzed in a request thread stalls every other request served by
+the same process. With an ImagePool the work runs in worker processes
+instead, and the request thread only waits for the result.
+
+Upload bytes are copied once into a shared memory block that the worker
+reads in place, so they are never pickled through the pool's pipe.
+"""
+
+import io
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+# Score reported when a worker fails or exceeds its timeout (same as an
+# image that cannot be analyzed)
+FALLBACK_SCORE = 40
+
+# Bytes copied from the upload into shared memory per read
+COPY_CHUNK_SIZE = 1 << 20
+
+
+class SharedBufferStream(io.RawIOBase):
+    """Seekable read-only file over a buffer, read without copying it first"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        data = self._buffer[self._position:self._position + len(b)]
+        b[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        self._position = max(offset, 0)
+        return self._position
+
+    def tell(self):
+        return self._position
+
+
+def _score_shared_image(name, size, with_features=False, max_pixels=None):
+    """Worker entry point: score the image held in a shared memory block"""
+    from .deception_detector import score_image
+
+    # Workers share the parent's resource tracker, where the parent already
+    # registered the block, so attaching here does not change its lifetime
+    block = shared_memory.SharedMemory(name=name)
+    buffer = block.buf[:size]
+    try:
+        if max_pixels is None:
+            return score_image(SharedBufferStream(buffer), with_features=with_features)
+        return score_image(SharedBufferStream(buffer), with_features=with_features, max_pixels=max_pixels)
+    finally:
+        buffer.release()
+        block.close()
+
+
+class PendingImage:
+    """An image scoring task running in the pool"""
+
+    def __init__(self, pool, executor, future, block, args, timeout):
+        self._pool = pool
+        self._executor = executor
+        self._future = future
+        self._block = block
+        self._args = args
+        self._timeout = timeout
+
+    def result(self):
+        """
+        Wait for the task
+
+        Returns:
+            tuple: As returned by score_image; on timeout or worker failure
+                (FALLBACK_SCORE, None)
+        """
+        try:
+            try:
+                return self._future.result(timeout=self._timeout)
+            except BrokenProcessPool:
+                # The workers were stopped while this image waited on them
+                # (one died, or another image timed out): run it once more
+                self._executor, self._future = self._pool._start(self._block.name, *self._args)
+                return self._future.result(timeout=self._timeout)
+        except FutureTimeoutError:
+            # A running task cannot be cancelled, so stop the workers
+            # rather than leave this one busy in the background
+            self._pool._recycle(self._executor)
+            print(f"Image analysis timed out after {self._timeout}s")
+            return FALLBACK_SCORE, None
+        except Exception as e:
+            print(f"Error in image worker: {str(e)}")
+            return FALLBACK_SCORE, None
+        finally:
+            self._block.close()
+            self._block.unlink()
+
+
+class ImagePool:
+    """
+    Lazily started process pool for score_image
+
+    The executor is created on first use in the process that uses it, so a
+    pool configured before a pre-fork server forks (gunicorn preload_app)
+    starts separate workers in each server worker. When an image times out,
+    the executor's workers are terminated and the next image starts a new
+    one; images still waiting on the old workers are submitted again.
+    """
+
+    def __init__(self, workers, timeout=10):
+        """
+        Args:
+            workers (int): Worker processes
+            timeout (float): Seconds to wait for one image before giving up
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # spawn: forking a threaded server process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, stream, with_features=False, max_pixels=None):
+        """
+        Copy an upload into shared memory and start scoring it
+
+        Args:
+            stream: Seekable binary file (e.g. FileStorage.stream)
+            with_features (bool): Also compute the image model's features
+                (see score_image)
+            max_pixels (int): Decoding budget passed to score_image
+                (default: score_image's)
+
+        Returns:
+            PendingImage: Call result() to wait for the score_image result
+        """
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            offset = 0
+            while offset < size:
+                chunk = stream.read(min(COPY_CHUNK_SIZE, size - offset))
+                if not chunk:
+                    break
+                block.buf[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+            stream.seek(0)
+            args = (offset, with_features, max_pixels)
+            executor, future = self._start(block.name, *args)
+        except Exception:
+            block.close()
+            block.unlink()
+            raise
+        return PendingImage(self, executor, future, block, args, self.timeout)
+
+    def _start(self, name, size, with_features, max_pixels):
+        """Submit the image in a shared memory block; returns (executor, future)"""
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(_score_shared_image, name, size, with_features, max_pixels)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool
+            self._recycle(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(_score_shared_image, name, size, with_features, max_pixels)
+
+    def _recycle(self, executor):
+        """Terminate an executor's workers; the next submission starts a new executor"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # ProcessPoolExecutor has no public way to stop running workers
+        # before Python 3.14; the executor then fails its other pending tasks
+        # with BrokenProcessPool and reaps the processes
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False)
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,299 @@
+"""
+In-process metrics exposed in the Prometheus text format
+
+Counters, gauges and fixed-bucket histograms cheap enough to record on
+every request. Each thread updates its own array of counts, so recording
+takes no lock: a value is only written by the thread that owns it. The
+arrays are summed when the metrics are rendered (GET /api/metrics), and
+the counts of finished threads are folded into a running total.
+
+Every process keeps its own metrics. With several Gunicorn workers, each
+scrape sees the worker that answered it; scrape the workers individually
+or put one worker per container.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+IMAGE_BYTES_BUCKETS = (10e3, 50e3, 100e3, 250e3, 500e3, 1e6, 2.5e6, 5e6, 10e6, 16e6)
+
+
+class _Shards:
+    """
+    Per-thread arrays of counts, summed when collected
+
+    A thread's array is registered once, under the lock, the first time
+    the thread records a value; after that only the owning thread writes it.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, values)
+        self._retired = [0] * size
+
+    def local(self):
+        """The calling thread's array (the hot path reads _local.values directly)"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0] * self._size
+            with self._lock:
+                self._retire()
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _retire(self):
+        # Finished threads no longer write their arrays: fold them into the total
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                self._retired = [a + b for a, b in zip(self._retired, values)]
+        self._shards = live
+
+    def total(self):
+        with self._lock:
+            self._retire()
+            total = list(self._retired)
+            for _, values in self._shards:
+                total = [a + b for a, b in zip(total, values)]
+        return total
+
+
+class _CounterChild:
+    __slots__ = ('_shards', '_local')
+
+    def __init__(self):
+        self._shards = _Shards(1)
+        self._local = self._shards._local
+
+    def inc(self, amount=1):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shards.local()
+        values[0] += amount
+
+    def value(self):
+        return self._shards.total()[0]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shards.local()
+        values[0] -= amount
+
+    def track(self):
+        """Context manager: +1 while the block runs"""
+        return _Tracked(self)
+
+
+class _Tracked:
+    __slots__ = ('_gauge',)
+
+    def __init__(self, gauge):
+        self._gauge = gauge
+
+    def __enter__(self):
+        self._gauge.inc()
+
+    def __exit__(self, *exc_info):
+        self._gauge.dec()
+
+
+class _HistogramChild:
+    __slots__ = ('_bounds', '_shards', '_local')
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        # One count per bucket, one for +Inf, then the sum of the values
+        self._shards = _Shards(len(bounds) + 2)
+        self._local = self._shards._local
+
+    def observe(self, value):
+        try:
+            values = self._local.values
+        except AttributeError:
+            values = self._shards.local()
+        values[bisect_left(self._bounds, value)] += 1
+        values[-1] += value
+
+    def time(self):
+        """Context manager observing the seconds the block takes"""
+        return _Timer(self)
+
+    def snapshot(self):
+        """
+        Returns:
+            tuple: (cumulative bucket counts including +Inf, sum)
+        """
+        values = self._shards.total()
+        cumulative, running = [], 0
+        for count in values[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, values[-1]
+
+
+class _Timer:
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+class Metric:
+    """
+    A named metric with optional labels
+
+    labels(...) returns the child for one combination of label values;
+    bind children used on hot paths once, outside the path. A metric
+    without labels can be used directly (inc, observe, ...).
+    """
+
+    def __init__(self, kind, name, documentation, labelnames=(), buckets=None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(bound) for bound in buckets) if buckets else None
+        self._children = {}
+        self._lookup = {}  # label values as passed -> child
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            default = self.labels()
+            for method in ('inc', 'dec', 'track', 'observe', 'time', 'value'):
+                if hasattr(default, method):
+                    setattr(self, method, getattr(default, method))
+
+    def labels(self, *values, **by_name):
+        if by_name:
+            values = tuple(by_name[name] for name in self.labelnames)
+        child = self._lookup.get(values)
+        if child is None:
+            child = self._lookup[values] = self._child(tuple(str(value) for value in values))
+        return child
+
+    def _child(self, key):
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                if self.kind == 'histogram':
+                    child = _HistogramChild(self.buckets)
+                elif self.kind == 'gauge':
+                    child = _GaugeChild()
+                else:
+                    child = _CounterChild()
+                self._children[key] = child
+        return child
+
+    def render(self):
+        """Lines of the Prometheus text format for this metric"""
+        lines = [f"# HELP {self.name} {_escape_help(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = sorted(self._children.items(), key=lambda item: item[0])
+        for key, child in children:
+            labels = [f'{name}="{_escape_label(value)}"' for name, value in zip(self.labelnames, key)]
+            if self.kind != 'histogram':
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value())}")
+                continue
+            cumulative, total = child.snapshot()
+            for bound, count in zip(self.buckets + (float('inf'),), cumulative):
+                le = 'le="{}"'.format('+Inf' if bound == float('inf') else _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [le])} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative[-1]}")
+        return lines
+
+
+class Registry:
+    """The metrics of one process, rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, kind, name, documentation, labelnames=(), buckets=None):
+        with self._lock:
+            if name in self._metrics:
+                raise ValueError(f"Metric {name} is already registered")
+            metric = self._metrics[name] = Metric(kind, name, documentation, labelnames, buckets)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register('counter', name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register('gauge', name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register('histogram', name, documentation, labelnames, buckets)
+
+    def render(self):
+        """
+        Returns:
+            str: Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.render()) + '\n'
+
+
+def _escape_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'deceptra_stage_seconds', 'Time spent in each stage of an analysis request', ('stage',))
+REQUESTS = REGISTRY.counter(
+    'deceptra_http_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'deceptra_http_request_duration_seconds', 'HTTP request latency by endpoint', ('endpoint',))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'deceptra_http_requests_in_flight', 'HTTP requests being handled')
+ANALYSES_IN_FLIGHT = REGISTRY.gauge(
+    'deceptra_analyses_in_flight', 'Analyses being computed (result cache misses)')
+VERDICTS = REGISTRY.counter(
+    'deceptra_verdicts_total', 'Analysis results served by verdict', ('verdict',))
+SKIPPED_STAGES = REGISTRY.counter(
+    'deceptra_skipped_stages_total', 'Analysis stages skipped by cascade scoring', ('stage',))
+IMAGE_BYTES = REGISTRY.histogram(
+    'deceptra_image_upload_bytes', 'Size of analyzed image uploads', buckets=IMAGE_BYTES_BUCKETS)
@@ -0,0 +1,223 @@
+"""
+On-demand cProfile capture of live requests
+
+A RequestProfiler is armed for the next N requests or for a time window
+(POST /api/admin/profile), or forced for a single request (the X-Profile
+header, outside production). While it is disarmed, checking it is one
+attribute read.
+
+A captured request is written to the profile directory twice:
+
+- <name>.pstats: the cProfile statistics, for pstats, snakeviz and similar
+  viewers (python -m pstats <name>.pstats)
+- <name>.collapsed: collapsed stacks ("frame;frame;frame microseconds"
+  per line) for flamegraph.pl, speedscope or inferno
+
+cProfile records caller-callee pairs rather than whole stacks, so the
+collapsed stacks split a function's time between its callers in
+proportion to the time each call site spent in it. Functions called from
+several places may therefore be attributed approximately.
+
+One request is profiled at a time per process. A request that arrives
+while another one is being profiled is served normally and does not use
+up one of the armed requests.
+"""
+
+import os
+import time
+import pstats
+import cProfile
+import threading
+from collections import defaultdict
+
+# Largest number of requests or seconds one arming may cover
+MAX_REQUESTS = 1000
+MAX_SECONDS = 3600
+
+# Collapsed stack paths whose share of the profile is below this many
+# microseconds are not followed further
+MIN_STACK_MICROSECONDS = 1
+
+# File names of recent captures reported by status()
+RECENT_CAPTURES = 20
+
+
+class RequestProfiler:
+    """Arms cProfile for a number of requests or a time window"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.armed = False
+        self._remaining = None
+        self._deadline = None
+        self._lock = threading.Lock()
+        self._busy = threading.Lock()
+        self._sequence = 0
+        self.recent = []
+
+    def arm(self, requests=None, seconds=None):
+        """
+        Profile the next requests analyze requests, or every request for
+        the next seconds seconds (one at a time)
+
+        Raises:
+            ValueError: For anything but exactly one valid limit
+        """
+        if (requests is None) == (seconds is None):
+            raise ValueError("Give either requests or seconds")
+        if requests is not None and (isinstance(requests, bool) or not isinstance(requests, int)
+                                     or not 1 <= requests <= MAX_REQUESTS):
+            raise ValueError(f"requests must be an integer from 1 to {MAX_REQUESTS}")
+        if seconds is not None and not (isinstance(seconds, (int, float)) and 0 < seconds <= MAX_SECONDS):
+            raise ValueError(f"seconds must be above 0 and at most {MAX_SECONDS}")
+        with self._lock:
+            self._remaining = requests
+            self._deadline = time.monotonic() + seconds if seconds is not None else None
+            self.armed = True
+        return self.status()
+
+    def disarm(self):
+        with self._lock:
+            self.armed = False
+            self._remaining = self._deadline = None
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            self._expire()
+            return {
+                'armed': self.armed,
+                'remaining_requests': self._remaining,
+                'remaining_seconds': round(max(self._deadline - time.monotonic(), 0), 1)
+                                     if self._deadline is not None else None,
+                'directory': self.directory,
+                'recent': list(self.recent),
+            }
+
+    def _expire(self):
+        if self.armed and self._deadline is not None and time.monotonic() >= self._deadline:
+            self.armed = False
+            self._deadline = None
+
+    def begin(self, forced=False):
+        """
+        Start profiling the calling request if armed (or forced)
+
+        Returns:
+            ProfileSession: Use as a context manager around the request,
+                or None when this request is not profiled
+        """
+        if not (self.armed or forced):
+            return None
+        if not self._busy.acquire(blocking=False):
+            return None
+        with self._lock:
+            self._expire()
+            if not forced:
+                if not self.armed:
+                    self._busy.release()
+                    return None
+                if self._remaining is not None:
+                    self._remaining -= 1
+                    if self._remaining <= 0:
+                        self.armed = False
+                        self._remaining = None
+            self._sequence += 1
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequence}"
+        return ProfileSession(self, name)
+
+    def _save(self, session):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, session.name)
+            stats = pstats.Stats(session.profile)
+            stats.dump_stats(path + '.pstats')
+            with open(path + '.collapsed', 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {weight}\n" for stack, weight in collapsed_stacks(stats.stats))
+            with self._lock:
+                self.recent = (self.recent + [session.name])[-RECENT_CAPTURES:]
+            return True
+        except Exception as e:
+            print(f"Error saving request profile: {str(e)}")
+            return False
+        finally:
+            self._busy.release()
+
+
+class ProfileSession:
+    """One profiled request; its files are written when the block exits"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.active = False
+        self.saved = False
+
+    def __enter__(self):
+        try:
+            self.profile.enable()
+            self.active = True
+        except ValueError as e:
+            # Another profiler (e.g. a debugger's) owns the interpreter's hook:
+            # serve the request unprofiled
+            print(f"Warning: Could not profile request: {str(e)}")
+            self.active = False
+            self.profiler._busy.release()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.active:
+            self.profile.disable()
+            self.saved = self.profiler._save(self)
+
+
+def frame_label(func):
+    """flamegraph frame name for a pstats function key"""
+    filename, line, name = func
+    if filename == '~':
+        label = name  # built-in
+    else:
+        label = f"{name} ({os.path.basename(filename)}:{line})"
+    # ';' separates frames; spaces are fine (the count follows the last one)
+    return label.replace(';', ',')
+
+
+def collapsed_stacks(stats):
+    """
+    Collapsed stacks from pstats data
+
+    Walks the call graph from the functions without a recorded caller. A
+    function's own time is attributed to each path reaching it in
+    proportion to the time its callers on that path spent calling it.
+    Recursive calls are not followed again.
+
+    Args:
+        stats (dict): pstats.Stats.stats
+
+    Returns:
+        list: (stack, microseconds) sorted by stack
+    """
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            # cProfile stores (cc, nc, tt, ct) per call site; plain profile an int
+            edge_time = edge[3] if isinstance(edge, tuple) else 0.0
+            callees[caller].append((func, edge_time))
+
+    weights = defaultdict(float)
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if not callers]
+    pending = [((func,), frame_label(func), 1.0) for func in roots]
+    while pending:
+        path, stack, share = pending.pop()
+        func = path[-1]
+        weights[stack] += stats[func][2] * share * 1e6
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = stats[callee][3]
+            if callee in path or callee_total <= 0:
+                continue
+            callee_share = share * min(edge_time / callee_total, 1.0)
+            if callee_share * callee_total * 1e6 >= MIN_STACK_MICROSECONDS:
+                pending.append((path + (callee,), f"{stack};{frame_label(callee)}", callee_share))
+
+    return sorted((stack, round(weight)) for stack, weight in weights.items() if round(weight) > 0)
@@ -0,0 +1,212 @@
+"""
+Content-addressed cache for analysis results
+
+Keys are hashes of everything a result depends on: the analyzed text, the
+image bytes, the metadata selection and the detector version. Bumping the
+detector version (new rules or model artifacts) therefore makes every old
+entry unreachable, and LRU/TTL eviction ages them out.
+"""
+
+import asyncio
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Bytes hashed per read when fingerprinting an image stream
+HASH_CHUNK_SIZE = 1 << 16
+
+
+def make_cache_key(version, text, image=None, use_followers=False, use_account_age=False,
+                   use_engagement_rate=False):
+    """
+    Build the cache key for one analyze() call
+
+    The text is hashed exactly as it will be analyzed (the endpoint already
+    strips it); any further normalization would change the score. The image
+    stream is hashed in chunks and rewound, so the upload is not copied.
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+
+    def update(data):
+        # Length-prefix every field so adjacent fields cannot run together
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+
+    update(version.encode('utf-8'))
+    update(text.encode('utf-8', 'surrogatepass'))
+    update(bytes([use_followers, use_account_age, use_engagement_rate]))
+
+    if image:
+        stream = image.stream
+        stream.seek(0)
+        image_digest = hashlib.sha256()
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            image_digest.update(chunk)
+        stream.seek(0)
+        update(image_digest.digest())
+    else:
+        update(b'')
+
+    return digest.hexdigest()
+
+
+class _Flight:
+    """A computation in progress that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and request coalescing
+
+    Concurrent get_or_compute() calls for the same key run the computation
+    once; the other callers block until it finishes and share its result.
+    """
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for key, computing and storing it on a miss
+
+        Args:
+            key (str): Cache key from make_cache_key
+            compute (callable): Produces the result when the key is missing
+
+        Returns:
+            dict: A copy of the cached or freshly computed result
+        """
+        state, value = self._begin(key)
+        if state == 'hit':
+            return value
+        if state == 'wait':
+            value.done.wait()
+            return self._shared_result(value)
+
+        try:
+            result = compute()
+        except Exception as e:
+            self._finish(key, value, error=e)
+            raise
+        return self._finish(key, value, result=result)
+
+    async def get_or_compute_async(self, key, compute):
+        """
+        get_or_compute for asyncio callers
+
+        compute is a coroutine function. Waiting for a computation started
+        by another caller (thread or coroutine) does not block the event loop.
+        """
+        state, value = self._begin(key)
+        if state == 'hit':
+            return value
+        if state == 'wait':
+            await asyncio.get_running_loop().run_in_executor(None, value.done.wait)
+            return self._shared_result(value)
+
+        try:
+            result = await compute()
+        except BaseException as e:
+            self._finish(key, value, error=e)
+            raise
+        return self._finish(key, value, result=result)
+
+    def _begin(self, key):
+        """
+        Look a key up
+
+        Returns:
+            tuple: ('hit', result copy), ('wait', flight) when another caller
+                is computing it, or ('lead', flight) when this caller must
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return 'hit', copy.deepcopy(result)
+                del self._entries[key]
+                self.expirations += 1
+
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return 'wait', flight
+            flight = self._in_flight[key] = _Flight()
+            self.misses += 1
+            return 'lead', flight
+
+    def _finish(self, key, flight, result=None, error=None):
+        """Publish the leader's result (or error) to waiters and the cache"""
+        if error is None:
+            flight.result = result
+            self._store(key, result)
+        else:
+            flight.error = error
+        with self._lock:
+            del self._in_flight[key]
+        flight.done.set()
+        return copy.deepcopy(result)
+
+    def _shared_result(self, flight):
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+
+    def _store(self, key, result):
+        """Insert a result, evicting least recently used entries over capacity"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached results"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: Size, capacity and hit/miss/eviction counters
+        """
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0
+            }
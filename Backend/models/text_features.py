@@ -0,0 +1,352 @@
+"""
+Single-pass feature extraction for the rule-based text scorer
+
+All keyword lists used by DeceptionDetector._analyze_text are compiled once
+into a single multi-pattern matcher, so every keyword hit comes from one scan
+of the lowercased text instead of one substring search per keyword.
+"""
+
+import re
+from itertools import repeat
+import numpy as np
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None  # Fall back to the regex matcher below
+
+# High-impact keywords for fake news/disasters
+HIGH_IMPACT_KEYWORDS = (
+    'breaking', 'major', 'devastating', 'catastrophic',  # Dramatic/sensational
+    'kill', 'dead', 'death', 'earthquake', 'explosion', 'crash',  # Disaster keywords
+    'breaking news', 'just happened', 'urgent alert',  # Breaking news style
+    'suspended', 'blocked', 'terminated', 'restricted',  # Account threat keywords
+    'exposed', 'revealed', 'finally revealed', 'hidden'  # Conspiracy/revelation
+)
+
+# Standard suspicious keywords
+STANDARD_KEYWORDS = (
+    'guaranteed', 'amazing', 'unbelievable', 'shocking', "don't miss",
+    'urgent', 'limited time', 'exclusive', 'click here', 'buy now',
+    'miracle', 'cure', 'work from home', 'easy money', 'make thousands',
+    'proven', 'doctor recommended', 'secret formula', 'act now',
+    'must see', 'this trick', 'hate this', 'you wont believe',
+    'only', 'never', 'always', 'can',  # Absolute statements (no 'will')
+    'secret', 'suppressed', 'covered up',  # Conspiracy language
+    'discovered', 'shocking truth', 'finally',  # Sensationalism
+    'claim your', 'free reward', 'select for', 'click the link',  # Scam language
+    # Security/account-related (moderate threat) - only in suspicious context
+    'verify', 'unusual', 'irregular',  # Verification keywords (more specific than 'confirm')
+    'security concern', 'login attempt', 'suspicious activity',  # Account threat
+    'potential issue',  # Risk warnings
+    'congratulations', 'selected', 'eligible',  # Targeted scams
+)
+
+# Financial/banking scam keywords
+BANKING_WORDS = ('pin', 'cvv', 'refund', 'tax', 'atm', 'bank', 'account', 'payment', 'billing')
+ACTION_WORDS = ('enter', 'release', 'unlock', 'claim', 'retrieve', 'access', 'submit', 'update')
+
+# Security-related phishing keywords
+SECURITY_WORDS = ('pin', 'cvv', 'password', 'verify', 'confirm')
+THREAT_WORDS = ('suspended', 'blocked', 'danger', 'threat')
+
+# Urgent/immediate action phrases common in scams
+URGENT_PHRASES = ('immediately', 'right now', 'act now', 'do not delay', 'expires soon', 'expires forever')
+
+# Research/citation vocabulary that marks factual content
+SCIENTIFIC_TERMS = ('research', 'study', 'found', 'published', 'data', 'analysis', 'journal', 'experiment')
+
+# Emotional/superlative words, matched against whole words only
+EMOTIONAL_WORDS = (
+    'best', 'worst', 'incredible', 'terrible', 'fantastic', 'disgusting',
+    'amazing', 'awful', 'love', 'hate', 'ugly', 'beautiful'
+)
+
+# Single-keyword checks used by the combo and cap rules
+COMBO_WORDS = ('congratulations', 'exclusive', 'reward', 'subscription', 'renew', 'click')
+
+# Case-sensitive URL markers; matched lowercased first, then confirmed on the raw text
+URL_MARKERS = ('http://', '.biz', '.xyz')
+
+ALARM_EMOJIS = ('🚨', '⚠️', '🔥', '😱')
+EMPHASIS_CHARS = ('*', '_', '~', '^')
+WORD_STRIP_CHARS = '.,!?;:'
+
+# Column order of the feature matrix built by TextFeatureExtractor.extract_matrix
+FEATURE_NAMES = (
+    'length', 'word_count', 'emoji_count', 'alarm_emojis', 'caps_words',
+    'high_impact_matches', 'standard_matches', 'has_reward_combo', 'has_subscription',
+    'exclamation_count', 'question_count', 'period_count', 'has_suspicious_url',
+    'has_banking', 'has_action', 'has_security', 'has_threat', 'emphasis_chars',
+    'emotional_matches', 'urgent_matches', 'has_numbers', 'has_percent', 'has_scientific',
+)
+
+
+def _trie_pattern(keywords):
+    """Build a regex source string matching the longest keyword at each position"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            # Greedy optional suffix keeps the longest keyword at this position
+            return '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern substring matcher with the same semantics as running
+    ``keyword in text`` for every keyword, but in a single scan.
+
+    Uses a pyahocorasick automaton when the package is installed. Otherwise
+    falls back to a trie-shaped regex inside a lookahead, which reports the
+    longest keyword starting at every position; the shorter keywords starting
+    there are its prefixes and are recovered from a precomputed table.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = tuple(sorted(set(keywords)))
+        self.index = {keyword: i for i, keyword in enumerate(self.keywords)}
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for i, keyword in enumerate(self.keywords):
+                self._automaton.add_word(keyword, i)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            self._pattern = re.compile('(?=(' + _trie_pattern(self.keywords) + '))')
+
+            # Indices of the keywords that are prefixes of each keyword (including itself)
+            self._prefixes = {
+                keyword: frozenset(j for j, other in enumerate(self.keywords) if keyword.startswith(other))
+                for keyword in self.keywords
+            }
+
+    def find(self, text):
+        """
+        Return the set of keywords occurring anywhere in text
+        """
+        return {self.keywords[i] for i in self.find_indices(text)}
+
+    def find_indices(self, text):
+        """
+        Return the set of indices into self.keywords occurring anywhere in text
+        """
+        if self._automaton is not None:
+            return {i for _, i in self._automaton.iter(text)}
+
+        found = set()
+        for keyword in set(self._pattern.findall(text)):
+            found |= self._prefixes[keyword]
+        return found
+
+
+class TextFeatureExtractor:
+    """
+    Extracts every input of the rule-based text score in a fixed number of
+    linear passes, independent of how many keywords are configured.
+    """
+
+    def __init__(self):
+        self.matcher = KeywordMatcher(
+            HIGH_IMPACT_KEYWORDS + STANDARD_KEYWORDS + BANKING_WORDS + ACTION_WORDS
+            + SECURITY_WORDS + THREAT_WORDS + URGENT_PHRASES + SCIENTIFIC_TERMS
+            + COMBO_WORDS + URL_MARKERS
+        )
+        self._emotional_words = frozenset(EMOTIONAL_WORDS)
+
+        # Per-keyword weights for each keyword group, used to turn the
+        # (text, keyword) hits of a batch into per-text counts
+        groups = {
+            'high_impact': HIGH_IMPACT_KEYWORDS,
+            'standard': STANDARD_KEYWORDS,
+            'banking': BANKING_WORDS,
+            'action': ACTION_WORDS,
+            'security': SECURITY_WORDS,
+            'threat': THREAT_WORDS,
+            'urgent': URGENT_PHRASES,
+            'scientific': SCIENTIFIC_TERMS,
+            'reward_combo': ('congratulations', 'exclusive', 'reward'),
+            'subscription': ('subscription', 'renew'),
+            'click': ('click',),
+        }
+        self._group_weights = {
+            name: np.array([group.count(k) for k in self.matcher.keywords], dtype=float)
+            for name, group in groups.items()
+        }
+        self._url_indices = frozenset(self.matcher.index[m] for m in URL_MARKERS)
+
+    def extract(self, text):
+        """
+        Extract rule features from text
+
+        Args:
+            text (str): Non-empty text content
+
+        Returns:
+            dict: Counts and flags consumed by DeceptionDetector._analyze_text
+        """
+        hits = self.matcher.find(text.lower())
+        words = text.split()
+
+        # Non-ASCII characters are counted as emojis; encode() drops them in C
+        emoji_count = len(text) - len(text.encode('ascii', 'ignore'))
+
+        return {
+            'length': len(text),
+            'word_count': len(words),
+            'emoji_count': emoji_count,
+            'alarm_emojis': sum(text.count(e) for e in ALARM_EMOJIS) if emoji_count else 0,
+            'caps_words': _count_caps_words(words),
+            'high_impact_matches': sum(1 for k in HIGH_IMPACT_KEYWORDS if k in hits),
+            'standard_matches': sum(1 for k in STANDARD_KEYWORDS if k in hits),
+            'has_reward_combo': {'congratulations', 'exclusive', 'reward'} <= hits,
+            'has_subscription': {'subscription', 'renew'} <= hits,
+            'exclamation_count': text.count('!'),
+            'question_count': text.count('?'),
+            'period_count': text.count('.'),
+            'has_suspicious_url': 'click' in hits or any(m in hits and m in text for m in URL_MARKERS),
+            'has_banking': any(w in hits for w in BANKING_WORDS),
+            'has_action': any(w in hits for w in ACTION_WORDS),
+            'has_security': any(w in hits for w in SECURITY_WORDS),
+            'has_threat': any(w in hits for w in THREAT_WORDS),
+            'emphasis_chars': sum(text.count(c) for c in EMPHASIS_CHARS),
+            'emotional_matches': self._count_emotional_words(words),
+            'urgent_matches': sum(1 for p in URGENT_PHRASES if p in hits),
+            'has_numbers': _has_digit(text),
+            'has_percent': '%' in text,
+            'has_scientific': any(t in hits for t in SCIENTIFIC_TERMS),
+        }
+
+    def extract_matrix(self, texts):
+        """
+        Extract rule features for many texts into one matrix
+
+        Only the matcher pass and word splitting run per text. Keyword hits
+        are aggregated per keyword group with bincount, and all character
+        counts use array operations over the code points of the whole batch.
+
+        Args:
+            texts (list): Text contents; empty strings yield all-zero rows
+
+        Returns:
+            np.ndarray: float64 matrix of shape (len(texts), len(FEATURE_NAMES))
+        """
+        n = len(texts)
+        column = {name: i for i, name in enumerate(FEATURE_NAMES)}
+        matrix = np.zeros((n, len(FEATURE_NAMES)))
+
+        # Per-text pass: keyword hits as (row, keyword index) pairs, word stats
+        rows, cols = [], []
+        word_counts, caps_words, emotional_matches, url_rows = [], [], [], []
+        find_indices = self.matcher.find_indices
+        for i, text in enumerate(texts):
+            hits = find_indices(text.lower())
+            rows.extend([i] * len(hits))
+            cols.extend(hits)
+            if hits & self._url_indices and any(
+                self.matcher.keywords[j] in text for j in hits & self._url_indices
+            ):
+                url_rows.append(i)
+
+            words = text.split()
+            word_counts.append(len(words))
+            caps_words.append(_count_caps_words(words))
+            emotional_matches.append(self._count_emotional_words(words))
+
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+
+        def group_count(name):
+            return np.bincount(rows, weights=self._group_weights[name][cols], minlength=n)
+
+        matrix[:, column['word_count']] = word_counts
+        matrix[:, column['caps_words']] = caps_words
+        matrix[:, column['emotional_matches']] = emotional_matches
+        matrix[:, column['high_impact_matches']] = group_count('high_impact')
+        matrix[:, column['standard_matches']] = group_count('standard')
+        matrix[:, column['urgent_matches']] = group_count('urgent')
+        matrix[:, column['has_reward_combo']] = group_count('reward_combo') == 3
+        matrix[:, column['has_subscription']] = group_count('subscription') == 2
+        for name in ('banking', 'action', 'security', 'threat', 'scientific'):
+            matrix[:, column['has_' + name]] = group_count(name) > 0
+        has_url = group_count('click') > 0
+        has_url[url_rows] = True
+        matrix[:, column['has_suspicious_url']] = has_url
+
+        # Character counts over the code points of the whole batch
+        lengths = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        codes = np.frombuffer(
+            ''.join(texts).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32
+        )
+
+        def per_text(mask, last=ends):
+            """Sum a per-code-point mask over each text's slice"""
+            totals = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+            return totals[last] - totals[starts]
+
+        def count(chars):
+            return per_text(np.isin(codes, [ord(c) for c in chars]))
+
+        non_ascii = codes > 127
+        matrix[:, column['length']] = lengths
+        matrix[:, column['emoji_count']] = per_text(non_ascii)
+        matrix[:, column['exclamation_count']] = count('!')
+        matrix[:, column['question_count']] = count('?')
+        matrix[:, column['period_count']] = count('.')
+        matrix[:, column['emphasis_chars']] = count(EMPHASIS_CHARS)
+        matrix[:, column['has_percent']] = count('%') > 0
+
+        # Alarm emojis are single code points except the two-code-point '⚠️';
+        # a pair is only counted when both halves fall inside the same text
+        alarm = count([e for e in ALARM_EMOJIS if len(e) == 1])
+        for emoji in (e for e in ALARM_EMOJIS if len(e) == 2):
+            pairs = (codes[:-1] == ord(emoji[0])) & (codes[1:] == ord(emoji[1]))
+            alarm += per_text(pairs, last=np.maximum(ends - 1, starts))
+        matrix[:, column['alarm_emojis']] = alarm
+
+        # str.isdigit() also accepts non-ASCII digits; check each distinct
+        # non-ASCII code point in the batch once
+        digits = (codes >= ord('0')) & (codes <= ord('9'))
+        wide_digits = [c for c in np.unique(codes[non_ascii]).tolist() if chr(c).isdigit()]
+        if wide_digits:
+            digits |= np.isin(codes, wide_digits)
+        matrix[:, column['has_numbers']] = per_text(digits) > 0
+
+        return matrix
+
+    def _count_emotional_words(self, words):
+        """Whole-word emotional matches after stripping trailing punctuation"""
+        return len(self._emotional_words.intersection(map(str.strip, words, repeat(WORD_STRIP_CHARS))))
+
+
+def _count_caps_words(words):
+    """Count ALL CAPS words longer than two characters"""
+    return sum(1 for w in filter(str.isupper, words) if len(w) > 2 and w.isalpha())
+
+
+_ASCII_DIGIT = re.compile(r'[0-9]')
+_NON_ASCII = re.compile(r'[^\x00-\x7f]')
+
+
+def _has_digit(text):
+    """Equivalent to any(c.isdigit() for c in text) without a Python-level loop"""
+    if _ASCII_DIGIT.search(text):
+        return True
+    if text.isascii():
+        return False
+    return any(c.isdigit() for c in _NON_ASCII.findall(text))
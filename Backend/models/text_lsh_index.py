@@ -0,0 +1,239 @@
+"""
+Near-duplicate lookup over recently analyzed texts (MinHash + LSH)
+
+Texts are normalized, split into overlapping character shingles and
+summarized by a MinHash signature whose agreement rate estimates the
+Jaccard similarity of the shingle sets. Signatures are split into bands,
+and texts that agree on every row of some band land in the same bucket,
+so a lookup only compares the few texts sharing a bucket with the query
+instead of scanning the index.
+
+Texts that match an indexed text join its cluster; the cluster size counts
+how many copies of a repost wave are currently in the index. The index is
+a ring buffer sized from a memory budget, so the oldest texts are evicted
+first and cluster sizes cover a sliding window of recent traffic.
+"""
+
+import threading
+import numpy as np
+
+# Texts shorter than this (after normalization) are too generic to cluster
+MIN_TEXT_LENGTH = 20
+
+# Shingles hashed per MinHash step, bounding the temporary hash matrix
+SHINGLE_CHUNK = 4096
+
+# Bucket entries kept per band key; identical copies beyond this stay in
+# their cluster but are no longer returned as lookup candidates
+MAX_BUCKET_SIZE = 32
+
+# Approximate bytes per indexed text held in the band tables (dict slot and
+# integer key per band, measured on CPython 3.11), used to turn the memory
+# budget into a capacity
+BAND_ENTRY_BYTES = 110
+
+_MASK64 = (1 << 64) - 1
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so trivial edits do not matter"""
+    return ' '.join(text.lower().split())
+
+
+class TextLSHIndex:
+    """
+    Thread-safe MinHash-LSH index from recent texts to their text scores
+    """
+
+    def __init__(self, memory_budget_mb=128, num_perm=64, bands=16, threshold=0.7,
+                 shingle_size=5, seed=1):
+        """
+        Args:
+            memory_budget_mb (float): Approximate memory the index may use
+            num_perm (int): MinHash signature length
+            bands (int): LSH bands (num_perm must be a multiple)
+            threshold (float): Estimated Jaccard similarity for a near-duplicate
+            shingle_size (int): Characters per shingle
+            seed (int): Seed for the MinHash hash functions
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rs = np.random.RandomState(seed)
+        self._a = (rs.randint(0, 2 ** 63, num_perm, dtype=np.int64).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+        self._b = rs.randint(0, 2 ** 63, num_perm, dtype=np.int64).astype(np.uint64)
+
+        bytes_per_entry = num_perm * 4 + 2 + 1 + 8 + bands * BAND_ENTRY_BYTES
+        self.capacity = max(int(memory_budget_mb * 1024 * 1024) // bytes_per_entry, 1)
+        self._signatures = np.zeros((self.capacity, num_perm), dtype=np.uint32)
+        self._scores = np.zeros(self.capacity, dtype=np.int16)
+        # False once the text scoring changed after the score was stored
+        self._score_valid = np.zeros(self.capacity, dtype=bool)
+        self._clusters = np.zeros(self.capacity, dtype=np.int64)
+        self._tables = [{} for _ in range(bands)]
+        self._cluster_sizes = {}
+        self._count = 0  # Texts ever added; the next slot is _count % capacity
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def signature(self, text):
+        """
+        MinHash signature of a text
+
+        Returns:
+            np.ndarray: num_perm uint32 values, or None for texts shorter
+                than MIN_TEXT_LENGTH
+        """
+        text = normalize_text(text)
+        if len(text) < max(MIN_TEXT_LENGTH, self.shingle_size):
+            return None
+
+        # Polynomial hash of every shingle (uint64 arithmetic wraps mod 2 ** 64)
+        codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32).astype(np.uint64)
+        count = len(codes) - self.shingle_size + 1
+        shingles = np.zeros(count, dtype=np.uint64)
+        for offset in range(self.shingle_size):
+            shingles = shingles * np.uint64(1000003) + codes[offset:offset + count]
+        shingles = np.unique(shingles)
+
+        # Multiply-shift hashing: the high 32 bits of a * x + b
+        signature = np.full(self.num_perm, _MASK64, dtype=np.uint64)
+        for start in range(0, len(shingles), SHINGLE_CHUNK):
+            chunk = shingles[start:start + SHINGLE_CHUNK]
+            hashed = (self._a[:, None] * chunk[None, :] + self._b[:, None]) >> np.uint64(32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature):
+        rows = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        keys = rows[:, 0]
+        for row in range(1, self.rows):
+            keys = keys * np.uint64(0x100000001b3) + rows[:, row]
+        return keys.tolist()
+
+    def _find(self, signature, keys):
+        """Closest indexed slot within the threshold, as (slot, similarity)"""
+        candidates = set()
+        for table, key in zip(self._tables, keys):
+            bucket = table.get(key)
+            if bucket is None:
+                continue
+            if isinstance(bucket, int):
+                candidates.add(bucket)
+            else:
+                candidates.update(bucket)
+        if not candidates:
+            return None
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._signatures[slots] == signature).mean(axis=1)
+        # Among equally close texts, prefer one whose score is still valid
+        best = int(np.lexsort((self._score_valid[slots], similarity))[-1])
+        if similarity[best] < self.threshold:
+            return None
+        return int(slots[best]), float(similarity[best])
+
+    def find(self, signature):
+        """
+        Look up a near-duplicate of an analyzed text
+
+        Args:
+            signature (np.ndarray): From signature()
+
+        Returns:
+            dict: score, similarity and cluster_size of the closest match,
+                or None; score is None when it was invalidated
+        """
+        keys = self._band_keys(signature)
+        with self._lock:
+            match = self._find(signature, keys)
+            if match is None:
+                return None
+            slot, similarity = match
+            return {
+                'score': int(self._scores[slot]) if self._score_valid[slot] else None,
+                'similarity': similarity,
+                'cluster_size': self._cluster_sizes[int(self._clusters[slot])]
+            }
+
+    def add(self, signature, score):
+        """
+        Index a text, joining the cluster of its closest near-duplicate
+
+        The oldest text is evicted once the index is at capacity.
+
+        Returns:
+            int: Size of the text's cluster, including the text itself
+        """
+        keys = self._band_keys(signature)
+        with self._lock:
+            match = self._find(signature, keys)
+            slot = self._count % self.capacity
+            if self._count >= self.capacity:
+                self._evict(slot)
+            cluster = int(self._clusters[match[0]]) if match else self._count
+            self._cluster_sizes[cluster] = self._cluster_sizes.get(cluster, 0) + 1
+
+            self._signatures[slot] = signature
+            self._scores[slot] = score
+            self._score_valid[slot] = True
+            self._clusters[slot] = cluster
+            for table, key in zip(self._tables, keys):
+                # Most buckets hold a single slot, stored without a list
+                bucket = table.get(key)
+                if bucket is None:
+                    table[key] = slot
+                    continue
+                if isinstance(bucket, int):
+                    bucket = table[key] = [bucket]
+                bucket.append(slot)
+                if len(bucket) > MAX_BUCKET_SIZE:
+                    del bucket[0]
+            self._count += 1
+            return self._cluster_sizes[cluster]
+
+    def _evict(self, slot):
+        """Remove the text in slot from the band tables and its cluster"""
+        for table, key in zip(self._tables, self._band_keys(self._signatures[slot])):
+            bucket = table.get(key)
+            if bucket == slot:
+                del table[key]
+            elif isinstance(bucket, list) and slot in bucket:
+                bucket.remove(slot)
+                if len(bucket) == 1:
+                    table[key] = bucket[0]
+        cluster = int(self._clusters[slot])
+        self._cluster_sizes[cluster] -= 1
+        if not self._cluster_sizes[cluster]:
+            del self._cluster_sizes[cluster]
+
+    def invalidate_scores(self):
+        """
+        Stop reusing the stored scores (after the text model changed)
+
+        The texts and their clusters stay indexed; find() reports no score
+        for them until a near-duplicate is added with a new one.
+        """
+        with self._lock:
+            self._score_valid[:] = False
+
+    def stats(self):
+        """
+        Get index size counters
+
+        Returns:
+            dict: Indexed texts, capacity, clusters and largest cluster
+        """
+        with self._lock:
+            return {
+                'entries': len(self),
+                'capacity': self.capacity,
+                'clusters': len(self._cluster_sizes),
+                'largest_cluster': max(self._cluster_sizes.values(), default=0)
+            }
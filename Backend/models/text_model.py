@@ -0,0 +1,508 @@
+"""
+Memory-mappable artifact for the TF-IDF + logistic regression text model
+
+A pickled TfidfVectorizer is deserialized into a Python dict of every term
+in each worker process, and unpickling runs arbitrary code. This artifact
+stores the same model as flat NumPy arrays instead, one .npy file each,
+loaded with np.load(mmap_mode='r'): every worker maps the same page-cache
+copy and loading is instant.
+
+Vocabulary lookups go through a sorted array of 64-bit term hashes
+(np.searchsorted) rather than a dict; the UTF-8 bytes of every term are
+kept too, so a hash match is confirmed against the term itself.
+
+TextModel also scores texts without scikit-learn: it tokenizes like the
+saved TfidfVectorizer, builds the sparse TF-IDF rows and takes their dot
+product with the coefficients in NumPy, for a whole batch at once. The
+probabilities match predict_proba to within floating-point rounding.
+
+Layout of one artifact (a directory text_model-<version>/ in MODEL_DIR):
+
+    manifest.json      format, version, vectorizer settings, classes,
+                       intercept, SHA-256 of every array file
+    term_hashes.npy    uint64, sorted term hashes
+    term_columns.npy   int32, feature column of each sorted hash
+    term_offsets.npy   int64, start of each column's term in term_bytes
+    term_bytes.npy     uint8, UTF-8 terms concatenated in column order
+    idf.npy            float64, IDF weight per column
+    coef.npy           float64, LR coefficient per column
+
+A model trained with a HashingVectorizer (train_text_model_streaming.py)
+has no vocabulary: the term arrays are empty, the manifest records the
+number of hashed features, and a term's column (and sign) comes from the
+same MurmurHash3 scikit-learn uses, reimplemented here in NumPy so
+serving does not need scikit-learn. Its idf.npy is all ones.
+
+MODEL_DIR/text_model.current names the artifact directory in use; it is
+replaced atomically when a new model is exported.
+"""
+
+import os
+import re
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+import numpy as np
+
+ARTIFACT_PREFIX = 'text_model-'
+CURRENT_FILE = 'text_model.current'
+MANIFEST_FILE = 'manifest.json'
+FORMAT = 'deceptra-text-model'
+FORMAT_VERSION = 1
+# Hashing artifacts get their own version, so a reader that predates them
+# rejects them instead of scoring with an empty vocabulary
+HASHING_FORMAT_VERSION = 2
+ARRAYS = ('term_hashes', 'term_columns', 'term_offsets', 'term_bytes', 'idf', 'coef')
+
+# TfidfVectorizer (or HashingVectorizer) settings the artifact reproduces; anything else (custom
+# analyzers, tokenizers, preprocessors, accent stripping) is rejected
+SUPPORTED_SETTINGS = {
+    'analyzer': ('word',),
+    'input': ('content',),
+    'preprocessor': (None,),
+    'tokenizer': (None,),
+    'strip_accents': (None,),
+}
+
+
+# MurmurHash3 x86_32 constants
+_C1, _C2, _N = np.uint32(0xcc9e2d51), np.uint32(0x1b873593), np.uint32(0xe6546b64)
+
+
+def term_hash(term):
+    """Stable 64-bit hash of a vocabulary term"""
+    return int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def murmurhash3_32(terms):
+    """
+    Signed 32-bit MurmurHash3 (x86_32, seed 0) of the UTF-8 bytes of each
+    term, as sklearn.utils.murmurhash3_32 computes it
+
+    The terms are laid out as rows of little-endian 32-bit blocks, zero
+    padded, and hashed together one block position at a time.
+
+    Returns:
+        np.ndarray: int64 hash per term, in [-2 ** 31, 2 ** 31)
+    """
+    encoded = [term.encode('utf-8') for term in terms]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    blocks = lengths // 4
+    width = int(blocks.max()) + 1 if len(encoded) else 1  # full blocks plus the tail
+    padded = np.zeros((len(encoded), 4 * width), dtype=np.uint8)
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(encoded)), lengths)
+    padded[rows, np.arange(len(data)) - np.repeat(np.cumsum(lengths) - lengths, lengths)] = data
+
+    def rotl(x, r):
+        return (x << np.uint32(r)) | (x >> np.uint32(32 - r))
+
+    # Every block (and the zero-padded tail block) mixed at once
+    k = rotl(padded.view('<u4').astype(np.uint32) * _C1, 15) * _C2
+    h = np.zeros(len(encoded), dtype=np.uint32)
+    for j in range(width - 1):
+        h = np.where(blocks > j, rotl(h ^ k[:, j], 13) * np.uint32(5) + _N, h)
+    has_tail = lengths % 4 > 0
+    h ^= np.where(has_tail, k[np.arange(len(encoded)), blocks], np.uint32(0))
+
+    # Finalization
+    h ^= lengths.astype(np.uint32)
+    h ^= h >> np.uint32(16)
+    h *= np.uint32(0x85ebca6b)
+    h ^= h >> np.uint32(13)
+    h *= np.uint32(0xc2b2ae35)
+    h ^= h >> np.uint32(16)
+    return h.view(np.int32).astype(np.int64)
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _model_arrays(vectorizer, classifier):
+    """
+    Convert a fitted TfidfVectorizer (or a HashingVectorizer) and a binary
+    linear classifier (LogisticRegression, SGDClassifier)
+
+    Returns:
+        tuple: (arrays, manifest) with the ARRAYS and every manifest field
+            except files, metrics and version
+    """
+    params = vectorizer.get_params()
+    for name, allowed in SUPPORTED_SETTINGS.items():
+        if params[name] not in allowed:
+            raise ValueError(f"Cannot export a vectorizer with {name}={params[name]!r}")
+    if not isinstance(params['token_pattern'], str):
+        raise ValueError("Cannot export a vectorizer without a token_pattern")
+    if len(classifier.classes_) != 2:
+        raise ValueError("Only binary classifiers can be exported")
+    if 'n_features' in params:
+        return _hashing_arrays(vectorizer, classifier)
+
+    terms = [None] * len(vectorizer.vocabulary_)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+    hashes = np.array([term_hash(term) for term in terms], dtype=np.uint64)
+    order = np.argsort(hashes, kind='stable')
+    if np.any(hashes[order][1:] == hashes[order][:-1]):
+        raise ValueError("Vocabulary term hashes collide")
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum([len(term) for term in encoded], out=offsets[1:])
+
+    stop_words = vectorizer.get_stop_words()
+    arrays = {
+        'term_hashes': hashes[order],
+        'term_columns': order.astype(np.int32),
+        'term_offsets': offsets,
+        'term_bytes': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'idf': np.asarray(vectorizer.idf_ if params['use_idf'] else np.ones(len(terms)), dtype=np.float64),
+        'coef': np.asarray(classifier.coef_[0], dtype=np.float64),
+    }
+    manifest = {
+        'format': FORMAT,
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'vectorizer': {
+            'lowercase': params['lowercase'],
+            'token_pattern': params['token_pattern'],
+            'ngram_range': list(params['ngram_range']),
+            'stop_words': sorted(stop_words) if stop_words else [],
+            'norm': params['norm'],
+            'sublinear_tf': params['sublinear_tf'],
+            'binary': params['binary'],
+        },
+        'classes': [c.item() if hasattr(c, 'item') else c for c in classifier.classes_],
+        'intercept': float(classifier.intercept_[0]),
+    }
+    return arrays, manifest
+
+
+def _hashing_arrays(vectorizer, classifier):
+    """_model_arrays for a HashingVectorizer (no vocabulary, no IDF)"""
+    params = vectorizer.get_params()
+    if classifier.coef_.shape[1] != params['n_features']:
+        raise ValueError("Classifier was not fitted on this vectorizer's features")
+    stop_words = vectorizer.get_stop_words()
+    arrays = {
+        'term_hashes': np.zeros(0, dtype=np.uint64),
+        'term_columns': np.zeros(0, dtype=np.int32),
+        'term_offsets': np.zeros(1, dtype=np.int64),
+        'term_bytes': np.zeros(0, dtype=np.uint8),
+        'idf': np.ones(params['n_features'], dtype=np.float64),
+        'coef': np.asarray(classifier.coef_[0], dtype=np.float64),
+    }
+    manifest = {
+        'format': FORMAT,
+        'format_version': HASHING_FORMAT_VERSION,
+        'created': datetime.now().isoformat(),
+        'vectorizer': {
+            'lowercase': params['lowercase'],
+            'token_pattern': params['token_pattern'],
+            'ngram_range': list(params['ngram_range']),
+            'stop_words': sorted(stop_words) if stop_words else [],
+            'norm': params['norm'],
+            'sublinear_tf': False,
+            'binary': params['binary'],
+            'hashing': {'n_features': params['n_features'], 'alternate_sign': params['alternate_sign']},
+        },
+        'classes': [c.item() if hasattr(c, 'item') else c for c in classifier.classes_],
+        'intercept': float(classifier.intercept_[0]),
+    }
+    return arrays, manifest
+
+
+def export_text_model(vectorizer, classifier, model_dir, metrics=None):
+    """
+    Write a fitted vectorizer and binary linear classifier as an artifact
+
+    The artifact directory is built under a temporary name and renamed into
+    place, then text_model.current is switched to it, so a reader never
+    sees a partially written model.
+
+    Args:
+        vectorizer (TfidfVectorizer): Fitted vectorizer (or a HashingVectorizer)
+        classifier (LogisticRegression): Fitted binary classifier (or an
+            SGDClassifier with a linear decision function)
+        model_dir (str): Directory to write the artifact in
+        metrics (dict): Optional evaluation results recorded in the manifest
+
+    Returns:
+        str: Path of the artifact directory
+    """
+    arrays, manifest = _model_arrays(vectorizer, classifier)
+    manifest['metrics'] = metrics or {}
+    manifest['files'] = {}
+
+    os.makedirs(model_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.text_model-', dir=model_dir)
+    try:
+        for name, array in arrays.items():
+            path = os.path.join(staging, f"{name}.npy")
+            np.save(path, array)
+            manifest['files'][f"{name}.npy"] = _file_sha256(path)
+
+        # The version identifies the model contents, not when it was exported
+        digest = hashlib.sha256(json.dumps(
+            [manifest['vectorizer'], manifest['classes'], manifest['intercept'], manifest['files']],
+            sort_keys=True
+        ).encode('utf-8'))
+        manifest['version'] = digest.hexdigest()[:16]
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        path = os.path.join(model_dir, ARTIFACT_PREFIX + manifest['version'])
+        if os.path.exists(path):
+            shutil.rmtree(staging)
+        else:
+            os.chmod(staging, 0o755)
+            os.rename(staging, path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    set_current_text_model(model_dir, path)
+    return path
+
+
+def set_current_text_model(model_dir, path):
+    """Point text_model.current at an artifact directory (atomically)"""
+    pointer = os.path.join(model_dir, CURRENT_FILE)
+    temporary = pointer + '.tmp'
+    with open(temporary, 'w') as f:
+        f.write(os.path.basename(path) + '\n')
+    os.replace(temporary, pointer)
+
+
+def find_text_model(model_dir):
+    """
+    Get the artifact directory named by text_model.current
+
+    Returns:
+        str: Artifact path, or None when no artifact has been exported
+    """
+    pointer = os.path.join(model_dir, CURRENT_FILE)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer) as f:
+        name = f.read().strip()
+    path = os.path.join(model_dir, name)
+    if not name.startswith(ARTIFACT_PREFIX) or not os.path.isdir(path):
+        raise FileNotFoundError(f"{CURRENT_FILE} names a missing artifact: {name}")
+    return path
+
+
+def read_manifest(path):
+    """Read and check the manifest of an artifact directory"""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT or manifest.get('format_version') not in (FORMAT_VERSION,
+                                                                                 HASHING_FORMAT_VERSION):
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} or {HASHING_FORMAT_VERSION} "
+                         f"{FORMAT} artifact")
+    return manifest
+
+
+class TextModel:
+    """A text model artifact with its arrays memory-mapped read-only"""
+
+    def __init__(self, path, manifest, arrays):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.vectorizer_settings = manifest['vectorizer']
+        self.classes = manifest['classes']
+        self.intercept = manifest['intercept']
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+        settings = self.vectorizer_settings
+        self._token_pattern = re.compile(settings['token_pattern'])
+        self._stop_words = frozenset(settings['stop_words'])
+        self._ngram_range = tuple(settings['ngram_range'])
+        self._hashing = settings.get('hashing')
+        # predict_proba reports P(classes[1]); risk is P(label 1 = deceptive)
+        self._positive_is_deceptive = self.classes[1] == 1
+
+    @classmethod
+    def from_sklearn(cls, vectorizer, classifier):
+        """
+        Build an in-memory TextModel from fitted scikit-learn objects
+
+        Used for pickled models, so both formats share one inference path.
+        """
+        arrays, manifest = _model_arrays(vectorizer, classifier)
+        digest = hashlib.sha256()
+        for name in ARRAYS:
+            digest.update(arrays[name].tobytes())
+        manifest['version'] = 'pickle-' + digest.hexdigest()[:16]
+        return cls(None, manifest, arrays)
+
+    @classmethod
+    def load(cls, path, verify=True):
+        """
+        Map an artifact directory
+
+        Args:
+            path (str): Artifact directory
+            verify (bool): Check every array file against its manifest checksum
+
+        Returns:
+            TextModel
+        """
+        manifest = read_manifest(path)
+        arrays = {}
+        for name in ARRAYS:
+            file_path = os.path.join(path, f"{name}.npy")
+            if verify and _file_sha256(file_path) != manifest['files'][f"{name}.npy"]:
+                raise ValueError(f"Checksum mismatch for {file_path}")
+            arrays[name] = np.load(file_path, mmap_mode='r', allow_pickle=False)
+        return cls(path, manifest, arrays)
+
+    @property
+    def num_features(self):
+        return len(self.idf)
+
+    def term(self, column):
+        """Vocabulary term of a feature column"""
+        start, end = self.term_offsets[column], self.term_offsets[column + 1]
+        return bytes(self.term_bytes[start:end]).decode('utf-8')
+
+    def lookup(self, terms):
+        """
+        Feature columns of terms
+
+        Args:
+            terms (list): Terms (after tokenizing and n-gram generation)
+
+        Returns:
+            np.ndarray: int64 column per term, -1 for terms not in the vocabulary
+        """
+        if not terms or not len(self.term_hashes):
+            return np.full(len(terms), -1, dtype=np.int64)
+        hashes = np.fromiter((term_hash(term) for term in terms), dtype=np.uint64, count=len(terms))
+        positions = np.minimum(np.searchsorted(self.term_hashes, hashes), len(self.term_hashes) - 1)
+        columns = np.where(self.term_hashes[positions] == hashes, self.term_columns[positions], -1).astype(np.int64)
+        # Confirm hash matches against the stored term bytes
+        for i in np.flatnonzero(columns >= 0):
+            if self.term(columns[i]) != terms[i]:
+                columns[i] = -1
+        return columns
+
+    def hashed_columns(self, terms):
+        """
+        Feature columns and signs of terms under a hashing vectorizer
+
+        Same as scikit-learn's FeatureHasher: the signed 32-bit MurmurHash3
+        of the UTF-8 term, modulo the feature count, with the hash's sign
+        as the value's sign when alternate_sign is set.
+
+        Returns:
+            tuple: (columns, signs), int64 and float64 arrays
+        """
+        n_features = self._hashing['n_features']
+        hashes = murmurhash3_32(terms)
+        columns = np.abs(hashes) % n_features
+        # abs(-2 ** 31) overflows in FeatureHasher's int32 arithmetic
+        columns[hashes == -2 ** 31] = (2 ** 31 - 1 - (n_features - 1)) % n_features
+        if self._hashing['alternate_sign']:
+            signs = np.where(hashes >= 0, 1.0, -1.0)
+        else:
+            signs = np.ones(len(terms))
+        return columns, signs
+
+    def analyze(self, text):
+        """
+        Terms of a text, as TfidfVectorizer's word analyzer produces them
+
+        Lowercasing, token_pattern, stop-word removal, then word n-grams
+        of the remaining tokens.
+        """
+        if self.vectorizer_settings['lowercase']:
+            text = text.lower()
+        tokens = self._token_pattern.findall(text)
+        if self._stop_words:
+            tokens = [token for token in tokens if token not in self._stop_words]
+        min_n, max_n = self._ngram_range
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), min(max_n, len(tokens)) + 1):
+            terms += [' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+        return terms
+
+    def transform(self, texts):
+        """
+        Sparse TF-IDF rows of a batch of texts
+
+        Returns:
+            tuple: (rows, columns, values) of the non-zero entries, rows
+                sorted; equal to TfidfVectorizer.transform up to rounding
+        """
+        term_ids = {}
+        row_ids = []
+        ids = []
+        for row, text in enumerate(texts):
+            terms = self.analyze(text)
+            row_ids += [row] * len(terms)
+            ids += [term_ids.setdefault(term, len(term_ids)) for term in terms]
+
+        # Each distinct term of the batch is looked up (or hashed) once
+        ids = np.asarray(ids, dtype=np.int64)
+        if self._hashing:
+            columns, signs = self.hashed_columns(list(term_ids))
+            columns, signs = columns[ids], signs[ids]
+        else:
+            columns = self.lookup(list(term_ids))[ids]
+        rows = np.asarray(row_ids, dtype=np.int64)
+        known = columns >= 0
+        keys, inverse, counts = np.unique(rows[known] * self.num_features + columns[known],
+                                          return_inverse=True, return_counts=True)
+        rows, columns = keys // self.num_features, keys % self.num_features
+
+        settings = self.vectorizer_settings
+        if self._hashing:
+            # Signed counts: colliding terms of opposite sign cancel out
+            values = np.bincount(inverse, weights=signs[known], minlength=len(keys)).astype(np.float64)
+        else:
+            values = counts.astype(np.float64)
+        if settings['binary']:
+            values[:] = 1.0
+        if settings['sublinear_tf']:
+            values = np.log(values) + 1.0
+        values *= self.idf[columns]
+        if settings['norm'] == 'l2':
+            norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(texts)))
+            values /= np.where(norms > 0, norms, 1)[rows]
+        elif settings['norm'] == 'l1':
+            norms = np.bincount(rows, weights=np.abs(values), minlength=len(texts))
+            values /= np.where(norms > 0, norms, 1)[rows]
+        return rows, columns, values
+
+    def decision_function(self, texts):
+        """LogisticRegression.decision_function for a batch of texts"""
+        rows, columns, values = self.transform(texts)
+        return np.bincount(rows, weights=values * self.coef[columns], minlength=len(texts)) + self.intercept
+
+    def predict_proba(self, texts):
+        """
+        Probability that each text is deceptive (label 1)
+
+        Args:
+            texts (list): Texts to score
+
+        Returns:
+            np.ndarray: float64 probability per text
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros(0)
+        with np.errstate(over='ignore'):
+            probability = 1.0 / (1.0 + np.exp(-self.decision_function(texts)))
+        return probability if self._positive_is_deceptive else 1.0 - probability
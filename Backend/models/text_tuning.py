@@ -0,0 +1,262 @@
+"""
+Cross-validated hyperparameter search for the text model (see
+tune_text_model.py)
+
+Tokenizing is the slow part of a fit, and it does not depend on
+max_features or C. So the corpus is tokenized and counted once per
+ngram_range. The sparse count matrix, the labels and the fold of every
+row are cached on disk, keyed by the CSV contents. Every trial (one
+parameter set on one fold) slices its training rows out of the cached
+counts and keeps the max_features most frequent terms that occur in
+them. It then applies TF-IDF weights fitted on those rows. This gives
+the same matrix TfidfVectorizer would produce if fitted on the fold.
+
+Trials run in joblib worker processes; each worker loads a count matrix
+once and reuses it for all its trials. Every finished trial is appended
+to a JSON-lines trial log, and a rerun skips trials already logged.
+"""
+
+import os
+import csv
+import json
+import time
+import hashlib
+import functools
+import numpy as np
+import scipy.sparse
+from joblib import Parallel, delayed
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+
+METRICS = ('accuracy', 'precision', 'recall', 'f1', 'roc_auc')
+LOG_FILE = 'trials.jsonl'
+RESULTS_FILE = 'results.csv'
+
+
+def file_fingerprint(path):
+    """SHA-256 (shortened) of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def counts_path(cache_dir, ngram_range):
+    return os.path.join(cache_dir, f"counts-{ngram_range[0]}-{ngram_range[1]}.npz")
+
+
+def build_cache(csv_path, cache_dir, ngram_ranges, folds, seed):
+    """
+    Tokenize and count the corpus once per ngram_range and assign folds
+
+    Files already in cache_dir are kept, so only new ngram ranges are
+    tokenized.
+    """
+    missing = [ngram for ngram in ngram_ranges if not os.path.exists(counts_path(cache_dir, ngram))]
+    if not missing and os.path.exists(os.path.join(cache_dir, 'folds.npy')):
+        return
+    from train_text_model_streaming import iter_rows
+
+    os.makedirs(cache_dir, exist_ok=True)
+    texts, labels = zip(*iter_rows(csv_path))
+    labels = np.array(labels)
+
+    fold_of_row = np.zeros(len(texts), dtype=np.int8)
+    splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+    for fold, (_, test_rows) in enumerate(splitter.split(np.zeros(len(labels)), labels)):
+        fold_of_row[test_rows] = fold
+    np.save(os.path.join(cache_dir, 'labels.npy'), labels)
+    np.save(os.path.join(cache_dir, 'folds.npy'), fold_of_row)
+
+    for ngram_range in missing:
+        start = time.perf_counter()
+        # Columns in sorted term order, as TfidfVectorizer numbers them
+        counts = CountVectorizer(stop_words='english', ngram_range=ngram_range).fit_transform(texts)
+        path = counts_path(cache_dir, ngram_range)
+        with open(path + '.tmp', 'wb') as f:
+            scipy.sparse.save_npz(f, counts.tocsr())
+        os.replace(path + '.tmp', path)
+        print(f"  Tokenized {len(texts)} rows with ngram_range={tuple(ngram_range)}: "
+              f"{counts.shape[1]:,} terms in {time.perf_counter() - start:.1f}s")
+
+
+@functools.lru_cache(maxsize=4)
+def load_cache(cache_dir, ngram_range):
+    """Cached counts, labels and folds (loaded once per worker process)"""
+    counts = scipy.sparse.load_npz(counts_path(cache_dir, ngram_range)).tocsr()
+    return counts, np.load(os.path.join(cache_dir, 'labels.npy')), np.load(os.path.join(cache_dir, 'folds.npy'))
+
+
+def fold_features(counts, train_rows, test_rows, max_features):
+    """
+    TF-IDF matrices of one fold from the cached counts
+
+    Equal to TfidfVectorizer(max_features=max_features) fitted on the
+    training rows: terms absent from them are dropped, the max_features
+    most frequent are kept, and the IDF weights come from the training rows.
+
+    Returns:
+        tuple: (X_train, X_test)
+    """
+    train_counts = counts[train_rows]
+    frequencies = np.asarray(train_counts.sum(axis=0)).ravel()
+    columns = np.flatnonzero(frequencies > 0)
+    if max_features and len(columns) > max_features:
+        # The same selection (and tie order) as CountVectorizer._limit_features
+        columns = np.sort(columns[(-frequencies[columns]).argsort()[:max_features]])
+    train_counts = train_counts[:, columns]
+    transformer = TfidfTransformer().fit(train_counts)
+    return transformer.transform(train_counts), transformer.transform(counts[test_rows][:, columns])
+
+
+def run_trial(cache_dir, params, fold):
+    """
+    Fit and score one parameter set on one fold (runs in a joblib worker)
+
+    Returns:
+        dict: params, fold, METRICS and seconds
+    """
+    start = time.perf_counter()
+    counts, labels, folds = load_cache(cache_dir, tuple(params['ngram_range']))
+    train_rows, test_rows = folds != fold, folds == fold
+    X_train, X_test = fold_features(counts, train_rows, test_rows, params['max_features'])
+    classifier = LogisticRegression(C=params['C'], max_iter=3000).fit(X_train, labels[train_rows])
+
+    y_test = labels[test_rows]
+    probabilities = classifier.predict_proba(X_test)[:, 1]
+    y_pred = (probabilities >= 0.5).astype(int)
+    return {
+        'params': params,
+        'fold': fold,
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1': f1_score(y_test, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_test, probabilities) if len(set(y_test)) == 2 else float('nan'),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def trial_key(search, params, fold):
+    return json.dumps([search, params, fold], sort_keys=True)
+
+
+def read_log(path):
+    """
+    Trials recorded in a trial log
+
+    A line cut short by an interrupted write is ignored (that trial runs
+    again).
+    """
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return records
+
+
+def rank(records, folds, metric):
+    """
+    Mean and standard deviation of every metric per parameter set
+
+    Only parameter sets with all folds finished are ranked.
+
+    Returns:
+        list: One dict per parameter set, best mean metric first
+    """
+    by_params = {}
+    for record in records:
+        by_params.setdefault(json.dumps(record['params'], sort_keys=True), {})[record['fold']] = record
+    rows = []
+    for key, fold_records in by_params.items():
+        if len(fold_records) < folds:
+            continue
+        row = dict(json.loads(key))
+        for name in METRICS + ('seconds',):
+            values = np.array([fold_records[fold][name] for fold in range(folds)], dtype=float)
+            row[f"{name}_mean"] = float(values.mean())
+            row[f"{name}_std"] = float(values.std())
+        rows.append(row)
+    rows.sort(key=lambda row: -np.nan_to_num(row[f"{metric}_mean"], nan=-np.inf))
+    for position, row in enumerate(rows, 1):
+        row['rank'] = position
+    return rows
+
+
+def write_results(path, rows):
+    """Write the ranked table as CSV"""
+    fields = ['rank', 'max_features', 'ngram_range', 'C'] + [f"{name}_{stat}" for name in METRICS + ('seconds',)
+                                                             for stat in ('mean', 'std')]
+    with open(path + '.tmp', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, 'ngram_range': '-'.join(map(str, row['ngram_range']))})
+    os.replace(path + '.tmp', path)
+
+
+def search(csv_path, out_dir, max_features, ngram_ranges, Cs, folds=5, jobs=-1, seed=42, metric='f1'):
+    """
+    Run (or resume) the search
+
+    Args:
+        csv_path (str): Labelled CSV (text and label columns)
+        out_dir (str): Directory for the cache, trial log and results
+        max_features (list): Vocabulary sizes (0 or None keeps every term)
+        ngram_ranges (list): (low, high) n-gram ranges
+        Cs (list): Inverse regularization strengths
+        folds (int): Cross-validation folds
+        jobs (int): Parallel fits (joblib n_jobs)
+        seed (int): Fold assignment seed
+        metric (str): METRICS entry to rank by
+
+    Returns:
+        tuple: (ranked rows, trials run now, trials reused from the log)
+    """
+    fingerprint = file_fingerprint(csv_path)
+    search_id = f"{fingerprint}-k{folds}-s{seed}"
+    cache_dir = os.path.join(out_dir, 'cache', search_id)
+    log_path = os.path.join(out_dir, LOG_FILE)
+    os.makedirs(out_dir, exist_ok=True)
+    build_cache(csv_path, cache_dir, ngram_ranges, folds, seed)
+
+    grid = [{'max_features': features or None, 'ngram_range': list(ngram), 'C': C}
+            for ngram in ngram_ranges for features in max_features for C in Cs]
+    logged = {trial_key(record['search'], record['params'], record['fold']): record
+              for record in read_log(log_path) if record.get('search') == search_id}
+    todo = [(params, fold) for params in grid for fold in range(folds)
+            if trial_key(search_id, params, fold) not in logged]
+    reused = len(grid) * folds - len(todo)
+    print(f"  {len(grid)} parameter sets x {folds} folds: {len(todo)} trials to run, {reused} already logged")
+
+    # Longest-running trials first (more terms, bigger C) for better packing
+    todo.sort(key=lambda task: (-(task[0]['max_features'] or 1e12), -task[0]['ngram_range'][1], -task[0]['C']))
+
+    # End a line cut short by an interrupted write before appending
+    if os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+        with open(log_path, 'rb+') as log:
+            log.seek(-1, os.SEEK_END)
+            if log.read(1) != b'\n':
+                log.write(b'\n')
+    with open(log_path, 'a') as log:
+        trials = Parallel(n_jobs=jobs, return_as='generator_unordered')(
+            delayed(run_trial)(cache_dir, params, fold) for params, fold in todo)
+        for done, record in enumerate(trials, 1):
+            record['search'] = search_id
+            log.write(json.dumps(record) + '\n')
+            log.flush()
+            logged[trial_key(search_id, record['params'], record['fold'])] = record
+            if done % 10 == 0 or done == len(todo):
+                print(f"  {done}/{len(todo)} trials done")
+
+    in_grid = {trial_key(search_id, params, fold) for params in grid for fold in range(folds)}
+    rows = rank([record for key, record in logged.items() if key in in_grid], folds, metric)
+    write_results(os.path.join(out_dir, RESULTS_FILE), rows)
+    return rows, len(todo), reused
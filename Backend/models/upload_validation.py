@@ -0,0 +1,122 @@
+"""
+Header-only validation of image uploads
+
+An upload is checked before anything decodes it. Only the image header
+is read (Pillow's Image.open is lazy), which is enough to learn the
+format, the dimensions and the frame count:
+
+- the format must be one of the image formats in ALLOWED_EXTENSIONS, and
+  only those formats' decoders are tried
+- a file name extension, if there is one, must be in ALLOWED_EXTENSIONS
+- the number of pixels that decoding will allocate must fit the pixel
+  budget. JPEGs are decoded at a reduced DCT scale (see IMAGE_DECODE_SIZE
+  in deception_detector.py), so a large JPEG is downscaled on decode and
+  only its reduced size counts; other formats decode at full size
+- animations may have at most max_frames frames (only the first frame is
+  analyzed)
+
+A decompression bomb (a small file declaring a huge image) is therefore
+rejected before a pixel buffer is allocated.
+"""
+
+import os
+
+from .deception_detector import IMAGE_DECODE_SIZE
+
+# Pillow format names and the file extensions they are uploaded with
+FORMAT_EXTENSIONS = {
+    'JPEG': ('jpg', 'jpeg'),
+    'PNG': ('png',),
+    'GIF': ('gif',),
+    'WEBP': ('webp',),
+}
+
+
+class UploadRejected(ValueError):
+    """An upload that fails validation; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def allowed_formats(allowed_extensions):
+    """Pillow formats whose extensions are allowed"""
+    return [name for name, extensions in FORMAT_EXTENSIONS.items()
+            if any(extension in allowed_extensions for extension in extensions)]
+
+
+def inspect_image(stream, formats=None):
+    """
+    Read an image's header
+
+    The stream is rewound afterwards.
+
+    Args:
+        stream: Seekable binary file holding the image
+        formats (list): Pillow formats to try (default: every known format)
+
+    Returns:
+        dict: format, width, height (as stored), frames, and decode_width
+            and decode_height (the size decoding will allocate)
+
+    Raises:
+        UploadRejected: The data is not an image in one of the formats (415),
+            declares more pixels than Pillow will open (413), or has a
+            damaged header (400)
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    stream.seek(0)
+    try:
+        with Image.open(stream, formats=formats) as image:
+            width, height = image.size
+            frames = getattr(image, 'n_frames', 1)
+            image.draft('RGB', IMAGE_DECODE_SIZE)
+            decode_width, decode_height = image.size
+            image_format = image.format
+    except UnidentifiedImageError:
+        raise UploadRejected('Unsupported image format', 415)
+    except Image.DecompressionBombError:
+        raise UploadRejected('Image dimensions too large', 413)
+    except (OSError, SyntaxError, ValueError) as e:
+        raise UploadRejected(f'Invalid image: {str(e)}', 400)
+    finally:
+        stream.seek(0)
+    return {
+        'format': image_format,
+        'width': width,
+        'height': height,
+        'frames': frames,
+        'decode_width': decode_width,
+        'decode_height': decode_height,
+    }
+
+
+def validate_image(image_file, allowed_extensions, max_pixels, max_frames):
+    """
+    Check an uploaded image before it is analyzed
+
+    Args:
+        image_file (FileStorage): The upload
+        allowed_extensions (set): Allowed file extensions (ALLOWED_EXTENSIONS)
+        max_pixels (int): Largest number of pixels decoding may allocate
+        max_frames (int): Largest number of animation frames
+
+    Returns:
+        dict: The header information from inspect_image
+
+    Raises:
+        UploadRejected: With the HTTP status to answer with
+    """
+    extension = os.path.splitext(image_file.filename or '')[1].lstrip('.').lower()
+    if extension and extension not in allowed_extensions:
+        raise UploadRejected(f'File type .{extension} is not allowed', 415)
+
+    info = inspect_image(image_file.stream, allowed_formats(allowed_extensions))
+    if info['decode_width'] * info['decode_height'] > max_pixels:
+        raise UploadRejected(f"Image too large: {info['width']}x{info['height']} pixels "
+                             f"(at most {max_pixels} are decoded)", 413)
+    if info['frames'] > max_frames:
+        raise UploadRejected(f"Too many frames: {info['frames']} (at most {max_frames})", 413)
+    return info
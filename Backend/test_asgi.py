@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Check the ASGI entry point against the Flask app
+
+Drives asgi.app in-process. The native POST /api/analyze must return the
+JSON the Flask route returns for text-only, image and metadata posts,
+reject empty text with a 400 and an oversized body with a 413. Routes
+bridged to Flask (/api/health, the streamed /api/analyze/batch) must come
+through intact, the bridge must stay at most RESPONSE_QUEUE_CHUNKS chunks
+ahead of a slow client, and a client that goes away mid-stream must stop
+the Flask thread.
+"""
+
+import sys
+import os
+import io
+import json
+import glob
+import shutil
+import asyncio
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WORKDIR = tempfile.mkdtemp(prefix='asgi-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{WORKDIR}/history.db"
+os.environ['MODEL_DIR'] = WORKDIR
+
+from werkzeug.test import EnvironBuilder
+import asgi
+import app as flask_module
+from models.deception_detector import NEAR_DUPLICATE_DISTANCE
+from models.image_hash_index import ImageHashIndex
+from models.text_lsh_index import TextLSHIndex
+from models.result_cache import ResultCache
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+BATCH_ITEMS = 200
+TIMEOUT = 30
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+class TrackedApp:
+    """The Flask app, counting the response chunks it produces and noting when a response is closed"""
+
+    def __init__(self, app):
+        self.app = app
+        self.config = app.config
+        self.produced = 0
+        self.closed = threading.Event()
+
+    def __call__(self, environ, start_response):
+        iterable = self.app(environ, start_response)
+        try:
+            for chunk in iterable:
+                self.produced += 1
+                yield chunk
+        finally:
+            iterable.close()
+            self.closed.set()
+
+
+def encode(data):
+    """Encoded body and content type of a form post"""
+    environ = EnvironBuilder(method='POST', data=data).get_environ()
+    return environ['wsgi.input'].read(), environ['CONTENT_TYPE']
+
+
+async def asgi_request(method, path, body=b'', content_type=None, on_body=None):
+    """
+    Drive one request through asgi.app
+
+    Args:
+        on_body: Coroutine called with each response body message before
+            it is recorded (to slow the client down or make it go away)
+
+    Returns:
+        tuple: (status, headers dict, body bytes)
+    """
+    chunks = [body[i:i + 65536] for i in range(0, len(body), 65536)] or [b'']
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.body' and on_body is not None:
+            await on_body(message)
+        sent.append(message)
+
+    headers = [(b'content-length', str(len(body)).encode())]
+    if content_type is not None:
+        headers.append((b'content-type', content_type.encode()))
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': headers, 'server': ('localhost', 5000), 'client': ('127.0.0.1', 50000),
+    }
+    await asyncio.wait_for(asgi.app(scope, receive, send), TIMEOUT)
+    start = sent[0]
+    return (start['status'], {name.decode(): value.decode() for name, value in start['headers']},
+            b''.join(m.get('body', b'') for m in sent[1:]))
+
+
+def fresh_indexes():
+    """Empty near-duplicate indexes, so each post is scored from scratch"""
+    detector = flask_module.detector
+    detector.image_index = ImageHashIndex(max_distance=NEAR_DUPLICATE_DISTANCE)
+    detector.text_index = TextLSHIndex()
+
+
+def without_timestamp(payload):
+    return {key: value for key, value in payload.items() if key != 'timestamp'}
+
+
+def main():
+    print("=" * 80)
+    print("ASGI ENTRY POINT")
+    print("=" * 80)
+    failures = 0
+
+    flask_module.detector.wait_until_ready()
+    # Every request is computed, not served from the other entry point's result
+    asgi.result_cache = flask_module.result_cache = ResultCache(max_entries=0)
+    client = flask_module.app.test_client()
+    flask_app = asgi.flask_app
+
+    # Native /api/analyze against the Flask route
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    with open(paths[0], 'rb') as f:
+        image = f.read()
+    cases = [
+        ("text only", {'text': "Lovely walk in the park this morning 🌳"}),
+        ("image", {'text': "URGENT!!! Verify your account now 🚨", 'image': image}),
+        ("metadata", {'text': "Our quarterly report is out.", 'followers': 'true', 'accountAge': 'true',
+                      'engagementRate': 'true'}),
+        ("image and metadata", {'text': "FREE prize, click here!!!", 'image': image, 'followers': 'true'}),
+    ]
+    for label, fields in cases:
+        def form():
+            return {key: (io.BytesIO(value), 'upload.jpg') if isinstance(value, bytes) else value
+                    for key, value in fields.items()}
+        fresh_indexes()
+        status, _, body = asyncio.run(asgi_request('POST', '/api/analyze', *encode(form())))
+        fresh_indexes()
+        response = client.post('/api/analyze', data=form())
+        native = json.loads(body)
+        failures += not check(f"Native /api/analyze matches Flask, {label}",
+                              status == response.status_code == 200 and native == response.get_json(),
+                              f"(risk {native.get('riskScore')})")
+
+    for text in ('', '   '):
+        status, _, body = asyncio.run(asgi_request('POST', '/api/analyze', *encode({'text': text})))
+        failures += not check(f"Text {text!r} rejected with 400",
+                              status == 400 and json.loads(body) == {'error': 'Text content is required'})
+
+    limit = flask_app.config['MAX_CONTENT_LENGTH']
+    flask_app.config['MAX_CONTENT_LENGTH'] = 1024
+    try:
+        oversized = encode({'text': 'x' * 4096})
+        status, _, body = asyncio.run(asgi_request('POST', '/api/analyze', *oversized))
+        failures += not check("Oversized body rejected with 413", status == 413 and 'error' in json.loads(body))
+        status, _, _ = asyncio.run(asgi_request('POST', '/api/analyze/batch', *oversized))
+        failures += not check("Oversized body to a bridged route rejected with 413", status == 413)
+    finally:
+        flask_app.config['MAX_CONTENT_LENGTH'] = limit
+
+    # Bridged routes
+    status, headers, body = asyncio.run(asgi_request('GET', '/api/health'))
+    expected = client.get('/api/health')
+    failures += not check("GET /api/health bridged", status == expected.status_code == 200
+                          and headers['content-type'] == expected.headers['Content-Type']
+                          and without_timestamp(json.loads(body)) == without_timestamp(expected.get_json()))
+
+    lines = ''.join(json.dumps({'id': i, 'text': f"Post {i}: click here!!! {'🚨' * (i % 4)}"}) + '\n'
+                    for i in range(BATCH_ITEMS)).encode('utf-8')
+    tracked = asgi.flask_app = TrackedApp(flask_app)
+    lead = []
+
+    async def slow_client(message):
+        lead.append(tracked.produced - len(lead))
+        await asyncio.sleep(0.002)
+
+    try:
+        fresh_indexes()
+        status, headers, body = asyncio.run(asgi_request('POST', '/api/analyze/batch', lines,
+                                                         'application/x-ndjson', on_body=slow_client))
+        fresh_indexes()
+        expected = client.post('/api/analyze/batch', data=lines, content_type='application/x-ndjson')
+        results = [json.loads(line) for line in body.splitlines()]
+        failures += not check("POST /api/analyze/batch bridged",
+                              status == 200 and headers['content-type'] == expected.headers['Content-Type']
+                              and results == [json.loads(line) for line in expected.data.splitlines()]
+                              and len(results) == BATCH_ITEMS, f"({len(results)} lines)")
+        # One chunk may be in the Flask thread's hands, waiting for a queue slot
+        failures += not check("Streamed response stays a few chunks ahead of the client",
+                              max(lead) <= asgi.RESPONSE_QUEUE_CHUNKS + 1,
+                              f"(at most {max(lead)} chunks ahead)")
+
+        # A client that goes away mid-stream
+        tracked = asgi.flask_app = TrackedApp(flask_app)
+
+        async def disconnecting_client(message):
+            if tracked.produced >= 3:
+                raise OSError('client went away')
+
+        try:
+            asyncio.run(asgi_request('POST', '/api/analyze/batch', lines, 'application/x-ndjson',
+                                     on_body=disconnecting_client))
+            disconnected = False
+        except OSError:
+            disconnected = True
+        closed = tracked.closed.wait(TIMEOUT)
+        failures += not check("Disconnected client stops the Flask thread",
+                              disconnected and closed and tracked.produced < BATCH_ITEMS,
+                              f"({tracked.produced} of {BATCH_ITEMS} lines produced)")
+    finally:
+        asgi.flask_app = flask_app
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: the ASGI entry point answers like the Flask app")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        flask_module.analysis_history.close()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Check the streaming batch endpoint
+
+Posts a batch of items in chunks smaller than the batch: plain text,
+base64 images, multipart imageRef uploads, mixed metadata selections and
+items that must fail on their own (invalid JSON, no text, bad base64, an
+unknown imageRef). Checks that one NDJSON line comes back per item in
+input order, that uploads are still readable while the response streams
+after the request has been torn down, and that history is written once
+per chunk in input order.
+"""
+
+import sys
+import os
+import io
+import glob
+import json
+import base64
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+workdir = tempfile.mkdtemp(prefix='batch-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{workdir}/history.db"
+os.environ['MODEL_DIR'] = workdir
+
+from app import app, detector, analysis_history
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CHUNK_SIZE = 3
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def post_batch(client, lines, files=None, items_as_file=False):
+    """POST the NDJSON lines, as the body or with multipart uploads; return the parsed result lines"""
+    body = '\n'.join(lines) + '\n'
+    if files is None:
+        response = client.post('/api/analyze/batch', data=body, content_type='application/x-ndjson')
+    else:
+        data = {name: (io.BytesIO(content), f"{name}.jpg") for name, content in files.items()}
+        data['items'] = (io.BytesIO(body.encode('utf-8')), 'items.ndjson') if items_as_file else body
+        response = client.post('/api/analyze/batch', data=data, content_type='multipart/form-data')
+    return response.status_code, [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def main():
+    print("=" * 80)
+    print("STREAMING BATCH ENDPOINT")
+    print("=" * 80)
+    failures = 0
+    detector.wait_until_ready()
+    app.config['BATCH_CHUNK_SIZE'] = CHUNK_SIZE
+    client = app.test_client()
+
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    with open(paths[0], 'rb') as f:
+        photo = f.read()
+    with open(paths[-1], 'rb') as f:
+        other = f.read()
+
+    add_many = analysis_history.add_many
+    writes = []
+
+    def counting_add_many(entries):
+        entries = list(entries)
+        writes.append([entry['content_preview'] for entry in entries])
+        return add_many(entries)
+
+    analysis_history.add_many = counting_add_many
+    try:
+        items = [
+            {'id': 'a', 'text': 'Batch post one about the weekend market'},
+            {'id': 'b', 'text': 'Batch post two with a photo', 'imageBase64': base64.b64encode(photo).decode()},
+            {'id': 'c', 'text': 'Batch post three with an upload', 'imageRef': 'photo'},
+            {'id': 'd', 'text': ''},
+            {'id': 'e', 'text': 'Batch post five with metadata', 'followers': True, 'accountAge': True},
+            {'id': 'f', 'text': 'Batch post six', 'imageBase64': 'not base64!'},
+            {'id': 'g', 'text': 'Batch post seven', 'imageRef': 'missing'},
+            {'id': 'h', 'text': 'Batch post eight with another upload', 'imageRef': 'other',
+             'engagementRate': True},
+        ]
+        lines = [json.dumps(item) for item in items]
+        lines.insert(4, '')            # blank lines are skipped but keep their line number
+        lines.insert(6, '{not json')
+        indices = [index for index, line in enumerate(lines) if line.strip()]
+        before = analysis_history.count()
+
+        status, results = post_batch(client, lines, files={'photo': photo, 'other': other})
+        failures += not check("One result line per item, in input order",
+                              status == 200 and [result['index'] for result in results] == indices,
+                              f"({[result['index'] for result in results]})")
+        by_index = dict(zip(indices, results))
+        failures += not check("Client ids echoed", [by_index[i].get('id') for i in indices if i not in (3, 6, 7, 8)]
+                              == ['a', 'b', 'c', 'e', 'h'])
+        errors = [i for i in indices if 'error' in by_index[i]]
+        failures += not check("Invalid items fail alone", errors == [3, 6, 7, 8], f"({errors})")
+        failures += not check("Missing text reported", by_index[3]['error'] == 'Text content is required')
+        failures += not check("Unknown imageRef reported", by_index[8]['error'] == 'Unknown imageRef: missing')
+        failures += not check("Text-only item has no image score", 'imageScore' not in by_index[0])
+        failures += not check("Base64 and imageRef of one image score the same",
+                              by_index[1].get('imageScore') is not None and
+                              by_index[1].get('imageScore') == by_index[2].get('imageScore'),
+                              f"({by_index[1].get('imageScore')} / {by_index[2].get('imageScore')})")
+        failures += not check("Upload in a later chunk still readable", by_index[9].get('imageScore') is not None)
+
+        # History: one write per chunk, entries in input order
+        analysis_history.flush()
+        analyzed = [item['text'] for item in items if item['id'] in 'abceh']
+        failures += not check("History written once per chunk, in input order",
+                              writes == [analyzed[:3], analyzed[3:4], analyzed[4:]], f"({len(writes)} writes)")
+        stored = [row['content_preview'] for row in analysis_history.query(limit=5)][::-1]
+        failures += not check("Only analyzed items stored",
+                              analysis_history.count() - before == 5 and stored == analyzed)
+
+        # Metadata flags are applied per item
+        single = client.post('/api/analyze', data={
+            'text': items[4]['text'], 'followers': 'true', 'accountAge': 'true'}).get_json()
+        failures += not check("Metadata flags applied per item", by_index[5].get('riskScore') == single['riskScore']
+                              and 'imageScore' not in by_index[5])
+
+        # The items may also come as a file upload
+        status, results = post_batch(client, [json.dumps({'text': 'Items from a file', 'imageRef': 'photo'})],
+                                     files={'photo': photo}, items_as_file=True)
+        failures += not check("Items read from an uploaded file",
+                              status == 200 and len(results) == 1 and results[0].get('imageScore') is not None)
+    finally:
+        analysis_history.add_many = add_many
+        analysis_history.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: batch results stream in order, with uploads alive and history written per chunk")
+
+
+if __name__ == '__main__':
+    main()
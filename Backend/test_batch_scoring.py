@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Check that batch scoring equals single-post scoring
+
+On the randomized corpus of test_text_features.py, every row of
+extract_matrix must equal extract() for that text, the batch text scores
+(_score_texts) must equal _analyze_text, and analyze_batch must return
+exactly what one analyze() call per item returns, for every metadata
+selection and with some items carrying dataset images.
+"""
+
+import sys
+import os
+import io
+import glob
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Detectors start without a seeded image index
+MODEL_DIR = tempfile.mkdtemp(prefix='batch-scoring-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+import numpy as np
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector
+from models.text_features import FEATURE_NAMES
+from test_text_features import make_corpus
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_SIZE = 3000
+ANALYZE_SIZE = 400
+IMAGE_EVERY = 10
+METADATA_SELECTIONS = [(False, False, False), (True, False, False), (False, True, True), (True, True, True)]
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def uploads(images):
+    return [FileStorage(stream=io.BytesIO(data), filename='upload.jpg') if data else None for data in images]
+
+
+def main():
+    print("=" * 80)
+    print("BATCH VS SINGLE SCORING")
+    print("=" * 80)
+    failures = 0
+
+    corpus = make_corpus(CORPUS_SIZE, seed=2)
+    detector = DeceptionDetector()
+
+    # Feature matrix rows
+    matrix = detector.text_features.extract_matrix(corpus)
+    rows = [np.zeros(len(FEATURE_NAMES)) if not text else
+            np.array([float(detector.text_features.extract(text)[name]) for name in FEATURE_NAMES])
+            for text in corpus]
+    wrong = [FEATURE_NAMES[j] for i, row in enumerate(rows) for j in np.flatnonzero(matrix[i] != row)]
+    failures += not check("extract_matrix rows equal extract()", not wrong,
+                          f"({len(corpus)} texts, {len(wrong)} differing features {sorted(set(wrong))[:5]})")
+
+    # Text scores
+    single = np.array([detector._analyze_text(text) for text in corpus])
+    batch = detector._score_texts(corpus)
+    failures += not check("_score_texts equals _analyze_text", np.array_equal(single, batch),
+                          f"({int(np.sum(single != batch))} mismatches)")
+    failures += not check("Batch scores are integers", batch.dtype.kind == 'i')
+
+    # Full results, with images and metadata
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    texts = corpus[:ANALYZE_SIZE]
+    images = []
+    for i in range(len(texts)):
+        if i % IMAGE_EVERY:
+            images.append(None)
+            continue
+        with open(paths[(i // IMAGE_EVERY) * 7 % len(paths)], 'rb') as f:
+            images.append(f.read())
+    for flags in METADATA_SELECTIONS:
+        single_detector, batch_detector = DeceptionDetector(), DeceptionDetector()
+        single = [single_detector.analyze(text, image, *flags) for text, image in zip(texts, uploads(images))]
+        batch = batch_detector.analyze_batch(texts, uploads(images), *flags)
+        mismatches = sum(a != b for a, b in zip(single, batch))
+        failures += not check(f"analyze_batch equals analyze(), {sum(flags)} metadata flags",
+                              len(batch) == len(single) and mismatches == 0, f"({mismatches} mismatches)")
+    failures += not check("Empty batch", DeceptionDetector().analyze_batch([]) == [])
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: batch features, text scores and results match single-post scoring")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
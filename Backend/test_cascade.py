@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Check cascaded early-exit scoring
+
+Checks that the rule image scores stay within IMAGE_RULE_SCORE_BOUNDS,
+that a settled risk range never hides a verdict change for any text
+score, metadata selection and image score, then analyzes posts with and
+without an image with a cascade detector and a full one: the verdicts
+must match, a skipped image must not be decoded and must be reported in
+skippedStages, and analyze_batch must match analyze().
+"""
+
+import sys
+import os
+import io
+import glob
+import shutil
+import itertools
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# An empty model directory: both detectors start without a seeded image index
+MODEL_DIR = tempfile.mkdtemp(prefix='cascade-test-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import (DeceptionDetector, score_image, blend_scores, IMAGE_RULE_SCORE_BOUNDS,
+                                       STAGES, SKIPPED_IMAGES)
+from test_categorized import test_statements
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'final datasets')
+METADATA_SELECTIONS = list(itertools.product((False, True), repeat=3))
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def pick_images(count=30):
+    """One image per source photo (the datasets hold augmented variants)"""
+    originals = {}
+    for path in sorted(glob.glob(os.path.join(DATASET_DIR, '*', '*'))):
+        originals.setdefault(os.path.basename(path).split('.rf.')[0], path)
+    paths = list(originals.values())
+    return paths[::max(len(paths) // count, 1)][:count]
+
+
+def upload(data):
+    return FileStorage(stream=io.BytesIO(data), filename='upload.jpg')
+
+
+def settled_ranges_hold(detector):
+    """Every settled range keeps one verdict over all image scores the mode allows"""
+    low, high = detector.image_score_bounds()
+    image_scores = range(low, high + 1)
+    for text_score, flags in itertools.product(range(101), METADATA_SELECTIONS):
+        risk_range = detector.settled_risk_range(text_score, *flags)
+        metadata_score = detector._analyze_metadata(*flags)
+        risks = [detector._fuse_scores(text_score, image_score, metadata_score) for image_score in image_scores]
+        verdicts = {detector._get_verdict(risk) for risk in risks}
+        if risk_range is not None and (len(verdicts) > 1 or risk_range != (min(risks), max(risks))):
+            return False
+        if risk_range is None and len(verdicts) == 1:
+            return False
+    return True
+
+
+def decoded_images():
+    return STAGES['image_decode'].snapshot()[0][-1]
+
+
+def main():
+    print("=" * 80)
+    print("CASCADED EARLY-EXIT SCORING")
+    print("=" * 80)
+    failures = 0
+
+    # Bounds the cascade relies on
+    images = []
+    for path in pick_images():
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    rule_scores = [score_image(io.BytesIO(data))[0] for data in images] + [score_image(io.BytesIO(b'broken'))[0]]
+    low, high = IMAGE_RULE_SCORE_BOUNDS
+    failures += not check("Rule image scores within IMAGE_RULE_SCORE_BOUNDS",
+                          all(low <= score <= high for score in rule_scores),
+                          f"({min(rule_scores)}-{max(rule_scores)})")
+    blended = DeceptionDetector(image_scoring='blended', image_model_weight=0.3)
+    probabilities = np.linspace(0, 1, 101)
+    blended_scores = np.concatenate([blend_scores('blended', 0.3, np.full(101, score), probabilities)
+                                     for score in range(low, high + 1)])
+    blended_low, blended_high = blended.image_score_bounds()
+    failures += not check("Blended image scores within their bounds",
+                          blended_low <= blended_scores.min() and blended_scores.max() <= blended_high)
+    for mode, detector in [('rule', DeceptionDetector()), ('model', DeceptionDetector(image_scoring='model')),
+                           ('blended', blended)]:
+        failures += not check(f"Settled ranges never hide a verdict change ({mode})", settled_ranges_hold(detector))
+
+    # Cascade against full scoring
+    cascade = DeceptionDetector(cascade=True)
+    full = DeceptionDetector()
+    posts = [(text, images[i % len(images)]) for i, (text, _, _) in enumerate(test_statements)]
+    for flags in [(False, False, False), (True, True, True)]:
+        decoded, skipped_count = decoded_images(), SKIPPED_IMAGES.value()
+        cascaded = [cascade.analyze(text, upload(data), *flags) for text, data in posts]
+        decoded = decoded_images() - decoded
+        expected = [full.analyze(text, upload(data), *flags) for text, data in posts]
+        skipped = [result['skippedStages'] == ['image'] for result in cascaded]
+        label = "with metadata" if any(flags) else "text and image"
+        failures += not check(f"Verdicts match full scoring ({label})",
+                              [r['verdict'] for r in cascaded] == [r['verdict'] for r in expected],
+                              f"({sum(skipped)} of {len(posts)} images skipped)")
+        failures += not check(f"Skipped images not decoded ({label})", decoded == len(posts) - sum(skipped)
+                              and SKIPPED_IMAGES.value() - skipped_count == sum(skipped))
+        failures += not check(f"Skipped stages reported ({label})", all(
+            ('imageScore' in result) != is_skipped
+            and (not is_skipped or result['riskScoreRange'][0] == result['riskScore']
+                 <= full_result['riskScore'] <= result['riskScoreRange'][1])
+            and (is_skipped or result['riskScore'] == full_result['riskScore'])
+            for result, full_result, is_skipped in zip(cascaded, expected, skipped)))
+    failures += not check("Some images skipped, some scored", 0 < sum(skipped) < len(posts))
+    text_only = cascade.analyze(posts[0][0])
+    failures += not check("Text-only post reports no skipped stage", text_only['skippedStages'] == []
+                          and 'riskScoreRange' not in text_only)
+
+    # Batch against single analyses
+    single, batched = DeceptionDetector(cascade=True), DeceptionDetector(cascade=True)
+    uploads = [upload(data) if i % 3 else None for i, (_, data) in enumerate(posts)]
+    single_results = [single.analyze(text, image) for (text, _), image in zip(posts, uploads)]
+    for image in uploads:
+        if image:
+            image.stream.seek(0)
+    batch_results = batched.analyze_batch([text for text, _ in posts], uploads)
+    failures += not check("analyze_batch matches analyze()", batch_results == single_results)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: cascade scoring skips only images that cannot change the verdict")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Check color_statistics against np.unique
+
+On random palette images (a handful to tens of thousands of colours,
+some spanning several CHUNK_PIXELS chunks, some with their only new
+colours in the last pixels) and on dataset images, the exact count must
+equal np.unique, and with max_colors the count must be exact
+below the limit and a lower bound of at least the limit above it. The
+histograms of both modes must match a per-colour count.
+"""
+
+import sys
+import os
+import glob
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+from models.image_features import color_statistics, CHUNK_PIXELS
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PALETTES = 300
+DATASET_IMAGES = 20
+HISTOGRAM_BITS = 3
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def palette_image(rng):
+    """A random-size image drawing its pixels from a random palette"""
+    colors = int(rng.choice([1, 2, 49, 50, 51, rng.integers(1, 5000), rng.integers(1, 70000)]))
+    height, width = (int(n) for n in rng.integers(1, 400, size=2))
+    palette = rng.integers(0, 256, size=(colors, 3), dtype=np.uint8)
+    image = palette[rng.integers(0, colors, size=height * width)]
+    if rng.random() < 0.2:
+        # One colour everywhere except the last pixels, which the strided
+        # sample misses
+        late = min(int(rng.integers(1, 100)), len(image) - 1)
+        image[:len(image) - late] = palette[0]
+    return image.reshape(height, width, 3)
+
+
+def unique_colors(img_array):
+    """np.unique(..., axis=0) count, run over the colours as integers (many times faster)"""
+    pixels = img_array.reshape(-1, 3).astype(np.int64)
+    return len(np.unique(pixels[:, 0] * 65536 + pixels[:, 1] * 256 + pixels[:, 2]))
+
+
+def reference_histogram(img_array, bits):
+    pixels = (img_array.reshape(-1, 3) >> (8 - bits)).astype(np.int64)
+    cells, counts = np.unique(pixels[:, 0] * 65536 + pixels[:, 1] * 256 + pixels[:, 2], return_counts=True)
+    histogram = np.zeros((1 << bits,) * 3)
+    histogram[cells // 65536, cells // 256 % 256, cells % 256] = counts
+    return histogram.ravel() / len(pixels)
+
+
+def wrong_results(img_array, expected, limits):
+    """Descriptions of color_statistics results that disagree with np.unique"""
+    histogram = reference_histogram(img_array, HISTOGRAM_BITS)
+    wrong = []
+    exact = color_statistics(img_array, histogram_bits=HISTOGRAM_BITS)
+    if exact['unique_colors'] != expected or not exact['complete'] or not np.allclose(exact['histogram'], histogram):
+        wrong.append(f"exact: {exact['unique_colors']} != {expected}")
+    for limit in limits:
+        stats = color_statistics(img_array, max_colors=limit, histogram_bits=HISTOGRAM_BITS)
+        if expected < limit:
+            right = stats['unique_colors'] == expected and stats['complete']
+        else:
+            right = limit <= stats['unique_colors'] <= expected and not stats['complete']
+        if not right or not np.allclose(stats['histogram'], histogram):
+            wrong.append(f"max_colors={limit}: {stats['unique_colors']} of {expected}")
+    return wrong
+
+
+def main():
+    print("=" * 80)
+    print("COLOUR STATISTICS")
+    print("=" * 80)
+    failures = 0
+
+    rng = np.random.default_rng(0)
+    wrong = []
+    sizes = []
+    for _ in range(PALETTES):
+        img_array = palette_image(rng)
+        sizes.append(img_array.shape[0] * img_array.shape[1])
+        expected = unique_colors(img_array)
+        wrong += wrong_results(img_array, expected, [1, 50, expected, expected + 1, int(rng.integers(1, expected + 2))])
+    failures += not check("Random palettes match np.unique", not wrong, f"({PALETTES} images, {wrong[:3]})")
+    failures += not check("Some palette images span several chunks", sum(size > CHUNK_PIXELS for size in sizes) >= 10,
+                          f"({sum(size > CHUNK_PIXELS for size in sizes)} images)")
+
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    paths = paths[::max(len(paths) // DATASET_IMAGES, 1)][:DATASET_IMAGES]
+    wrong = []
+    for path in paths:
+        img_array = np.asarray(Image.open(path).convert('RGB'))
+        expected = len(np.unique(img_array.reshape(-1, 3), axis=0))
+        wrong += wrong_results(img_array, expected, [1, 50, 1000])
+    failures += not check("Dataset images match np.unique", not wrong, f"({len(paths)} images, {wrong[:3]})")
+
+    flat = np.zeros((10, 10, 3), dtype=np.uint8)
+    failures += not check("Single-colour image", color_statistics(flat, max_colors=50)['unique_colors'] == 1
+                          and color_statistics(flat)['unique_colors'] == 1)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: colour counts and histograms match np.unique in both modes")
+
+
+if __name__ == '__main__':
+    main()
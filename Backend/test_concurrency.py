@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the deception detector
+
+Analyzes the same set of posts serially on one detector and concurrently
+from many threads on a shared detector (directly and through the Flask
+app), and checks every concurrent result equals its serial result. Each
+post has its own emoji and punctuation counts, so a result whose reasons
+were built from another request's text shows up as a mismatch.
+"""
+
+import sys
+import os
+import random
+import glob
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The Flask app writes its analysis history here, not to deceptra.db
+os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='concurrency-test-')}/history.db"
+
+from werkzeug.datastructures import FileStorage
+from models.deception_detector import DeceptionDetector
+
+THREADS = 32
+ROUNDS = 4
+POSTS = 400
+
+WORDS = (
+    "offer account bank verify click urgent free winner prize claim limited deal "
+    "weather park meeting project coffee book team sprint report garden music river "
+    "shocking exclusive secret miracle cure doctors hate trick guaranteed money fast "
+    "study research scientists data evidence results published journal quarterly"
+).split()
+EMOJIS = ["😱", "🚨", "🔥", "💰", "⚠️", "🎉"]
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'final datasets')
+
+
+def pick_images(count=12):
+    """One image per source photo (the datasets hold augmented variants of each)"""
+    originals = {}
+    for path in sorted(glob.glob(os.path.join(DATASET_DIR, '*', '*'))):
+        originals.setdefault(os.path.basename(path).split('.rf.')[0], path)
+    return list(originals.values())[::max(len(originals) // count, 1)][:count]
+
+
+IMAGES = pick_images()
+
+
+def make_posts():
+    """Distinct posts, each with its own emoji and punctuation counts"""
+    rng = random.Random(42)
+    posts = []
+    for i in range(POSTS):
+        words = rng.sample(WORDS, 12)
+        if rng.random() < 0.5:
+            words = [word.upper() for word in words]
+        text = ' '.join(words) + ' ' + ''.join(rng.choices(EMOJIS, k=rng.randint(0, 8)))
+        text += rng.choice('!?.') * rng.randint(0, 14) + f" #{i}"
+        image = IMAGES[i % len(IMAGES)] if IMAGES and i % 4 == 0 else None
+        flags = (i % 3 == 0, i % 5 == 0, i % 7 == 0)
+        posts.append((text, image, flags))
+    return posts
+
+
+def analyze(detector, post):
+    text, image, flags = post
+    if image is None:
+        return detector.analyze(text, None, *flags)
+    with open(image, 'rb') as f:
+        return detector.analyze(text, FileStorage(stream=f, filename=os.path.basename(image)), *flags)
+
+
+def post_request(client, post):
+    text, image, flags = post
+    data = {'text': text}
+    data.update({name: 'true' for name, flag in zip(('followers', 'accountAge', 'engagementRate'), flags) if flag})
+    if image is None:
+        return client.post('/api/analyze', data=data).get_json()
+    with open(image, 'rb') as f:
+        data['image'] = (f, os.path.basename(image))
+        return client.post('/api/analyze', data=data).get_json()
+
+
+def check(label, expected, results):
+    mismatches = sum(got != want for got, want in zip(results, expected))
+    print(f"{label:<40} {len(results):>6} results  {mismatches:>4} mismatches")
+    return mismatches
+
+
+def main():
+    print("=" * 80)
+    print(f"CONCURRENCY STRESS TEST ({THREADS} threads)")
+    print("=" * 80)
+
+    posts = make_posts()
+
+    # Serial reference (one round, then the same posts again: the second
+    # round sees every post as a repost, as the concurrent rounds will)
+    reference = DeceptionDetector()
+    first_round = [analyze(reference, post) for post in posts]
+    repeat_round = [analyze(reference, post) for post in posts]
+
+    failures = 0
+    shared = DeceptionDetector()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda post: analyze(shared, post), posts))
+    failures += check("Detector, first round", first_round, results)
+
+    # Later rounds: reasons include the repost cluster size, which depends
+    # on how many copies were seen, so compare everything except that reason
+    def without_cluster(result):
+        return dict(result, reasons=[r for r in result['reasons'] if not r.startswith("Near-identical")])
+
+    for round_index in range(1, ROUNDS):
+        order = posts[:]
+        random.Random(round_index).shuffle(order)
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            results = list(pool.map(lambda post: analyze(shared, post), order))
+        expected = [without_cluster(repeat_round[posts.index(post)]) for post in order]
+        failures += check(f"Detector, round {round_index + 1} (shuffled)", expected,
+                          [without_cluster(result) for result in results])
+
+    # Through the Flask app (result cache and text index shared by all threads)
+    from app import app
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(lambda post: post_request(client, post), posts))
+    failures += check("POST /api/analyze", [without_cluster(r) for r in first_round],
+                      [without_cluster(result) for result in results])
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} results differ from serial analysis")
+        sys.exit(1)
+    print("PASSED: concurrent results match serial analysis")
+
+
+if __name__ == '__main__':
+    main()
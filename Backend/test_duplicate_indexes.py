@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Check the near-duplicate indexes
+
+ImageHashIndex: multi-index lookups must agree with a brute-force scan,
+find hashes exactly at the distance threshold (with the differing bits
+spread over every chunk but one) and not one bit beyond it, stop adding
+at max_entries, and round-trip through save/load, refusing an index
+saved by another detector version. A detector loads the index saved under
+other text scoring or cascade settings, but not under other image scoring
+settings.
+
+TextLSHIndex: the ring buffer evicts the oldest texts at capacity and
+keeps cluster sizes to the texts still indexed; invalidate_scores drops
+the stored scores but not the clusters.
+"""
+
+import sys
+import os
+import random
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Detectors save and load their image index here
+MODEL_DIR = tempfile.mkdtemp(prefix='index-test-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+from models.deception_detector import DeceptionDetector
+from models.image_hash_index import ImageHashIndex, HASH_BITS
+from models.text_lsh_index import TextLSHIndex, BAND_ENTRY_BYTES
+
+MAX_DISTANCE = 4
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def flip(image_hash, bits):
+    for bit in bits:
+        image_hash ^= 1 << bit
+    return image_hash
+
+
+def brute_force(hashes, scores, query, max_distance):
+    best = None
+    for image_hash, score in zip(hashes, scores):
+        distance = (image_hash ^ query).bit_count()
+        if distance <= max_distance and (best is None or distance < best[1]):
+            best = (score, distance)
+    return best
+
+
+def text_index(capacity):
+    """A TextLSHIndex whose memory budget holds exactly capacity texts"""
+    bytes_per_entry = 64 * 4 + 2 + 1 + 8 + 16 * BAND_ENTRY_BYTES
+    index = TextLSHIndex(memory_budget_mb=(capacity + 0.5) * bytes_per_entry / (1024 * 1024))
+    assert index.capacity == capacity
+    return index
+
+
+def post(i):
+    """A post of random words, unrelated to post(j) for any other j"""
+    rng = random.Random(i)
+    return ' '.join(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 8)))
+                    for _ in range(15))
+
+
+def check_image_index():
+    failures = 0
+    rng = random.Random(0)
+
+    # Lookups against a brute-force scan, with queries near stored hashes
+    index = ImageHashIndex(max_distance=MAX_DISTANCE)
+    hashes = [rng.getrandbits(HASH_BITS) for _ in range(2000)]
+    scores = [rng.randrange(100) for _ in hashes]
+    for image_hash, score in zip(hashes, scores):
+        index.add(image_hash, score)
+    queries = [flip(rng.choice(hashes), rng.sample(range(HASH_BITS), rng.randrange(8))) for _ in range(2000)]
+    mismatches = sum(index.find(query) != brute_force(hashes, scores, query, MAX_DISTANCE)
+                     for query in queries)
+    failures += not check("Multi-index lookup matches a brute-force scan", mismatches == 0,
+                          f"({len(queries)} queries, {mismatches} mismatches)")
+
+    # Exactly at the threshold: one differing bit in each chunk but the last
+    index = ImageHashIndex(max_distance=MAX_DISTANCE)
+    stored = rng.getrandbits(HASH_BITS)
+    index.add(stored, 77)
+    starts = [lo for lo, _ in index._chunks]
+    at_threshold = flip(stored, starts[:MAX_DISTANCE])
+    beyond = flip(at_threshold, [starts[MAX_DISTANCE]])
+    failures += not check("Hash at max_distance found", index.find(at_threshold) == (77, MAX_DISTANCE))
+    failures += not check("Hash one bit beyond it not found", index.find(beyond) is None)
+    failures += not check("Closest of several matches returned",
+                          index.add(flip(stored, [1]), 12) and index.find(flip(stored, [1, 2])) == (12, 1))
+
+    # Capacity
+    index = ImageHashIndex(max_distance=MAX_DISTANCE, max_entries=3)
+    added = [index.add(image_hash, i) for i, image_hash in enumerate(hashes[:5])]
+    failures += not check("New hashes ignored at max_entries",
+                          added == [True, True, True, False, False] and len(index) == 3
+                          and index.find(hashes[0]) == (0, 0) and index.find(hashes[4]) is None)
+    index = ImageHashIndex(max_distance=MAX_DISTANCE)
+    failures += not check("Exact duplicates not added again",
+                          index.add(hashes[0], 1) and not index.add(hashes[0], 99) and index.find(hashes[0]) == (1, 0))
+
+    # Save and load
+    workdir = tempfile.mkdtemp(prefix='index-test-')
+    try:
+        path = os.path.join(workdir, 'image_hashes.npz')
+        index = ImageHashIndex(max_distance=MAX_DISTANCE, version='v1')
+        for image_hash, score in zip(hashes[:100], scores[:100]):
+            index.add(image_hash, score)
+        index.save(path)
+        loaded = ImageHashIndex.load(path, version='v1')
+        failures += not check("Saved index loads with the same entries",
+                              loaded is not None and len(loaded) == 100 and loaded.version == 'v1'
+                              and all(loaded.find(query) == index.find(query) for query in queries[:300])
+                              and not os.path.exists(path + '.tmp'))
+        failures += not check("Index of another version not loaded", ImageHashIndex.load(path, version='v2') is None)
+        failures += not check("Load keeps at most max_entries", len(ImageHashIndex.load(path, max_entries=10)) == 10)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return failures
+
+
+def check_detector_index():
+    failures = 0
+    detector = DeceptionDetector()
+    for i in range(10):
+        detector.image_index.add(random.Random(i).getrandbits(HASH_BITS), 40)
+    detector.save_image_index()
+
+    text_side = DeceptionDetector(text_scoring='blended', text_model_weight=0.3, cascade=True)
+    failures += not check("Index kept under other text scoring and cascade settings",
+                          text_side.version != detector.version and len(text_side.image_index) == 10)
+    for settings in ({'image_scoring': 'blended'}, {'image_scoring': 'rule', 'image_model_weight': 0.2}):
+        image_side = DeceptionDetector(**settings)
+        failures += not check(f"Index dropped under {settings}",
+                              image_side.image_version != detector.image_version and len(image_side.image_index) == 0)
+    return failures
+
+
+def check_text_index():
+    failures = 0
+    index = text_index(10)
+    signatures = [index.signature(post(i)) for i in range(10)]
+    sizes = [index.add(signature, i) for i, signature in enumerate(signatures)]
+    failures += not check("Unrelated posts form separate clusters",
+                          sizes == [1] * 10 and index.stats()['clusters'] == 10)
+
+    # Two reposts of post 9 (the newest) make a cluster of three
+    repost = index.signature(post(9).upper() + '  ')
+    match = index.find(repost)
+    failures += not check("Repost found", match is not None and match['score'] == 9 and match['cluster_size'] == 1)
+    sizes = [index.add(repost, 5), index.add(repost, 6)]
+    failures += not check("Reposts join the cluster", sizes == [2, 3] and index.find(repost)['cluster_size'] == 3)
+
+    # The index was full, so the reposts evicted posts 0 and 1 (the oldest)
+    failures += not check("Oldest texts evicted at capacity",
+                          len(index) == 10 and index.find(signatures[0]) is None
+                          and index.find(signatures[1]) is None and index.find(signatures[2]) is not None,
+                          f"({index.stats()})")
+    for i in range(8):
+        index.add(index.signature(post(100 + i)), 1)
+    failures += not check("Evicting the original shrinks its cluster",
+                          index.find(repost)['cluster_size'] == 2
+                          and index.stats()['largest_cluster'] == 2)
+    index.add(index.signature(post(200)), 1)
+    index.add(index.signature(post(201)), 1)
+    failures += not check("Cluster gone once every copy is evicted",
+                          index.find(repost) is None and index.stats() == {
+                              'entries': 10, 'capacity': 10, 'clusters': 10, 'largest_cluster': 1})
+
+    # Invalidated scores
+    index = text_index(10)
+    index.add(signatures[9], 80)
+    index.add(repost, 80)
+    index.invalidate_scores()
+    match = index.find(repost)
+    failures += not check("invalidate_scores drops the score, keeps the cluster",
+                          match['score'] is None and match['cluster_size'] == 2)
+    index.add(repost, 30)
+    match = index.find(repost)
+    failures += not check("A new copy's score is found again", match['score'] == 30 and match['cluster_size'] == 3)
+    failures += not check("Short texts get no signature", index.signature('Too short') is None)
+    return failures
+
+
+def main():
+    print("=" * 80)
+    print("NEAR-DUPLICATE INDEXES")
+    print("=" * 80)
+    failures = check_image_index() + check_detector_index() + check_text_index()
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: image and text indexes find, evict and persist entries correctly")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
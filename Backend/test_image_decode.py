@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Check reduced JPEG decoding against full decoding
+
+score_image decodes JPEGs at the smallest DCT scale covering
+IMAGE_DECODE_SIZE. The dataset JPEGs are all smaller than twice that, so
+they, and PNG, GIF and WebP images of any size, must score exactly as
+with full decoding (same score, hash and model features). Upscaled copies
+of dataset images, decoded at 1/2 and 1/4 scale (full decoding of larger
+ones exceeds MAX_IMAGE_PIXELS), must score
+within the documented tolerance (10 points, the colour-count rule) and
+give the same verdict for every text.
+"""
+
+import sys
+import os
+import io
+import glob
+import random
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Detectors start without a seeded image index
+MODEL_DIR = tempfile.mkdtemp(prefix='image-decode-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+import numpy as np
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from models import deception_detector
+from models.deception_detector import DeceptionDetector, score_image
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+UPSCALED = 20
+OTHER_FORMATS = ('PNG', 'GIF', 'WEBP')
+# Largest score change reduced decoding may cause (IMAGE_DECODE_SIZE comment)
+TOLERANCE = 10
+TEXTS = (
+    "Lovely walk in the park this morning with the dog.",
+    "Our quarterly report shows revenue grew 4% compared with last year.",
+    "Check out this photo, limited offer, click here",
+    "URGENT!!! Verify your bank account now at http://secure-login.xyz 🚨",
+)
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def score(data, full):
+    """score_image with features, decoding at full resolution or reduced scale"""
+    decode_size = deception_detector.IMAGE_DECODE_SIZE
+    if full:
+        # draft() with no target size keeps the full DCT scale
+        deception_detector.IMAGE_DECODE_SIZE = None
+    try:
+        return score_image(io.BytesIO(data), with_features=True)
+    finally:
+        deception_detector.IMAGE_DECODE_SIZE = decode_size
+
+
+def verdicts(detector, data, full):
+    """Verdict for each text with the image, each scored from an empty image index"""
+    decode_size = deception_detector.IMAGE_DECODE_SIZE
+    if full:
+        deception_detector.IMAGE_DECODE_SIZE = None
+    try:
+        results = []
+        for text in TEXTS:
+            detector.image_index = deception_detector.ImageHashIndex(
+                max_distance=deception_detector.NEAR_DUPLICATE_DISTANCE)
+            results.append(detector.analyze(text, FileStorage(stream=io.BytesIO(data), filename='upload.jpg'))['verdict'])
+        return results
+    finally:
+        deception_detector.IMAGE_DECODE_SIZE = decode_size
+
+
+def same(a, b):
+    return a[0] == b[0] and a[1] == b[1] and np.array_equal(a[2], b[2])
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def decode_scale(data):
+    """DCT scale denominator draft() picks for an image (1 for full size)"""
+    image = Image.open(io.BytesIO(data))
+    width = image.width
+    image.draft('RGB', deception_detector.IMAGE_DECODE_SIZE)
+    return round(width / image.width)
+
+
+def main():
+    print("=" * 80)
+    print("REDUCED JPEG DECODING")
+    print("=" * 80)
+    failures = 0
+
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    datasets = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            datasets.append(f.read())
+
+    # Dataset JPEGs are below the reduction threshold: exact
+    small = all(Image.open(io.BytesIO(data)).format == 'JPEG' and decode_scale(data) == 1 for data in datasets)
+    failures += not check("Dataset images are JPEGs too small to reduce", small, f"({len(datasets)} images)")
+    wrong = sum(not same(score(data, full=True), score(data, full=False)) for data in datasets)
+    failures += not check("Dataset JPEGs score exactly as fully decoded", wrong == 0,
+                          f"({len(datasets)} images, {wrong} differ)")
+
+    # Upscaled copies are decoded at reduced scale
+    rng = random.Random(0)
+    samples = rng.sample(datasets, UPSCALED)
+    upscaled = []
+    for i, data in enumerate(samples):
+        # Within MAX_IMAGE_PIXELS; the first is just large enough for 1/4 scale
+        size = (4096, 4096) if i == 0 else (rng.randint(2048, 4096), rng.randint(2048, 4000))
+        upscaled.append(encode(Image.open(io.BytesIO(data)).convert('RGB').resize(size, Image.BICUBIC), 'JPEG'))
+    scales = sorted({decode_scale(data) for data in upscaled})
+    failures += not check("Upscaled JPEGs decode at reduced scale", scales and min(scales) >= 2, f"(1/{scales})")
+    full = [score(data, full=True)[0] for data in upscaled]
+    reduced = [score(data, full=False)[0] for data in upscaled]
+    differences = [abs(a - b) for a, b in zip(full, reduced)]
+    failures += not check(f"Reduced scores within {TOLERANCE} of full decoding", max(differences) <= TOLERANCE,
+                          f"({len(upscaled)} images, {sum(d > 0 for d in differences)} differ, max {max(differences)})")
+    detector = DeceptionDetector()
+    wrong = sum(verdicts(detector, data, full=True) != verdicts(detector, data, full=False) for data in upscaled)
+    failures += not check("Same verdicts with reduced decoding", wrong == 0,
+                          f"({len(upscaled)} images x {len(TEXTS)} texts, {wrong} images differ)")
+
+    # Other formats ignore draft(), whatever their size
+    wrong = []
+    for data in samples[:5]:
+        image = Image.open(io.BytesIO(data)).convert('RGB')
+        for fmt in OTHER_FORMATS:
+            for size in (image.size, (2400, 2400)):
+                encoded = encode(image.resize(size, Image.BICUBIC), fmt)
+                if not same(score(encoded, full=True), score(encoded, full=False)):
+                    wrong.append(f"{fmt} {size}")
+    failures += not check("PNG, GIF and WebP score exactly as fully decoded", not wrong, f"({wrong[:3]})")
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: reduced decoding is exact for small and non-JPEG images and within tolerance otherwise")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    finally:
+        shutil.rmtree(MODEL_DIR, ignore_errors=True)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Check the incremental image feature cache
+
+On a copy of some dataset images (with an identical copy of one file and
+a file that is not an image), a process pool run must give the same
+feature columns as a run in this process. After save and load, a second
+update must extract nothing; after files are added, rewritten, touched
+and removed, it must hash only the new and changed files, extract only
+new content, and end with the columns a fresh run over the same files
+gives.
+"""
+
+import sys
+import os
+import glob
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from models import image_feature_cache
+from models.image_feature_cache import ImageFeatureCache, COLUMNS
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGES = 40
+WORKERS = 2
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def same_features(a, b, paths):
+    rows_a, rows_b = a.features_for(paths), b.features_for(paths)
+    return all(np.array_equal(rows_a[name], rows_b[name]) for name in ('content_hash', *COLUMNS))
+
+
+def recorded_update(cache, paths):
+    """Update in this process, returning the stats and the files extract_features decoded"""
+    extracted = []
+    extract_features = image_feature_cache.extract_features
+
+    def recording(path):
+        extracted.append(path)
+        return extract_features(path)
+
+    image_feature_cache.extract_features = recording
+    try:
+        return cache.update(paths, workers=0), extracted
+    finally:
+        image_feature_cache.extract_features = extract_features
+
+
+def main():
+    print("=" * 80)
+    print("IMAGE FEATURE CACHE")
+    print("=" * 80)
+    failures = 0
+
+    sources = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))
+    sources = sources[::len(sources) // (IMAGES + 10)]
+    workdir = tempfile.mkdtemp(prefix='feature-cache-test-')
+    try:
+        paths = []
+        for i, source in enumerate(sources[:IMAGES]):
+            paths.append(os.path.join(workdir, f"{i:03d}.jpg"))
+            shutil.copyfile(source, paths[-1])
+        paths.append(os.path.join(workdir, 'copy.jpg'))
+        shutil.copyfile(paths[0], paths[-1])
+        paths.append(os.path.join(workdir, 'notes.jpg'))
+        with open(paths[-1], 'w') as f:
+            f.write('not an image')
+
+        # Pool against serial
+        serial = ImageFeatureCache()
+        stats, _ = recorded_update(serial, paths)
+        failures += not check("First run hashes and extracts every distinct file",
+                              (stats['hashed'], stats['extracted'], stats['duplicates'], stats['failed'])
+                              == (len(paths), len(paths) - 1, 1, 1),
+                              f"({stats['hashed']} hashed, {stats['extracted']} extracted)")
+        pooled = ImageFeatureCache()
+        pooled.update(paths, workers=WORKERS)
+        failures += not check("Pool run equals serial run", same_features(serial, pooled, paths)
+                              and len(serial) == len(pooled), f"({WORKERS} workers)")
+        failures += not check("Identical files share one row",
+                              serial.features_for(paths[:1])['content_hash'][0]
+                              == serial.features_for(paths[-2:-1])['content_hash'][0])
+
+        # Rerun over unchanged files
+        cache_path = os.path.join(workdir, image_feature_cache.CACHE_FILE)
+        serial.save(cache_path)
+        cache = ImageFeatureCache.load(cache_path)
+        stats, extracted = recorded_update(cache, paths)
+        failures += not check("Rerun after load extracts nothing", stats['hashed'] == 0 and not extracted
+                              and same_features(cache, serial, paths), f"({stats['seconds'] * 1000:.1f} ms)")
+
+        # Added, rewritten, touched and removed files
+        added = []
+        for i, source in enumerate(sources[IMAGES:IMAGES + 3]):
+            added.append(os.path.join(workdir, f"new-{i}.jpg"))
+            shutil.copyfile(source, added[-1])
+        rewritten = paths[1]
+        shutil.copyfile(sources[IMAGES + 3], rewritten)
+        touched = paths[2]
+        stat = os.stat(touched)
+        os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        removed = paths[3:5]
+        current = [path for path in paths if path not in removed] + added
+        stats, extracted = recorded_update(cache, current)
+        failures += not check("Only new and changed files are hashed",
+                              stats['hashed'] == len(added) + 2, f"({stats['hashed']} hashed)")
+        failures += not check("Only new content is extracted", sorted(extracted) == sorted(added + [rewritten]),
+                              f"({len(extracted)} extracted)")
+        fresh = ImageFeatureCache()
+        fresh.update(current, workers=WORKERS)
+        failures += not check("Updated cache equals a fresh run", same_features(cache, fresh, current)
+                              and len(cache) == len(fresh), f"({len(cache)} rows)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: feature cache updates are incremental and pool runs match serial runs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Check the image model and batched image scoring
+
+Fits a small image model on dataset images, saved into a temporary
+MODEL_DIR, and checks that ImageModel's probabilities match scikit-learn's,
+that the features the detector computes for an upload equal the cached
+training features, and that analyze_batch gives the same image scores as
+one analyze() call per post in every image scoring mode, with and without
+an image pool.
+"""
+
+import sys
+import os
+import glob
+import shutil
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODEL_DIR = tempfile.mkdtemp(prefix='image-model-test-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+
+from werkzeug.datastructures import FileStorage
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+from models.image_model import ImageModel, IMAGE_MODEL_FILE
+from models.image_feature_cache import extract_features
+from models.deception_detector import DeceptionDetector, score_image, IMAGE_SCORING_MODES
+
+TOLERANCE = 1e-9
+DATASET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'final datasets')
+
+
+def pick_images(count=40):
+    """One image per source photo from each label (the datasets hold augmented variants)"""
+    images = []
+    for label in ('fake', 'real'):
+        originals = {}
+        for path in sorted(glob.glob(os.path.join(DATASET_DIR, label, '*'))):
+            originals.setdefault(os.path.basename(path).split('.rf.')[0], path)
+        images += list(originals.values())[::max(len(originals) // (count // 2), 1)][:count // 2]
+    return images
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def image_scores(detector, paths, batch):
+    """Image score per path, from one analyze_batch call or one analyze call each"""
+    files = [open(path, 'rb') for path in paths]
+    try:
+        uploads = [FileStorage(stream=f, filename=os.path.basename(path)) for f, path in zip(files, paths)]
+        if batch:
+            results = detector.analyze_batch(['Photo'] * len(paths), uploads)
+        else:
+            results = [detector.analyze('Photo', upload) for upload in uploads]
+        return [result['imageScore'] for result in results]
+    finally:
+        for f in files:
+            f.close()
+
+
+def main():
+    print("=" * 80)
+    print("IMAGE MODEL")
+    print("=" * 80)
+    failures = 0
+    try:
+        paths = pick_images()
+        if not paths:
+            print("No dataset images found; skipping")
+            return
+        rows = [extract_features(path) for path in paths]
+        features = np.array([row['model_features'] for row in rows])
+        labels = np.array([os.path.basename(os.path.dirname(path)) == 'fake' for path in paths], dtype=int)
+
+        scaler = StandardScaler().fit(features)
+        classifier = LogisticRegression(max_iter=2000).fit(scaler.transform(features), labels)
+        expected = classifier.predict_proba(scaler.transform(features))[:, 1]
+        model = ImageModel.from_sklearn(scaler, classifier, {'accuracy': 1.0})
+        model.save(os.path.join(MODEL_DIR, IMAGE_MODEL_FILE))
+        loaded = ImageModel.load(os.path.join(MODEL_DIR, IMAGE_MODEL_FILE))
+        error = np.abs(loaded.predict_proba(features) - expected).max()
+        failures += not check("Probabilities match scikit-learn (loaded model)", error < TOLERANCE,
+                              f"(max error {error:.1e})")
+        single = np.array([loaded.predict_proba(row)[0] for row in features])
+        failures += not check("One row at a time matches the batch", np.abs(single - expected).max() < TOLERANCE)
+        failures += not check("Saved model keeps its version and metrics",
+                              loaded.version == model.version and loaded.metrics == {'accuracy': 1.0})
+
+        # Serving computes the same features as training
+        mismatched = 0
+        for path, row in zip(paths, rows):
+            with open(path, 'rb') as f:
+                _, _, served = score_image(f, with_features=True)
+            mismatched += served is None or not np.allclose(served, row['model_features'])
+        failures += not check("Upload features equal the cached training features", not mismatched,
+                              f"({mismatched}/{len(paths)} differ)")
+
+        # Batch and single scoring agree in every mode, with and without a pool
+        for mode in IMAGE_SCORING_MODES:
+            for workers in (0, 1):
+                scores = {}
+                for batch in (False, True):
+                    detector = DeceptionDetector(image_workers=workers, image_scoring=mode)
+                    detector.load_models()
+                    try:
+                        scores[batch] = image_scores(detector, paths, batch)
+                    finally:
+                        if detector.image_pool is not None:
+                            detector.image_pool.shutdown()
+                label = f"Batch equals single scoring: {mode}, {'pool' if workers else 'inline'}"
+                failures += not check(label, scores[True] == scores[False])
+        blended_scores = scores[True]
+
+        detector = DeceptionDetector(image_scoring='rule')
+        detector.load_models()
+        failures += not check("Blended scoring changes image scores",
+                              image_scores(detector, paths, True) != blended_scores)
+        status = detector.model_status()['image_model']
+        failures += not check("Model status reports the image model", status['loaded']
+                              and status['version'] == model.version)
+    finally:
+        shutil.rmtree(MODEL_DIR)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: image model matches scikit-learn and batch scoring matches single scoring")
+
+
+if __name__ == '__main__':
+    main()
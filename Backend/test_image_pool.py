@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Check the image scoring process pool
+
+Checks that images handed to the workers through shared memory score as
+they do inline (including uploads larger than one copy chunk), that an
+image exceeding the timeout gets the fallback score and its workers are
+terminated rather than left running, that an image waiting on those
+workers is submitted again to the new ones, and that no shared memory
+block is left in /dev/shm.
+"""
+
+import sys
+import os
+import io
+import glob
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from PIL import Image
+from models import image_pool
+from models.image_pool import ImagePool, FALLBACK_SCORE
+from models.deception_detector import score_image
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SHM_DIR = '/dev/shm'
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def shared_blocks():
+    return set(os.listdir(SHM_DIR)) if os.path.isdir(SHM_DIR) else set()
+
+
+def same_result(a, b):
+    return a[0] == b[0] and (a[1] is None) == (b[1] is None) and (a[1] is None or np.array_equal(a[1], b[1]))
+
+
+def large_png():
+    """A noisy PNG of a few MB (several copy chunks)"""
+    buffer = io.BytesIO()
+    pixels = np.random.RandomState(0).randint(0, 256, (1200, 1200, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def main():
+    print("=" * 80)
+    print("IMAGE POOL")
+    print("=" * 80)
+    failures = 0
+    before = shared_blocks()
+
+    paths = sorted(glob.glob(os.path.join(BACKEND_DIR, 'final datasets', '*', '*')))[:8]
+    images = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            images.append(f.read())
+    images.append(large_png())
+
+    # Shared memory handoff
+    pool = ImagePool(2, timeout=60)
+    try:
+        streams = [io.BytesIO(data) for data in images]
+        pending = [pool.submit(stream, with_features=True) for stream in streams]
+        pooled = [image.result() for image in pending]
+        inline = [score_image(io.BytesIO(data), with_features=True) for data in images]
+        failures += not check("Pooled results match inline scoring",
+                              all(same_result(a, b) for a, b in zip(pooled, inline)),
+                              f"({len(images)} images, largest {max(map(len, images)) // 1024} KB)")
+        failures += not check("Uploads rewound after the copy", all(stream.tell() == 0 for stream in streams))
+        failures += not check("Large upload spans several copy chunks",
+                              len(images[-1]) > 2 * image_pool.COPY_CHUNK_SIZE)
+        failures += not check("Pixel budget reaches the worker",
+                              pool.submit(io.BytesIO(images[-1]), max_pixels=1024).result()[1] is None
+                              and score_image(io.BytesIO(images[-1]), max_pixels=1024)[1] is None)
+    finally:
+        pool.shutdown()
+
+    # Timeout: the first image waits for the workers to start, which takes
+    # far longer than its timeout; the second was submitted with a long one
+    pool = ImagePool(1, timeout=0.01)
+    try:
+        stuck = pool.submit(io.BytesIO(images[0]), with_features=True)
+        pool.timeout = 60
+        waiting = pool.submit(io.BytesIO(images[1]), with_features=True)
+        executor = pool._executor
+        processes = list(executor._processes.values())
+        failures += not check("Image past its timeout gets the fallback score",
+                              stuck.result() == (FALLBACK_SCORE, None))
+        for process in processes:
+            process.join(10)
+        failures += not check("Workers of the timed-out image terminated",
+                              processes and not any(process.is_alive() for process in processes),
+                              f"({len(processes)} workers)")
+        failures += not check("Image waiting on them is submitted again",
+                              same_result(waiting.result(), inline[1]))
+        failures += not check("Next image runs on new workers",
+                              pool._executor is not executor
+                              and same_result(pool.submit(io.BytesIO(images[2]), with_features=True).result(),
+                                              inline[2]))
+    finally:
+        pool.shutdown()
+
+    leaked = shared_blocks() - before
+    failures += not check("No shared memory block left in /dev/shm", not leaked, f"({sorted(leaked)})")
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: images reach the pool through shared memory and timeouts stop their workers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Check the request metrics and GET /api/metrics
+
+Records from many short-lived threads and checks that no count is lost
+once the threads have finished, checks the Prometheus text format of a
+histogram, then sends analyses through the Flask app and checks the
+exposed request, verdict, image size and stage metrics.
+"""
+
+import sys
+import os
+import io
+import re
+import glob
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='metrics-test-')}/history.db"
+
+from models.metrics import Registry
+
+THREADS = 50
+PER_THREAD = 2000
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def sample(text, name, **labels):
+    """Value of one sample in Prometheus text output (None if absent)"""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = '^' + re.escape(name + (f"{{{label_text}}}" if labels else '')) + r' (\S+)$'
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def main():
+    print("=" * 80)
+    print("REQUEST METRICS")
+    print("=" * 80)
+    failures = 0
+
+    # Counts recorded by finished threads are kept
+    registry = Registry()
+    counter = registry.counter('test_total', 'Test counter', ('kind',))
+    histogram = registry.histogram('test_seconds', 'Test histogram', buckets=(0.1, 1.0))
+    gauge = registry.gauge('test_in_flight', 'Test gauge')
+
+    def record():
+        child = counter.labels('a')
+        for i in range(PER_THREAD):
+            child.inc()
+            histogram.observe(0.05 if i % 2 else 0.5)
+            with gauge.track():
+                pass
+
+    for _ in range(2):
+        threads = [threading.Thread(target=record) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    total = 2 * THREADS * PER_THREAD
+    text = registry.render()
+    failures += not check("Counter sums every thread", sample(text, 'test_total', kind='a') == total,
+                          f"({sample(text, 'test_total', kind='a'):.0f} of {total})")
+    failures += not check("Gauge returns to zero", sample(text, 'test_in_flight') == 0)
+    buckets = [sample(text, 'test_seconds_bucket', le=le) for le in ('0.1', '1.0', '+Inf')]
+    failures += not check("Histogram buckets are cumulative", buckets == [total / 2, total, total], f"({buckets})")
+    failures += not check("Histogram count and sum", sample(text, 'test_seconds_count') == total
+                          and abs(sample(text, 'test_seconds_sum') - total * 0.275) < 1e-6)
+    failures += not check("HELP and TYPE lines", "# HELP test_seconds Test histogram\n# TYPE test_seconds histogram"
+                          in text)
+
+    # Metrics of analyses served by the Flask app
+    from app import app, detector, analysis_history
+    detector.wait_until_ready()
+    client = app.test_client()
+    with open(sorted(glob.glob(os.path.join('final datasets', '*', '*')))[0], 'rb') as f:
+        image_bytes = f.read()
+    before = client.get('/api/metrics').get_data(as_text=True)
+    client.post('/api/analyze', data={'text': 'Metrics check one: quarterly meeting notes'})
+    client.post('/api/analyze', data={'text': 'Metrics check two: URGENT verify account now!!!',
+                                      'image': (io.BytesIO(image_bytes), 'upload.jpg')})
+    client.post('/api/analyze', data={})
+    analysis_history.flush(5)
+    response = client.get('/api/metrics')
+    text = response.get_data(as_text=True)
+
+    def delta(name, **labels):
+        return (sample(text, name, **labels) or 0) - (sample(before, name, **labels) or 0)
+
+    failures += not check("Prometheus content type", response.content_type.startswith('text/plain; version=0.0.4'))
+    ok_requests = delta('deceptra_http_requests_total', endpoint='/api/analyze', method='POST', status='200')
+    bad_requests = delta('deceptra_http_requests_total', endpoint='/api/analyze', method='POST', status='400')
+    failures += not check("Requests counted by status", (ok_requests, bad_requests) == (2, 1),
+                          f"({ok_requests:.0f} ok, {bad_requests:.0f} bad)")
+    verdicts = sum(delta('deceptra_verdicts_total', verdict=verdict)
+                   for verdict in ('AUTHENTIC', 'SUSPICIOUS', 'DECEPTIVE'))
+    failures += not check("Verdicts counted", verdicts == 2)
+    failures += not check("Image size recorded", delta('deceptra_image_upload_bytes_count') == 1
+                          and delta('deceptra_image_upload_bytes_sum') == len(image_bytes))
+    stages = {stage: delta('deceptra_stage_seconds_count', stage=stage)
+              for stage in ('parse', 'cache_key', 'text', 'image', 'image_decode', 'image_color', 'fusion',
+                            'history', 'serialize', 'history_write')}
+    expected = {'parse': 3, 'cache_key': 2, 'text': 2, 'image': 1, 'image_decode': 1, 'image_color': 1,
+                'fusion': 2, 'history': 2, 'serialize': 2}
+    failures += not check("Stages timed once per analysis",
+                          all(stages[stage] == count for stage, count in expected.items())
+                          and stages['history_write'] >= 1, f"({stages})")
+    failures += not check("Nothing left in flight", sample(text, 'deceptra_analyses_in_flight') == 0
+                          and sample(text, 'deceptra_http_requests_in_flight') == 1)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: metrics are recorded without loss and exposed in the Prometheus format")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Hot reload test for the text model
+
+Exports two text model artifacts into a temporary MODEL_DIR, then swaps
+between them while 16 threads keep scoring posts with model scoring. Every
+score must equal the score of one of the two models (a request never
+mixes them), and no request may fail. Also checks that the watcher picks
+up a new text_model.current, that a corrupted artifact is rejected while
+the active model keeps serving, rollback, /api/model-status, and that
+the reload and rollback endpoints require the admin token.
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MODEL_DIR = tempfile.mkdtemp(prefix='model-reload-test-')
+os.environ['MODEL_DIR'] = MODEL_DIR
+os.environ['DATABASE_URL'] = f"sqlite:///{MODEL_DIR}/history.db"
+os.environ['TEXT_SCORING'] = 'model'
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from models.text_model import TextModel, export_text_model, set_current_text_model
+from models.deception_detector import DeceptionDetector
+from train import TRAINING_DATA
+
+THREADS = 16
+SWAPS = 40
+ADMIN_TOKEN = 'test-admin-token'
+ADMIN = {'Authorization': f'Bearer {ADMIN_TOKEN}'}
+
+
+def export_models():
+    """Two models that score the same texts differently"""
+    texts = [text for text, _ in TRAINING_DATA]
+    labels = np.array([label for _, label in TRAINING_DATA])
+    paths = []
+    for flip in (False, True):
+        vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+        classifier = LogisticRegression(C=100, max_iter=1000).fit(vectorizer.fit_transform(texts),
+                                                                   1 - labels if flip else labels)
+        paths.append(export_text_model(vectorizer, classifier, MODEL_DIR))
+    return paths, texts
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def main():
+    print("=" * 80)
+    print("TEXT MODEL HOT RELOAD")
+    print("=" * 80)
+    failures = 0
+    try:
+        (path_a, path_b), texts = export_models()
+        model_a, model_b = TextModel.load(path_a), TextModel.load(path_b)
+        expected = {text: {int(model_a.predict_proba([text])[0] * 100), int(model_b.predict_proba([text])[0] * 100)}
+                    for text in texts}
+        differing = sum(len(scores) == 2 for scores in expected.values())
+        failures += not check("The two models score texts differently", differing > len(texts) // 2,
+                              f"({differing}/{len(texts)} texts)")
+
+        # Starts on model B (text_model.current names the last export)
+        detector = DeceptionDetector(text_scoring='model', keep_versions=2)
+        detector.load_models()
+        failures += not check("Loads the artifact text_model.current names", detector.text_model.version == model_b.version)
+
+        # Score from many threads while the model is swapped back and forth
+        errors, mismatches, scored = [], [], [0]
+        stop = threading.Event()
+
+        def score():
+            i = 0
+            while not stop.is_set():
+                text = texts[i % len(texts)]
+                i += 1
+                try:
+                    text_score = detector._analyze_text(text)
+                    if text_score not in expected[text]:
+                        mismatches.append((text, text_score))
+                    scored[0] += 1
+                except Exception as e:
+                    errors.append(str(e))
+
+        threads = [threading.Thread(target=score) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        reload_seconds = []
+        for i in range(SWAPS):
+            record = detector.reload_text_model((model_a if i % 2 == 0 else model_b).version)
+            reload_seconds.append(record['seconds'])
+            time.sleep(0.01)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        failures += not check(f"{SWAPS} swaps under {THREADS} scoring threads: no failed requests", not errors,
+                              f"({scored[0]} texts scored)")
+        failures += not check("Every score comes from one of the two models", not mismatches,
+                              f"({len(mismatches)} mismatches)")
+        print(f"{'':<4}Swap to a kept model: median {np.median(reload_seconds) * 1000:.1f} ms "
+              f"(canary check included)")
+
+        # An explicit version is written to text_model.current
+        with open(os.path.join(MODEL_DIR, 'text_model.current')) as f:
+            pointer = f.read().strip()
+        failures += not check("Reload by version updates text_model.current",
+                              pointer == os.path.basename(detector.text_model.path))
+
+        # The watcher follows text_model.current
+        set_current_text_model(MODEL_DIR, path_a)
+        detector.start_model_watcher(0.05)
+        deadline = time.time() + 5
+        while detector.text_model.version != model_a.version and time.time() < deadline:
+            time.sleep(0.01)
+        failures += not check("Watcher picks up a new text_model.current", detector.text_model.version == model_a.version)
+
+        # A corrupted artifact is rejected; the active model keeps serving
+        corrupted = os.path.join(MODEL_DIR, 'text_model-corrupted')
+        shutil.copytree(path_b, corrupted)
+        coef = np.load(os.path.join(corrupted, 'coef.npy'))
+        np.save(os.path.join(corrupted, 'coef.npy'), coef * 2)
+        set_current_text_model(MODEL_DIR, corrupted)
+        time.sleep(0.3)
+        status = detector.model_status()['text_model']
+        failures += not check("Corrupted artifact is rejected, active model unchanged",
+                              status['version'] == model_a.version and status['last_reload']['status'] == 'failed',
+                              f"({status['last_reload'].get('error')})")
+        set_current_text_model(MODEL_DIR, path_a)
+
+        # Rollback reactivates the previously active model without loading it
+        record = detector.rollback_text_model()
+        failures += not check("Rollback reactivates the previous model", detector.text_model.version == model_b.version
+                              and record['previous_version'] == model_a.version)
+        failures += not check("Keeps at most keep_versions models", len(detector.model_status()['text_model']['kept_versions']) == 2)
+
+        # Flask endpoints
+        import app as flask_module
+        flask_module.detector = detector
+        client = flask_module.app.test_client()
+        flask_module.app.config['ADMIN_TOKEN'] = ''
+        response = client.post('/api/model/reload', json={'version': model_a.version})
+        failures += not check("Reload and rollback absent without an admin token", response.status_code == 404
+                              and client.post('/api/model/rollback', json={}).status_code == 404)
+        flask_module.app.config['ADMIN_TOKEN'] = ADMIN_TOKEN
+        wrong = {'Authorization': 'Bearer wrong-token'}
+        response = client.post('/api/model/reload', json={'version': model_a.version}, headers=wrong)
+        failures += not check("Reload and rollback reject a wrong admin token", response.status_code == 403
+                              and client.post('/api/model/rollback', json={}, headers=wrong).status_code == 403
+                              and detector.text_model.version == model_b.version)
+        response = client.get('/api/model-status')
+        body = response.get_json()
+        failures += not check("/api/model-status reports the active version", response.status_code == 200
+                              and body['text_model']['version'] == model_b.version,
+                              json.dumps(body['text_model']['kept_versions']))
+        response = client.post('/api/model/reload', json={'version': model_a.version}, headers=ADMIN)
+        failures += not check("POST /api/model/reload activates a version", response.status_code == 200
+                              and detector.text_model.version == model_a.version)
+        response = client.post('/api/model/reload', json={'version': '../elsewhere'}, headers=ADMIN)
+        failures += not check("POST /api/model/reload rejects an invalid version", response.status_code == 400)
+        response = client.post('/api/model/rollback', json={'version': 'missing'}, headers=ADMIN)
+        failures += not check("POST /api/model/rollback rejects an unknown version", response.status_code == 400)
+    finally:
+        shutil.rmtree(MODEL_DIR)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: text models swap without failed or mixed requests")
+
+
+if __name__ == '__main__':
+    main()
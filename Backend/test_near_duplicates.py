@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Check the near-duplicate handling of repeated posts
+
+A harmless version of a post analyzed first must not lower the score of
+a scam variant analyzed after it (through analyze() or analyze_batch()),
+while the repost cluster is still reported.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.deception_detector import DeceptionDetector, CLUSTER_REASON_PREFIX
+
+POST = ("Hi everyone, thanks for coming to the community garden meeting on Saturday. We planted tomatoes, "
+        "beans and herbs along the south fence and agreed on a watering rota for the summer. ")
+SCAM = POST + "Verify your bank account now!"
+HARMLESS = POST + "See you next month at the park!"
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def main():
+    print("=" * 80)
+    print("NEAR-DUPLICATE POSTS")
+    print("=" * 80)
+    failures = 0
+
+    fresh = DeceptionDetector().analyze(SCAM)
+    harmless = DeceptionDetector().analyze(HARMLESS)
+    failures += not check("Scam variant scores above the harmless one", fresh['textScore'] > harmless['textScore'],
+                          f"({fresh['textScore']} vs {harmless['textScore']})")
+
+    # Harmless version first
+    detector = DeceptionDetector()
+    detector.analyze(HARMLESS)
+    laundered = detector.analyze(SCAM)
+    failures += not check("Harmless version first does not lower the scam's score",
+                          laundered['textScore'] == fresh['textScore'] and laundered['verdict'] == fresh['verdict'],
+                          f"({laundered['textScore']} {laundered['verdict']})")
+    failures += not check("Repost cluster still reported",
+                          any(reason.startswith(CLUSTER_REASON_PREFIX + " 2 times") for reason in laundered['reasons']))
+    batched = DeceptionDetector().analyze_batch([HARMLESS, SCAM])
+    failures += not check("Same in analyze_batch", batched[1]['textScore'] == fresh['textScore'])
+
+    # Scam first: a harmless variant of it keeps the higher score
+    detector = DeceptionDetector()
+    detector.analyze(SCAM)
+    failures += not check("Variant of a scored scam keeps its score",
+                          detector.analyze(HARMLESS)['textScore'] == fresh['textScore'])
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: near-duplicates never score below an earlier version of the post")
+
+
+if __name__ == '__main__':
+    main()
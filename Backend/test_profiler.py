@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Check on-demand request profiling
+
+Arms the profiler through /api/admin/profile for two requests, sends
+three, and checks that exactly two captures are written, that the
+.pstats files load and the .collapsed stacks account for the profiled
+time. Then checks the X-Profile header (honoured only when
+PROFILE_HEADER is set), the time window, and the admin token.
+"""
+
+import sys
+import os
+import time
+import pstats
+import shutil
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+workdir = tempfile.mkdtemp(prefix='profiler-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{workdir}/history.db"
+
+from app import app, detector, request_profiler
+
+TOKEN = 'test-admin-token'
+ADMIN = {'Authorization': f'Bearer {TOKEN}'}
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def captures(directory):
+    return sorted(name for name in os.listdir(directory)) if os.path.isdir(directory) else []
+
+
+def main():
+    print("=" * 80)
+    print("ON-DEMAND REQUEST PROFILING")
+    print("=" * 80)
+    failures = 0
+    detector.wait_until_ready()
+    client = app.test_client()
+    request_profiler.directory = os.path.join(workdir, 'profiles')
+    app.config['ADMIN_TOKEN'] = TOKEN
+    texts = iter(f"Profiler check {i}: URGENT verify your account now!!!" for i in range(100))
+
+    try:
+        # Admin token
+        app.config['ADMIN_TOKEN'] = ''
+        failures += not check("Admin endpoint absent without a token",
+                              client.get('/api/admin/profile', headers=ADMIN).status_code == 404)
+        app.config['ADMIN_TOKEN'] = TOKEN
+        failures += not check("Admin endpoint rejects a wrong token",
+                              client.get('/api/admin/profile', headers={'Authorization': 'Bearer x'}).status_code == 403)
+        failures += not check("Invalid arming rejected",
+                              client.post('/api/admin/profile', json={'requests': 0}, headers=ADMIN).status_code == 400)
+
+        # The next two requests
+        armed = client.post('/api/admin/profile', json={'requests': 2}, headers=ADMIN).get_json()
+        names = [client.post('/api/analyze', data={'text': next(texts)}).headers.get('X-Profile-Name')
+                 for _ in range(3)]
+        files = captures(request_profiler.directory)
+        failures += not check("Two of three requests profiled", armed['remaining_requests'] == 2
+                              and names[0] and names[1] and names[2] is None
+                              and files == sorted(f"{name}.{ext}" for name in names[:2]
+                                                  for ext in ('collapsed', 'pstats')), f"({len(files)} files)")
+        status = client.get('/api/admin/profile', headers=ADMIN).get_json()
+        failures += not check("Disarmed after the armed requests", not status['armed'] and status['recent'] == names[:2])
+
+        # Capture contents
+        path = os.path.join(request_profiler.directory, names[0])
+        stats = pstats.Stats(path + '.pstats')
+        functions = {name for _, _, name in stats.stats}
+        with open(path + '.collapsed', encoding='utf-8') as f:
+            lines = [line.rstrip('\n').rsplit(' ', 1) for line in f]
+        collapsed_total = sum(int(weight) for _, weight in lines) / 1e6
+        failures += not check("pstats covers the detector", {'analyze', '_analyze_text'} <= functions)
+        failures += not check("Collapsed stacks reach the text rules",
+                              any('_analyze_text' in stack and ';' in stack for stack, _ in lines))
+        failures += not check("Collapsed stacks account for the profiled time",
+                              abs(collapsed_total - stats.total_tt) < 0.05 * stats.total_tt,
+                              f"({collapsed_total * 1e3:.2f} of {stats.total_tt * 1e3:.2f} ms)")
+
+        # X-Profile header
+        forced = client.post('/api/analyze', data={'text': next(texts)}, headers={'X-Profile': '1'})
+        app.config['PROFILE_HEADER'] = False
+        ignored = client.post('/api/analyze', data={'text': next(texts)}, headers={'X-Profile': '1'})
+        app.config['PROFILE_HEADER'] = True
+        failures += not check("X-Profile profiles one request", forced.headers.get('X-Profile-Name') is not None
+                              and ignored.headers.get('X-Profile-Name') is None)
+
+        # Time window
+        client.post('/api/admin/profile', json={'seconds': 0.5}, headers=ADMIN)
+        during = [client.post('/api/analyze', data={'text': next(texts)}).headers.get('X-Profile-Name')
+                  for _ in range(3)]
+        time.sleep(0.6)
+        after = client.post('/api/analyze', data={'text': next(texts)}).headers.get('X-Profile-Name')
+        failures += not check("Time window profiles until it expires", all(during) and after is None)
+        client.post('/api/admin/profile', json={'requests': 5}, headers=ADMIN)
+        client.delete('/api/admin/profile', headers=ADMIN)
+        failures += not check("DELETE disarms", client.post('/api/analyze', data={'text': next(texts)})
+                              .headers.get('X-Profile-Name') is None)
+    finally:
+        shutil.rmtree(workdir)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: requests are profiled on demand and written as pstats and collapsed stacks")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check the detector warm-up and GET /api/health/ready
+
+While the background warm-up runs, the readiness endpoint must answer 503
+(state 'starting') and /api/health must still answer 200; once
+wait_until_ready returns True it must answer 200 (state 'ready'). A
+warm-up that raises must set warm_up_error, make wait_until_ready return
+False and keep the endpoint at 503 (state 'failed').
+"""
+
+import sys
+import os
+import tempfile
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='readiness-test-')}/history.db"
+
+import app as flask_module
+from models.deception_detector import DeceptionDetector
+
+TIMEOUT = 60
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def gated_detector(error=None):
+    """A detector whose warm-up waits for the returned event, then warms up or raises error"""
+    detector = DeceptionDetector()
+    release = threading.Event()
+    warm_up = detector.warm_up
+
+    def gated_warm_up():
+        release.wait(TIMEOUT)
+        if error is not None:
+            raise error
+        warm_up()
+
+    detector.warm_up = gated_warm_up
+    return detector, release
+
+
+def main():
+    print("=" * 80)
+    print("READINESS")
+    print("=" * 80)
+    failures = 0
+    client = flask_module.app.test_client()
+    app_detector = flask_module.detector
+
+    try:
+        # Warm-up in progress, then finished
+        detector, release = gated_detector()
+        flask_module.detector = detector
+        detector.start_warm_up()
+        response = client.get('/api/health/ready')
+        failures += not check("503 while warming up", response.status_code == 503
+                              and response.get_json() == {'ready': False, 'state': 'starting'}, f"({response.get_json()})")
+        response = client.get('/api/health')
+        failures += not check("Liveness answers 200 while warming up", response.status_code == 200
+                              and response.get_json()['readiness']['state'] == 'starting')
+        failures += not check("wait_until_ready times out while warming up", not detector.wait_until_ready(0.05))
+        release.set()
+        ready = detector.wait_until_ready(TIMEOUT)
+        response = client.get('/api/health/ready')
+        body = response.get_json()
+        failures += not check("200 once wait_until_ready succeeds", ready and response.status_code == 200
+                              and body['ready'] and body['state'] == 'ready' and body['warmUpSeconds'] >= 0,
+                              f"({body})")
+        thread = detector._warm_up_thread
+        detector.start_warm_up()
+        failures += not check("Warm-up runs once per process", detector._warm_up_thread is thread and detector.is_ready())
+
+        # Failed warm-up
+        detector, release = gated_detector(error=RuntimeError('model file is corrupt'))
+        flask_module.detector = detector
+        detector.start_warm_up()
+        release.set()
+        ready = detector.wait_until_ready(TIMEOUT)
+        failures += not check("Failed warm-up sets warm_up_error",
+                              not ready and detector.warm_up_error == 'model file is corrupt')
+        response = client.get('/api/health/ready')
+        failures += not check("Failed warm-up never reported ready", response.status_code == 503
+                              and response.get_json() == {'ready': False, 'state': 'failed'}, f"({response.get_json()})")
+    finally:
+        flask_module.detector = app_detector
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: readiness follows the warm-up and a failed warm-up is never reported ready")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Check the analysis result cache
+
+Checks LRU eviction at capacity, TTL expiry, the hit/miss counters, that
+concurrent identical requests (threads and coroutines) run the
+computation once and that its exception reaches every waiter, and that
+the cache key changes with the detector version and every other input.
+"""
+
+import sys
+import os
+import io
+import time
+import asyncio
+import threading
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.datastructures import FileStorage
+from models.result_cache import ResultCache, make_cache_key
+
+CALLERS = 16
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def gated_compute(cache, result=None, error=None):
+    """A compute function that finishes only once every other caller waits on it"""
+    calls = []
+
+    def compute():
+        calls.append(1)
+        deadline = time.monotonic() + 10
+        while cache.coalesced < CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        if error is not None:
+            raise error
+        return result
+
+    return compute, calls
+
+
+def run_threads(cache, key, compute):
+    outcomes = [None] * CALLERS
+
+    def call(i):
+        try:
+            outcomes[i] = cache.get_or_compute(key, compute)
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def main():
+    print("=" * 80)
+    print("RESULT CACHE")
+    print("=" * 80)
+    failures = 0
+
+    # LRU eviction
+    cache = ResultCache(max_entries=3, ttl=60)
+    for key in 'abc':
+        cache.get_or_compute(key, lambda key=key: {'key': key})
+    cache.get_or_compute('a', lambda: {'key': 'recomputed'})  # 'a' becomes the most recent
+    cache.get_or_compute('d', lambda: {'key': 'd'})
+    recomputed = []
+    for key in 'acd':
+        cache.get_or_compute(key, lambda: recomputed.append(key))
+    cache.get_or_compute('b', lambda: recomputed.append('b') or {'key': 'b'})
+    failures += not check("Least recently used entry evicted at capacity",
+                          recomputed == ['b'] and cache.stats()['entries'] == 3, f"({recomputed})")
+    stats = cache.stats()
+    failures += not check("Hit, miss and eviction counters",
+                          (stats['hits'], stats['misses'], stats['evictions']) == (4, 5, 2)
+                          and stats['hit_rate'] == 4 / 9, f"({stats})")
+
+    # Results are copies
+    first = cache.get_or_compute('c', lambda: None)
+    first['key'] = 'changed'
+    failures += not check("Callers get copies of the cached result",
+                          cache.get_or_compute('c', lambda: None) == {'key': 'c'})
+
+    # TTL expiry
+    cache = ResultCache(max_entries=10, ttl=0.05)
+    cache.get_or_compute('a', lambda: {'n': 1})
+    fresh = cache.get_or_compute('a', lambda: {'n': 2})
+    time.sleep(0.1)
+    expired = cache.get_or_compute('a', lambda: {'n': 3})
+    failures += not check("Entries expire after the TTL", fresh == {'n': 1} and expired == {'n': 3}
+                          and cache.stats()['expirations'] == 1)
+    cache = ResultCache(max_entries=0)
+    cache.get_or_compute('a', lambda: {'n': 1})
+    failures += not check("Zero capacity disables caching", cache.get_or_compute('a', lambda: {'n': 2}) == {'n': 2})
+
+    # Coalescing
+    cache = ResultCache()
+    compute, calls = gated_compute(cache, result={'verdict': 'AUTHENTIC'})
+    outcomes = run_threads(cache, 'same', compute)
+    failures += not check(f"{CALLERS} concurrent identical requests compute once",
+                          len(calls) == 1 and all(outcome == {'verdict': 'AUTHENTIC'} for outcome in outcomes)
+                          and cache.coalesced == CALLERS - 1, f"({len(calls)} computations)")
+    failures += not check("Waiters get separate copies", len({id(outcome) for outcome in outcomes}) == CALLERS)
+
+    cache = ResultCache()
+    compute, calls = gated_compute(cache, error=RuntimeError('model failed'))
+    outcomes = run_threads(cache, 'same', compute)
+    failures += not check("Exception from compute reaches every waiter",
+                          len(calls) == 1 and all(isinstance(outcome, RuntimeError) and str(outcome) == 'model failed'
+                                                  for outcome in outcomes))
+    failures += not check("Failed result not cached",
+                          cache.get_or_compute('same', lambda: {'retried': True}) == {'retried': True})
+
+    async def coalesce_async():
+        cache = ResultCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            while cache.coalesced < CALLERS - 1:
+                await asyncio.sleep(0.001)
+            return {'verdict': 'DECEPTIVE'}
+
+        outcomes = await asyncio.gather(*(cache.get_or_compute_async('same', compute) for _ in range(CALLERS)))
+        return calls, outcomes
+
+    calls, outcomes = asyncio.run(coalesce_async())
+    failures += not check("Concurrent coroutines compute once",
+                          len(calls) == 1 and all(outcome == {'verdict': 'DECEPTIVE'} for outcome in outcomes))
+
+    # Cache keys
+    image = FileStorage(stream=io.BytesIO(b'image bytes'), filename='upload.jpg')
+    key = make_cache_key('v1', 'Post', image, True)
+    failures += not check("Key hashing rewinds the image", image.stream.tell() == 0
+                          and make_cache_key('v1', 'Post', image, True) == key)
+    variants = [
+        make_cache_key('v2', 'Post', image, True),
+        make_cache_key('v1', 'Post ', image, True),
+        make_cache_key('v1', 'Post', FileStorage(stream=io.BytesIO(b'other bytes'), filename='upload.jpg'), True),
+        make_cache_key('v1', 'Post', None, True),
+        make_cache_key('v1', 'Post', image, False, True),
+    ]
+    failures += not check("Key changes with version, text, image and metadata",
+                          len({key, *variants}) == len(variants) + 1)
+    cache = ResultCache()
+    cache.get_or_compute(make_cache_key('v1', 'Post'), lambda: {'version': 'v1'})
+    failures += not check("Version change invalidates old entries",
+                          cache.get_or_compute(make_cache_key('v2', 'Post'), lambda: {'version': 'v2'})
+                          == {'version': 'v2'} and cache.misses == 2)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: results are cached, expired, evicted and coalesced correctly")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Check the single-pass keyword matcher and rule features
+
+The rule-based text score must equal the original implementation, which
+searched the text once per keyword (kept below as reference_rule_score),
+on a randomized corpus of posts built from keywords in mixed case,
+emojis, punctuation, digits and filler words. KeywordMatcher must find
+exactly the keywords `keyword in text` finds on fuzzed strings, with
+pyahocorasick and with the regex fallback.
+"""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import text_features
+from models.text_features import KeywordMatcher, TextFeatureExtractor
+from models.deception_detector import DeceptionDetector
+
+CORPUS_SIZE = 3000
+FUZZ_CASES = 100_000
+
+FILLER = ('the', 'post', 'today', 'friends', 'photo', 'weekend', 'city', 'team', 'news', 'people',
+          'cat', 'pinned', 'catalog', 'canal', 'tax-free', 'ATM', 'NASA', 'OK', 'WOW', 'A1', 'café')
+EMOJIS = ('🚨', '⚠️', '⚠', '🔥', '😱', '😀', '👍', 'é', '٣', '²')
+PUNCTUATION = ('!', '!!', '?', '???', '.', '...', '*', '_', '~', '^', '%', ',', ';', ':')
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def random_case(rng, word):
+    choice = rng.random()
+    if choice < 0.6:
+        return word
+    if choice < 0.8:
+        return word.upper()
+    if choice < 0.9:
+        return word.title()
+    return ''.join(c.upper() if rng.random() < 0.5 else c for c in word)
+
+
+def make_corpus(size, seed=0):
+    """Random posts that hit every rule: keywords, emojis, caps, punctuation, digits and lengths"""
+    rng = random.Random(seed)
+    keywords = sorted(set(
+        text_features.HIGH_IMPACT_KEYWORDS + text_features.STANDARD_KEYWORDS + text_features.BANKING_WORDS
+        + text_features.ACTION_WORDS + text_features.SECURITY_WORDS + text_features.THREAT_WORDS
+        + text_features.URGENT_PHRASES + text_features.SCIENTIFIC_TERMS + text_features.EMOTIONAL_WORDS
+        + text_features.COMBO_WORDS + text_features.URL_MARKERS))
+    corpus = ['', 'a', 'BREAKING!!', '⚠️⚠️', '12%', 'renew subscription']
+    while len(corpus) < size:
+        parts = []
+        for _ in range(rng.choice((1, 2, 4, 8, 16, 40))):
+            kind = rng.random()
+            if kind < 0.35:
+                parts.append(random_case(rng, rng.choice(keywords)))
+            elif kind < 0.7:
+                parts.append(rng.choice(FILLER))
+            elif kind < 0.8:
+                parts.append(rng.choice(EMOJIS) * rng.randint(1, 3))
+            elif kind < 0.9:
+                parts[-1:] = [(parts[-1] if parts else '') + rng.choice(PUNCTUATION)]
+            else:
+                parts.append(str(rng.randint(0, 999)))
+        separator = rng.choice((' ', ' ', '', '\n'))
+        text = separator.join(parts)
+        if rng.random() < 0.005:
+            text = (text + ' ') * (10001 // (len(text) + 1) + 1)  # over the long-text threshold
+        corpus.append(text)
+    return corpus
+
+
+def reference_rule_score(text):
+    """The rule-based text score as originally written, one substring search per keyword"""
+    if not text:
+        return 50
+    text_lower = text.lower()
+    words = text.split()
+    score = 27
+
+    emoji_count = sum(1 for c in text if ord(c) > 127)
+    emoji_ratio = emoji_count / len(text) if text else 0
+    if emoji_ratio > 0.15:
+        score += 20
+    elif emoji_ratio > 0.05:
+        score += 10
+    elif emoji_count > 0:
+        score += 3
+    alarm_emojis = text.count('🚨') + text.count('⚠️') + text.count('🔥') + text.count('😱')
+    if alarm_emojis > 0:
+        score += min(alarm_emojis * 5, 10)
+
+    caps_words = [w for w in words if w.isupper() and len(w) > 2 and w.isalpha()]
+    all_caps_ratio = len(caps_words) / len(words) if words else 0
+    if all_caps_ratio > 0.15:
+        score += 15
+    elif all_caps_ratio > 0.08:
+        score += 8
+
+    high_impact_matches = sum(1 for keyword in text_features.HIGH_IMPACT_KEYWORDS if keyword in text_lower)
+    standard_matches = sum(1 for keyword in text_features.STANDARD_KEYWORDS if keyword in text_lower)
+    score += min((high_impact_matches * 12) + (standard_matches * 5), 70)
+    if 'congratulations' in text_lower and 'exclusive' in text_lower and 'reward' in text_lower:
+        score += 15
+    if 'subscription' in text_lower and 'renew' in text_lower and score < 35:
+        score = min(score, 30)
+
+    exclamation_count = text.count('!')
+    question_count = text.count('?')
+    if exclamation_count >= 5:
+        score += 18
+    elif exclamation_count > 3:
+        score += 15
+    elif exclamation_count > 2:
+        score += 10
+    elif exclamation_count > 0:
+        score += 2
+    if question_count > 3:
+        score += 10
+    elif question_count > 1:
+        score += 3
+
+    if 'http://' in text or '.biz' in text or '.xyz' in text or 'click' in text_lower:
+        score += 8
+    has_banking = any(word in text_lower for word in text_features.BANKING_WORDS)
+    has_action = any(word in text_lower for word in text_features.ACTION_WORDS)
+    if has_banking and has_action:
+        score += 30
+    if any(word in text_lower for word in text_features.SECURITY_WORDS):
+        if any(threat in text_lower for threat in text_features.THREAT_WORDS):
+            score += 15
+
+    emphasis_chars = text.count('*') + text.count('_') + text.count('~') + text.count('^')
+    if emphasis_chars > 5:
+        score += 8
+    if len(text) < 15:
+        score += 5
+    elif len(text) > 10000:
+        score += 3
+
+    text_words_lower = [w.strip('.,!?;:') for w in words]
+    emotional_matches = sum(1 for word in text_features.EMOTIONAL_WORDS if word in text_words_lower)
+    score += min(emotional_matches * 2, 10)
+    urgent_matches = sum(1 for phrase in text_features.URGENT_PHRASES if phrase in text_lower)
+    score += min(urgent_matches * 4, 15)
+
+    has_numbers = any(c.isdigit() for c in text)
+    has_percent = '%' in text
+    has_scientific = any(term in text_lower for term in text_features.SCIENTIFIC_TERMS)
+    if has_scientific and (has_numbers or has_percent):
+        score = max(score - 12, 10)
+    return min(max(score, 10), 100)
+
+
+def fuzz_strings(keywords, count, seed=1):
+    """Short strings made of keyword fragments, so overlapping and partial matches are common"""
+    rng = random.Random(seed)
+    fragments = [keyword[i:j] for keyword in keywords for i in range(len(keyword))
+                 for j in range(i + 1, len(keyword) + 1)] + [' ', '\n', 'x', 'é', '🚨']
+    return [''.join(rng.choice(fragments) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+
+def main():
+    print("=" * 80)
+    print("SINGLE-PASS KEYWORD MATCHER")
+    print("=" * 80)
+    failures = 0
+
+    corpus = make_corpus(CORPUS_SIZE)
+    detector = DeceptionDetector()
+    mismatches = [text for text in corpus if detector._analyze_text(text) != reference_rule_score(text)]
+    failures += not check("Rule scores match the per-keyword implementation", not mismatches,
+                          f"({len(corpus)} texts, {len(mismatches)} mismatches)")
+    scores = {reference_rule_score(text) for text in corpus}
+    failures += not check("Corpus covers a wide score range", min(scores) <= 15 and max(scores) >= 90,
+                          f"({min(scores)}-{max(scores)}, {len(scores)} distinct)")
+
+    # Both matcher backends against `keyword in text`
+    keywords = TextFeatureExtractor().matcher.keywords
+    automaton = KeywordMatcher(keywords)
+    installed = text_features.ahocorasick
+    text_features.ahocorasick = None
+    try:
+        fallback = KeywordMatcher(keywords)
+    finally:
+        text_features.ahocorasick = installed
+    failures += not check("Regex fallback built without pyahocorasick", fallback._automaton is None)
+
+    strings = fuzz_strings(keywords, FUZZ_CASES) + [text.lower() for text in corpus]
+    matchers = [('regex', fallback)] + ([('aho-corasick', automaton)] if installed is not None else [])
+    for name, matcher in matchers:
+        wrong = sum(matcher.find(text) != {keyword for keyword in keywords if keyword in text} for text in strings)
+        failures += not check(f"{name} matcher equals `keyword in text`", wrong == 0,
+                              f"({len(strings)} strings, {wrong} mismatches)")
+    if installed is None:
+        print("pyahocorasick is not installed; only the regex fallback was checked")
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: single-pass features and scores match the per-keyword implementation")
+
+
+if __name__ == '__main__':
+    main()
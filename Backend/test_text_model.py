@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Check the NumPy text model against scikit-learn
+
+Fits TF-IDF + logistic regression models with several vectorizer settings,
+exports each as an artifact, and checks that TextModel's probabilities
+(loaded from the artifact, and converted directly from the fitted objects)
+match predict_proba to within 1e-6, one text at a time and in batches. Then
+checks that the detector's batch scoring equals its single-text scoring in
+every text scoring mode.
+
+Also checks hashing artifacts (HashingVectorizer + SGDClassifier) the
+same way, that they score without their empty vocabulary and without
+scikit-learn (NumPy MurmurHash3), and runs the streaming trainer end to
+end on a small CSV.
+"""
+
+import sys
+import os
+import random
+import csv
+import json
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.utils import murmurhash3_32 as sklearn_murmurhash3_32
+from models.text_model import TextModel, export_text_model, murmurhash3_32
+from train import TRAINING_DATA
+
+TOLERANCE = 1e-6
+
+SETTINGS = {
+    'train_text_model.py': dict(stop_words='english', max_features=5000),
+    'train.py': dict(max_features=100, ngram_range=(1, 2)),
+    'trigrams, sublinear, l1': dict(ngram_range=(1, 3), sublinear_tf=True, norm='l1'),
+    'bigrams only, binary, no idf': dict(ngram_range=(2, 2), binary=True, use_idf=False, norm=None),
+    'case-sensitive, custom pattern': dict(lowercase=False, token_pattern=r"(?u)\b\w+\b"),
+}
+
+HASHING_SETTINGS = {
+    'train_text_model_streaming.py': dict(stop_words='english', ngram_range=(1, 2), n_features=2 ** 20),
+    'collisions (64 features)': dict(n_features=64),
+    'unsigned, binary, l1': dict(n_features=4096, alternate_sign=False, binary=True, norm='l1'),
+}
+
+EXTRA_TEXTS = [
+    "",
+    "the and of",  # stop words only
+    "Completely unseen vocabulary zyxwv qwerty",
+    "Ünïcödé façade naïve café — ÆØÅ straße",
+    "🚨🚨🚨 URGENT!!! 😱 click click click now now now",
+    "WORK FROM HOME work from home Work From Home",
+    "a b c d e f",  # single-letter tokens
+    " ".join(["guaranteed offer"] * 500),
+]
+
+
+def make_corpus():
+    rng = random.Random(7)
+    words = " ".join(text for text, _ in TRAINING_DATA).split()
+    texts = [text for text, _ in TRAINING_DATA]
+    labels = [label for _, label in TRAINING_DATA]
+    for i in range(400):
+        texts.append(" ".join(rng.choices(words, k=rng.randint(3, 30))))
+        labels.append(i % 2)
+    return texts, np.array(labels)
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<48} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def compare(label, expected, model, texts):
+    single = np.array([model.predict_proba([text])[0] for text in texts])
+    batch = model.predict_proba(texts)
+    error = max(np.abs(single - expected).max(), np.abs(batch - expected).max())
+    status = "ok" if error <= TOLERANCE else "FAIL"
+    print(f"{label:<48} max |diff| {error:.2e}  {status}")
+    return error <= TOLERANCE
+
+
+def main():
+    print("=" * 80)
+    print("NUMPY TEXT MODEL VS SCIKIT-LEARN")
+    print("=" * 80)
+
+    texts, labels = make_corpus()
+    queries = texts[:60] + EXTRA_TEXTS
+    workdir = tempfile.mkdtemp(prefix='text-model-test-')
+    failures = 0
+    try:
+        for name, params in SETTINGS.items():
+            vectorizer = TfidfVectorizer(**params)
+            classifier = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(texts), labels)
+            expected = classifier.predict_proba(vectorizer.transform(queries))[:, 1]
+
+            path = export_text_model(vectorizer, classifier, os.path.join(workdir, str(len(os.listdir(workdir)))))
+            failures += not compare(f"{name} (artifact)", expected, TextModel.load(path), queries)
+            failures += not compare(f"{name} (converted)", expected,
+                                    TextModel.from_sklearn(vectorizer, classifier), queries)
+
+        # Labels the other way round: risk is still P(label 1)
+        vectorizer = TfidfVectorizer()
+        classifier = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(texts), 1 - labels)
+        expected = classifier.predict_proba(vectorizer.transform(queries))[:, 0]
+        failures += not compare("classes [0, 1] fitted on flipped labels", 1 - expected,
+                                TextModel.from_sklearn(vectorizer, classifier), queries)
+
+        # Hashing artifacts
+        for name, params in HASHING_SETTINGS.items():
+            vectorizer = HashingVectorizer(**params)
+            classifier = SGDClassifier(loss='log_loss', random_state=0).fit(vectorizer.transform(texts), labels)
+            expected = classifier.predict_proba(vectorizer.transform(queries))[:, 1]
+            path = export_text_model(vectorizer, classifier, os.path.join(workdir, str(len(os.listdir(workdir)))))
+            failures += not compare(f"hashing: {name}", expected, TextModel.load(path), queries)
+
+        # Hashing artifacts never reach the (empty) vocabulary lookup
+        model = TextModel.load(path)
+        failures += not check("Empty vocabulary lookup finds nothing",
+                              model.lookup(['offer', 'now']).tolist() == [-1, -1])
+
+        def no_lookup(terms):
+            raise AssertionError("hashing artifact looked up its vocabulary")
+
+        model.lookup = no_lookup
+        try:
+            scored = np.allclose(model.predict_proba(queries), expected, atol=TOLERANCE)
+        except AssertionError:
+            scored = False
+        failures += not check("Hashing artifact scores without the vocabulary", scored)
+
+        # MurmurHash3 without scikit-learn
+        rng = random.Random(3)
+        alphabet = 'abcxyz 0é€🚨'
+        terms = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(20000)]
+        terms += [' '.join(rng.choices(texts[0].split(), k=400))]
+        hashes = murmurhash3_32(terms)
+        failures += not check("murmurhash3_32 equals scikit-learn's",
+                              hashes.tolist() == [sklearn_murmurhash3_32(term) for term in terms],
+                              f"({len(terms)} terms)")
+        script = ("import sys, json; sys.modules['sklearn'] = None; "
+                  "from models.text_model import TextModel; "
+                  f"print(json.dumps(TextModel.load({path!r}).predict_proba({queries!r}).tolist()))")
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        failures += not check("Hashing artifact scores without scikit-learn",
+                              result.returncode == 0 and np.allclose(json.loads(result.stdout), expected,
+                                                                     atol=TOLERANCE),
+                              result.stderr.strip().splitlines()[-1] if result.returncode else "")
+
+        # Streaming trainer, end to end
+        from train_text_model_streaming import train_streaming
+        csv_path = os.path.join(workdir, 'posts.csv')
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['text', 'label'])
+            writer.writerows(zip(texts, labels))
+            writer.writerow(['', 1])  # skipped: no text
+        model_dir = os.path.join(workdir, 'streaming')
+        path, metrics = train_streaming(csv_path, model_dir, epochs=2, chunk_size=50, n_features=2 ** 12,
+                                        shuffle_buffer=100)
+        model = TextModel.load(path)
+        probabilities = model.predict_proba(queries)
+        trained = (metrics['train_rows'] + metrics['heldout_rows'] == len(texts)
+                   and np.all((probabilities >= 0) & (probabilities <= 1)))
+        print(f"{'Streaming trainer exports a loadable artifact':<48} "
+              f"{metrics['train_rows']} train / {metrics['heldout_rows']} held out  {'ok' if trained else 'FAIL'}")
+        failures += not trained
+        print()
+
+        # Detector: batch scoring equals single-text scoring in every mode
+        from models.deception_detector import DeceptionDetector, TEXT_SCORING_MODES
+        vectorizer = TfidfVectorizer(**SETTINGS['train.py'])
+        classifier = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(texts), labels)
+        for mode in TEXT_SCORING_MODES:
+            detector = DeceptionDetector(text_scoring=mode)
+            detector.load_models()
+            detector.text_model = TextModel.from_sklearn(vectorizer, classifier)
+            single = [detector._analyze_text(text) for text in queries]
+            batch = list(detector._score_texts(queries))
+            mismatches = sum(a != b for a, b in zip(single, batch))
+            print(f"{'Detector, text_scoring=' + mode:<48} {mismatches} batch/single mismatches")
+            failures += mismatches > 0
+    finally:
+        shutil.rmtree(workdir)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: NumPy inference matches scikit-learn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check the text model hyperparameter search
+
+Checks that the TF-IDF matrices built from the cached counts equal those
+of a TfidfVectorizer fitted on the fold, then runs a small search,
+interrupts it (truncated trial log with a half-written last line), and
+checks that the rerun only fits the missing trials and ranks the same.
+"""
+
+import sys
+import os
+import csv
+import random
+import shutil
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from models.text_tuning import LOG_FILE, build_cache, load_cache, fold_features, search
+from train import TRAINING_DATA
+
+
+def write_corpus(path):
+    rng = random.Random(11)
+    words = " ".join(text for text, _ in TRAINING_DATA).split()
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['text', 'label'])
+        for text, label in TRAINING_DATA:
+            writer.writerow([text, label])
+        for i in range(300):
+            writer.writerow([" ".join(rng.choices(words, k=rng.randint(3, 30))), i % 2])
+    return [row for row in csv.DictReader(open(path, encoding='utf-8'))]
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def main():
+    print("=" * 80)
+    print("TEXT MODEL HYPERPARAMETER SEARCH")
+    print("=" * 80)
+    workdir = tempfile.mkdtemp(prefix='text-tuning-test-')
+    failures = 0
+    try:
+        csv_path = os.path.join(workdir, 'posts.csv')
+        texts = np.array([row['text'] for row in write_corpus(csv_path)], dtype=object)
+
+        # Cached counts give TfidfVectorizer's fold matrices
+        cache_dir = os.path.join(workdir, 'cache')
+        build_cache(csv_path, cache_dir, [(1, 1), (1, 2)], folds=3, seed=0)
+        for ngram_range in ((1, 1), (1, 2)):
+            counts, _, folds = load_cache(cache_dir, ngram_range)
+            for max_features in (None, 50, 400):
+                error = 0.0
+                for fold in range(3):
+                    train_rows, test_rows = folds != fold, folds == fold
+                    X_train, X_test = fold_features(counts, train_rows, test_rows, max_features)
+                    vectorizer = TfidfVectorizer(stop_words='english', ngram_range=ngram_range,
+                                                 max_features=max_features)
+                    expected_train = vectorizer.fit_transform(texts[train_rows])
+                    expected_test = vectorizer.transform(texts[test_rows])
+                    error = max(error, abs(X_train - expected_train).max(), abs(X_test - expected_test).max())
+                failures += not check(f"Fold matrices, ngram_range={ngram_range}, max_features={max_features}",
+                                      error < 1e-12, f"(max |diff| {error:.1e})")
+
+        # Resume after an interrupted search
+        out_dir = os.path.join(workdir, 'out')
+        grid = dict(max_features=[0, 100], ngram_ranges=[(1, 1), (1, 2)], Cs=[0.1, 1.0], folds=3, jobs=1)
+        rows, ran, _ = search(csv_path, out_dir, **grid)
+        log_path = os.path.join(out_dir, LOG_FILE)
+        with open(log_path) as f:
+            lines = f.readlines()
+        with open(log_path, 'w') as f:
+            f.writelines(lines[:10])
+            f.write(lines[10][:40])
+        resumed, ran_again, reused = search(csv_path, out_dir, **grid)
+        failures += not check("Resumed search fits only the missing trials", ran_again == ran - 10 and reused == 10,
+                              f"({ran_again} run, {reused} reused)")
+        strip = lambda table: [{k: v for k, v in row.items() if not k.startswith('seconds')} for row in table]
+        failures += not check("Resumed search ranks the same", strip(resumed) == strip(rows),
+                              f"(best: {rows[0]['max_features']}, {rows[0]['ngram_range']}, C={rows[0]['C']})")
+        _, ran_none, _ = search(csv_path, out_dir, **grid)
+        failures += not check("Finished search reruns nothing", ran_none == 0)
+    finally:
+        shutil.rmtree(workdir)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: cached fold vectorization matches TfidfVectorizer and searches resume")
+
+
+if __name__ == '__main__':
+    main()
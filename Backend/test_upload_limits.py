@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Check header-only upload validation and the memory it bounds
+
+Sends uploads that must be rejected from their header alone (a PNG
+decompression bomb, a disallowed format or extension, too many frames,
+an oversized text field) and checks the status codes. Then measures the
+peak RSS growth of single requests in fresh processes: a decompression
+bomb is rejected without allocating its pixels, a large JPEG is accepted
+and downscaled on decode, and the same bomb with the pixel budget lifted
+shows the allocation the check prevents. Finally checks that large
+uploads are spooled to a temporary file.
+"""
+
+import sys
+import os
+import io
+import json
+import zlib
+import base64
+import struct
+import resource
+import tempfile
+import subprocess
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+workdir = tempfile.mkdtemp(prefix='upload-test-')
+os.environ['DATABASE_URL'] = f"sqlite:///{workdir}/history.db"
+
+BOMB_SIDE = 8000  # 64M pixels: below Pillow's own bomb warning, far above MAX_IMAGE_PIXELS
+JPEG_SIDE = 6000  # 36M pixels: above MAX_IMAGE_PIXELS, but a JPEG is decoded at 1/8 scale
+
+# Peak RSS growth allowed for one request
+REJECTED_GROWTH_MB = 16
+DOWNSCALED_GROWTH_MB = 64
+
+
+def check(label, passed, detail=""):
+    print(f"{label:<60} {'ok' if passed else 'FAIL'} {detail}")
+    return passed
+
+
+def png_bomb(path, side):
+    """Write a black grayscale PNG, compressing rows as they are generated"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    compressor = zlib.compressobj(9)
+    row = b'\x00' * (side + 1)  # filter byte and one byte per pixel
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', side, side, 8, 0, 0, 0, 0)))
+        data = b''.join(compressor.compress(row) for _ in range(side)) + compressor.flush()
+        f.write(chunk(b'IDAT', data) + chunk(b'IEND', b''))
+
+
+def jpeg(side):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.linear_gradient('L').resize((side, side)).convert('RGB').save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def measure(path, filename):
+    """
+    Peak RSS growth (MB) and status of one POST /api/analyze of the file,
+    in a fresh process warmed up with a small image
+    """
+    from app import app, detector
+    detector.wait_until_ready()
+    client = app.test_client()
+    client.post('/api/analyze', data={'text': 'Warm-up post', 'image': (io.BytesIO(jpeg(64)), 'warm.jpg')})
+    with open(path, 'rb') as f:
+        data = f.read()
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    response = client.post('/api/analyze', data={'text': 'Upload limit check',
+                                                 'image': (io.BytesIO(data), filename)})
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return response.status_code, (after - before) / 1024
+
+
+def measure_in_subprocess(path, filename, environment=None):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--measure', path, filename],
+                            env={**os.environ, **(environment or {})}, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    print("=" * 80)
+    print("UPLOAD VALIDATION")
+    print("=" * 80)
+    failures = 0
+
+    bomb_path = os.path.join(workdir, 'bomb.png')
+    png_bomb(bomb_path, BOMB_SIDE)
+    large_jpeg_path = os.path.join(workdir, 'large.jpg')
+    with open(large_jpeg_path, 'wb') as f:
+        f.write(jpeg(JPEG_SIDE))
+
+    from PIL import Image
+    from app import app, detector
+    from models.deception_detector import score_image
+    detector.wait_until_ready()
+    client = app.test_client()
+
+    def post(data, filename):
+        return client.post('/api/analyze', data={'text': 'Upload limit check',
+                                                 'image': (io.BytesIO(data), filename)})
+
+    # Rejected from the header
+    with open(bomb_path, 'rb') as f:
+        bomb = f.read()
+    response = post(bomb, 'bomb.png')
+    failures += not check("Decompression bomb rejected", response.status_code == 413,
+                          f"({len(bomb) // 1024} KB file, {BOMB_SIDE}x{BOMB_SIDE})")
+    bmp = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(bmp, 'BMP')
+    failures += not check("Disallowed format rejected", post(bmp.getvalue(), 'image.png').status_code == 415)
+    failures += not check("Disallowed extension rejected", post(jpeg(64), 'image.bmp').status_code == 415)
+    failures += not check("Non-image rejected", post(b'not an image', 'image.jpg').status_code == 415)
+    frames = io.BytesIO()
+    Image.new('L', (4, 4)).save(frames, 'GIF', save_all=True,
+                                append_images=[Image.new('L', (4, 4), 50 * i) for i in range(1, 5)])
+    max_frames = app.config['MAX_IMAGE_FRAMES']
+    app.config['MAX_IMAGE_FRAMES'] = 3
+    failures += not check("Too many frames rejected", post(frames.getvalue(), 'anim.gif').status_code == 413)
+    app.config['MAX_IMAGE_FRAMES'] = max_frames
+    failures += not check("Oversized text field rejected", client.post(
+        '/api/analyze', data={'text': 'x' * (app.config['MAX_FORM_MEMORY_SIZE'] + 1)},
+        content_type='multipart/form-data').status_code == 413)
+    failures += not check("Large JPEG accepted", post(jpeg(JPEG_SIDE), 'large.jpg').status_code == 200)
+    failures += not check("Batch item with a bomb fails alone", [
+        'error' in json.loads(line) for line in client.post('/api/analyze/batch', data='\n'.join(
+            json.dumps(item) for item in [{'text': 'Batch bomb', 'imageBase64': base64.b64encode(bomb).decode()},
+                                          {'text': 'Batch fine'}]),
+            content_type='application/x-ndjson').get_data(as_text=True).splitlines()] == [True, False])
+    failures += not check("score_image does not decode past its budget",
+                          score_image(io.BytesIO(bomb), max_pixels=1024 * 1024)[1] is None)
+
+    # Large uploads are spooled to disk
+    with app.test_request_context('/api/analyze', method='POST', data={
+            'text': 'Spool check', 'small': (io.BytesIO(b'x' * 1024), 'small.jpg'),
+            'large': (io.BytesIO(b'x' * (app.config['UPLOAD_SPOOL_SIZE'] + 1)), 'large.jpg')}):
+        from flask import request
+        failures += not check("Large upload spooled to a temporary file",
+                              request.files['large'].stream._rolled and not request.files['small'].stream._rolled)
+
+    # Peak memory of single requests
+    print()
+    print(f"{'Request':<44} {'status':>6} {'peak RSS growth':>16}")
+    print("-" * 68)
+    measured = {}
+    for name, path, filename, environment in [
+            ("PNG bomb", bomb_path, 'bomb.png', None),
+            (f"{JPEG_SIDE}x{JPEG_SIDE} JPEG", large_jpeg_path, 'large.jpg', None),
+            ("PNG bomb, MAX_IMAGE_PIXELS lifted", bomb_path, 'bomb.png', {'MAX_IMAGE_PIXELS': str(10 ** 9)})]:
+        measured[name] = measure_in_subprocess(path, filename, environment)
+        print(f"{name:<44} {measured[name]['status']:>6} {measured[name]['growth_mb']:>13.1f} MB")
+    print()
+    bomb_run = measured["PNG bomb"]
+    jpeg_run = measured[f"{JPEG_SIDE}x{JPEG_SIDE} JPEG"]
+    unguarded = measured["PNG bomb, MAX_IMAGE_PIXELS lifted"]
+    failures += not check("Bomb rejected without allocating its pixels",
+                          bomb_run['status'] == 413 and bomb_run['growth_mb'] < REJECTED_GROWTH_MB)
+    failures += not check("Large JPEG analyzed within the memory bound",
+                          jpeg_run['status'] == 200 and jpeg_run['growth_mb'] < DOWNSCALED_GROWTH_MB)
+    failures += not check("Lifting the budget decodes the bomb",
+                          unguarded['growth_mb'] > BOMB_SIDE * BOMB_SIDE / 2 ** 20)
+
+    print()
+    if failures:
+        print(f"FAILED: {failures} checks")
+        sys.exit(1)
+    print("PASSED: uploads are validated from their header and request memory stays bounded")
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        status, growth = measure(sys.argv[2], sys.argv[3])
+        print(json.dumps({'status': status, 'growth_mb': growth}))
+    else:
+        try:
+            main()
+        finally:
+            import shutil
+            shutil.rmtree(workdir, ignore_errors=True)
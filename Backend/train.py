@@ -1,18 +1,22 @@
 """
 Model training script for deception detection system
-Trains text and image models using synthetic data
+Trains the text model on synthetic data and the image model on the image datasets
 """
 
 import os
-import pickle
 import numpy as np
 from pathlib import Path
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split, GroupShuffleSplit
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 from config import MODEL_DIR
+from models.text_model import export_text_model
+from models.image_model import ImageModel, IMAGE_MODEL_FILE
+from models.image_feature_cache import ImageFeatureCache, CACHE_FILE
+from build_image_index import DEFAULT_DIRS, iter_images
 
 # Training data (synthetic dataset for demonstration)
 TRAINING_DATA = [
@@ -75,55 +79,88 @@ def train_text_model():
     model_dir = MODEL_DIR
     os.makedirs(model_dir, exist_ok=True)
     
-    # Save vectorizer
-    vectorizer = pipeline.named_steps['tfidf']
-    vectorizer_path = os.path.join(model_dir, 'vectorizer.pkl')
-    with open(vectorizer_path, 'wb') as f:
-        pickle.dump(vectorizer, f)
-    print(f"  Saved vectorizer to {vectorizer_path}")
-    
-    # Save classifier
-    classifier = pipeline.named_steps['classifier']
-    classifier_path = os.path.join(model_dir, 'text_classifier.pkl')
-    with open(classifier_path, 'wb') as f:
-        pickle.dump(classifier, f)
-    print(f"  Saved model to {classifier_path}")
+    # Save vectorizer and classifier as one memory-mappable artifact
+    artifact_path = export_text_model(
+        pipeline.named_steps['tfidf'],
+        pipeline.named_steps['classifier'],
+        model_dir,
+        metrics={'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1': f1}
+    )
+    print(f"  Saved text model to {artifact_path}")
     
     return pipeline
 
-def train_image_model():
+def train_image_model(directories=None):
     """
     Train image deception detection model
     
-    Note: This is a placeholder. In production, you would:
-    1. Use a pre-trained ResNet50 from torchvision
-    2. Fine-tune on labeled deepfake/manipulated image dataset
-    3. Save the model weights
-    
-    For now, we'll create a simple classifier
+    Fits a standardized logistic regression on the image model features of
+    final datasets/{fake,real} (label 1 = fake), read from the image feature
+    cache (see extract_image_features.py; only new or changed files are
+    decoded). The datasets hold several augmented copies of each source
+    image (name.rf.<hash>.jpg), so the test split keeps all copies of a
+    source image on the same side.
     """
-    print("Image model training (note: using synthetic rules)...")
+    print("Training image model...")
     
-    # In a real implementation, this would be a CNN or transfer learning model
-    # For now, we'll save a simple object indicating model is available
-    
-    model_info = {
-        'type': 'ResNet50-Transfer',
-        'pretrained': True,
-        'num_classes': 2,
-        'input_size': 224,
-        'note': 'Placeholder for pre-trained image model'
-    }
+    paths = list(iter_images(directories or DEFAULT_DIRS))
+    if not paths:
+        print("  No images found; skipping (image scoring stays rule-based)")
+        return None
     
     model_dir = MODEL_DIR
     os.makedirs(model_dir, exist_ok=True)
     
-    image_model_path = os.path.join(model_dir, 'image_classifier.pkl')
-    with open(image_model_path, 'wb') as f:
-        pickle.dump(model_info, f)
+    # Features from the cache
+    cache_path = os.path.join(model_dir, CACHE_FILE)
+    cache = ImageFeatureCache.load(cache_path)
+    stats = cache.update(paths)
+    cache.save(cache_path)
+    print(f"  Features for {stats['files']} images ({stats['extracted']} extracted, "
+          f"{stats['files'] - stats['extracted']} from cache)")
+    
+    columns = cache.features_for(paths)
+    valid = columns['valid']
+    features = columns['model_features'][valid]
+    labels = np.array([os.path.basename(os.path.dirname(path)) == 'fake' for path in paths], dtype=int)[valid]
+    groups = np.array([os.path.basename(path).split('.rf.')[0] for path in paths])[valid]
+    
+    # Split by source image
+    splitter = GroupShuffleSplit(n_splits=1, test_size=0.2, random_state=42)
+    train_rows, test_rows = next(splitter.split(features, labels, groups))
+    
+    scaler = StandardScaler().fit(features[train_rows])
+    classifier = LogisticRegression(C=1.0, max_iter=2000, random_state=42)
+    classifier.fit(scaler.transform(features[train_rows]), labels[train_rows])
+    
+    # Evaluate
+    y_test = labels[test_rows]
+    probabilities = classifier.predict_proba(scaler.transform(features[test_rows]))[:, 1]
+    y_pred = (probabilities >= 0.5).astype(int)
+    metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred, zero_division=0),
+        'recall': recall_score(y_test, y_pred, zero_division=0),
+        'f1': f1_score(y_test, y_pred, zero_division=0),
+        'roc_auc': roc_auc_score(y_test, probabilities),
+        'train_images': int(len(train_rows)),
+        'test_images': int(len(test_rows)),
+    }
+    
+    print(f"  Train/test images: {len(train_rows)}/{len(test_rows)}")
+    print(f"  Accuracy:  {metrics['accuracy']:.2%}")
+    print(f"  Precision: {metrics['precision']:.2%}")
+    print(f"  Recall:    {metrics['recall']:.2%}")
+    print(f"  F1-Score:  {metrics['f1']:.2%}")
+    print(f"  ROC AUC:   {metrics['roc_auc']:.3f}")
+    
+    # Save model
+    model = ImageModel.from_sklearn(scaler, classifier, metrics)
+    image_model_path = os.path.join(model_dir, IMAGE_MODEL_FILE)
+    model.save(image_model_path)
+    print(f"  Saved image model to {image_model_path}")
     
-    print(f"  Saved image model info to {image_model_path}")
-    print(f"  (In production, this would be a fine-tuned ResNet50)")
+    return model
 
 def main():
     """Main training function"""
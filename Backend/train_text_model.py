@@ -3,8 +3,8 @@ from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import accuracy_score, classification_report
-import pickle
 import os
+from models.text_model import export_text_model
 
 # -----------------------------------------
 # 1. LOAD DATASET
@@ -47,21 +47,15 @@ pred = model.predict(X_test_vec)
 print("\nAccuracy:", accuracy_score(y_test, pred))
 print("\nClassification Report:\n", classification_report(y_test, pred))
 
- # -----------------------------------------
+# -----------------------------------------
 # 6. SAVE MODEL
 # -----------------------------------------
-# Save to Backend/models/ for backend usage
+# Save to Backend/models/ for backend usage, as a memory-mappable artifact
+# (see models/text_model.py) that every worker process shares
 models_dir = os.path.join(os.path.dirname(__file__), 'models')
-os.makedirs(models_dir, exist_ok=True)
-with open(os.path.join(models_dir, "text_classifier.pkl"), "wb") as f:
-    pickle.dump(model, f)
-with open(os.path.join(models_dir, "vectorizer.pkl"), "wb") as f:
-    pickle.dump(vectorizer, f)
-
-print("\nModel saved as models/text_classifier.pkl")
-print("Vectorizer saved as models/vectorizer.pkl")
-with open(os.path.join(models_dir, "vectorizer.pkl"), "wb") as f:
-    pickle.dump(vectorizer, f)
+artifact_path = export_text_model(
+    vectorizer, model, models_dir,
+    metrics={'accuracy': float(accuracy_score(y_test, pred)), 'train_rows': int(len(X_train))}
+)
 
-print("\nModel saved as models/text_classifier.pkl")
-print("Vectorizer saved as models/vectorizer.pkl")
+print("\nModel saved as", os.path.relpath(artifact_path, os.path.dirname(__file__) or '.'))
@@ -0,0 +1,192 @@
+"""
+Out-of-core text model training
+
+Trains the text model on a labelled CSV (text and label columns, label
+1 = deceptive) of any size with bounded memory. Nothing is held per row
+or per term:
+
+- the CSV is read row by row and processed in chunks of --chunk-size rows
+- a HashingVectorizer maps terms to a fixed number of columns
+  (--n-features), so there is no vocabulary to build or keep
+- an SGDClassifier (logistic loss) is updated with partial_fit, one chunk
+  at a time, over several epochs
+- a shuffle buffer of --shuffle-buffer rows mixes rows across chunks, so
+  a CSV grouped by label still gives SGD mixed chunks (it cannot undo an
+  ordering longer than the buffer)
+
+A fixed share of the rows (--holdout, chosen by a hash of the text, so
+duplicate texts are always on the same side) is never trained on and is
+streamed through the model after every epoch for accuracy, precision,
+recall, F1 and log loss. The result is exported as the same text model
+artifact train_text_model.py writes (see models/text_model.py), and
+text_model.current is switched to it.
+
+Usage:
+    python train_text_model_streaming.py [--epochs N] [--chunk-size N] [csv_path]
+"""
+
+import os
+import csv
+import sys
+import time
+import hashlib
+import argparse
+import itertools
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from config import MODEL_DIR
+from models.text_model import export_text_model
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CSV = os.path.join(BASE_DIR, 'final datasets', 'final_master_dataset.csv')
+CLASSES = np.array([0, 1])
+
+
+def iter_rows(path):
+    """
+    Yield (text, label) from a CSV with text and label columns
+
+    Rows with an empty text or a label other than 0 or 1 are skipped.
+    """
+    # Texts can be longer than the csv module's default field limit
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            text, label = row.get('text'), (row.get('label') or '').strip()
+            if text and text.strip() and label in ('0', '1', '0.0', '1.0'):
+                yield text, int(float(label))
+
+
+def is_held_out(text, holdout):
+    """Stable assignment of a text to the held-out share"""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') / 2 ** 64 < holdout
+
+
+def shuffled(rows, buffer_size, rng):
+    """Approximately shuffle a stream by swapping through a bounded buffer"""
+    buffer = []
+    for row in rows:
+        if len(buffer) < buffer_size:
+            buffer.append(row)
+            continue
+        i = rng.integers(buffer_size)
+        yield buffer[i]
+        buffer[i] = row
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def chunks(rows, size):
+    """Lists of up to size rows"""
+    rows = iter(rows)
+    while chunk := list(itertools.islice(rows, size)):
+        yield chunk
+
+
+def evaluate(vectorizer, classifier, path, holdout, chunk_size):
+    """
+    Stream the held-out rows through the model
+
+    Returns:
+        dict: accuracy, precision, recall, f1, log_loss and rows
+    """
+    tp = fp = tn = fn = 0
+    log_loss = 0.0
+    held_out = (row for row in iter_rows(path) if is_held_out(row[0], holdout))
+    for chunk in chunks(held_out, chunk_size):
+        texts, labels = zip(*chunk)
+        labels = np.array(labels)
+        probabilities = classifier.predict_proba(vectorizer.transform(texts))[:, 1]
+        predictions = probabilities >= 0.5
+        tp += int(np.sum(predictions & (labels == 1)))
+        fp += int(np.sum(predictions & (labels == 0)))
+        tn += int(np.sum(~predictions & (labels == 0)))
+        fn += int(np.sum(~predictions & (labels == 1)))
+        p = np.clip(probabilities, 1e-15, 1 - 1e-15)
+        log_loss -= float(np.sum(labels * np.log(p) + (1 - labels) * np.log(1 - p)))
+
+    rows = tp + fp + tn + fn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'accuracy': (tp + tn) / rows if rows else 0.0,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'log_loss': log_loss / rows if rows else 0.0,
+        'rows': rows,
+    }
+
+
+def train_streaming(path, model_dir=MODEL_DIR, epochs=5, chunk_size=10000, n_features=2 ** 20,
+                    holdout=0.1, alpha=1e-6, shuffle_buffer=50000, seed=42):
+    """
+    Train and export a text model without loading the CSV into memory
+
+    Returns:
+        tuple: (artifact path, metrics of the last epoch)
+    """
+    vectorizer = HashingVectorizer(stop_words='english', ngram_range=(1, 2), n_features=n_features)
+    classifier = SGDClassifier(loss='log_loss', alpha=alpha, random_state=seed)
+    rng = np.random.default_rng(seed)
+
+    metrics = {}
+    for epoch in range(1, epochs + 1):
+        start = time.perf_counter()
+        train_rows = 0
+        training = (row for row in iter_rows(path) if not is_held_out(row[0], holdout))
+        for chunk in chunks(shuffled(training, shuffle_buffer, rng), chunk_size):
+            texts, labels = zip(*chunk)
+            classifier.partial_fit(vectorizer.transform(texts), np.array(labels), classes=CLASSES)
+            train_rows += len(chunk)
+        if not train_rows:
+            raise ValueError(f"No labelled rows in {path}")
+
+        metrics = evaluate(vectorizer, classifier, path, holdout, chunk_size)
+        print(f"  Epoch {epoch}/{epochs}: {train_rows} rows in {time.perf_counter() - start:.1f}s; "
+              f"held-out accuracy {metrics['accuracy']:.2%}, F1 {metrics['f1']:.2%}, "
+              f"log loss {metrics['log_loss']:.4f} ({metrics['rows']} rows)")
+
+    metrics = {
+        'accuracy': metrics['accuracy'],
+        'precision': metrics['precision'],
+        'recall': metrics['recall'],
+        'f1': metrics['f1'],
+        'log_loss': metrics['log_loss'],
+        'train_rows': train_rows,
+        'heldout_rows': metrics['rows'],
+        'epochs': epochs,
+        'trainer': 'streaming',
+    }
+    return export_text_model(vectorizer, classifier, model_dir, metrics=metrics), metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default=DEFAULT_CSV)
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--chunk-size', type=int, default=10000, help='rows per partial_fit call')
+    parser.add_argument('--n-features', type=int, default=2 ** 20, help='hashed feature columns')
+    parser.add_argument('--holdout', type=float, default=0.1, help='share of rows held out for evaluation')
+    parser.add_argument('--alpha', type=float, default=1e-6, help='L2 regularization strength')
+    parser.add_argument('--shuffle-buffer', type=int, default=50000, help='rows in the shuffle buffer')
+    parser.add_argument('--model-dir', default=MODEL_DIR)
+    args = parser.parse_args()
+
+    print(f"Streaming training on {args.csv_path}...")
+    artifact_path, metrics = train_streaming(
+        args.csv_path, args.model_dir, epochs=args.epochs, chunk_size=args.chunk_size,
+        n_features=args.n_features, holdout=args.holdout, alpha=args.alpha,
+        shuffle_buffer=args.shuffle_buffer
+    )
+    print(f"  Accuracy:  {metrics['accuracy']:.2%}")
+    print(f"  Precision: {metrics['precision']:.2%}")
+    print(f"  Recall:    {metrics['recall']:.2%}")
+    print(f"  F1-Score:  {metrics['f1']:.2%}")
+    print(f"Model saved as {os.path.relpath(artifact_path, BASE_DIR)}")
+
+
+if __name__ == '__main__':
+    main()
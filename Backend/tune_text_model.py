@@ -0,0 +1,69 @@
+"""
+Cross-validated hyperparameter search for the text model
+
+Searches max_features, ngram_range and the regularization strength C of
+the TF-IDF + logistic regression text model (train_text_model.py) with
+stratified k-fold cross-validation on a labelled CSV (text and label
+columns). The corpus is tokenized once per ngram_range and the count
+matrices are cached on disk, so a trial only slices cached counts and
+fits a classifier (see models/text_tuning.py).
+
+Trials run in parallel with joblib (--jobs, default one per core). Each
+finished trial is appended to a JSON-lines trial log, so an interrupted
+search resumes where it stopped: rerunning the same command skips
+logged trials. The ranked results go to results.csv, next to the log.
+
+Usage:
+    python tune_text_model.py [--folds 5] [--jobs N] [--C 0.1 1 10] [csv_path]
+"""
+
+import os
+import time
+import argparse
+from config import MODEL_DIR
+from train_text_model_streaming import DEFAULT_CSV
+from models.text_tuning import METRICS, RESULTS_FILE, search
+
+
+def parse_ngram(value):
+    low, high = (int(part) for part in value.split(','))
+    return (low, high)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('csv_path', nargs='?', default=DEFAULT_CSV)
+    parser.add_argument('--max-features', type=int, nargs='+', default=[5000, 20000, 0],
+                        help='vocabulary sizes to try (0 keeps every term)')
+    parser.add_argument('--ngram', type=parse_ngram, nargs='+', default=[(1, 1), (1, 2)],
+                        help='ngram ranges to try, as low,high')
+    parser.add_argument('--C', type=float, nargs='+', default=[0.1, 1.0, 10.0],
+                        help='inverse regularization strengths to try')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel fits (default: one per core)')
+    parser.add_argument('--metric', choices=METRICS, default='f1', help='metric to rank by')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=os.path.join(MODEL_DIR, 'tuning'),
+                        help='directory for the cache, trial log and results')
+    args = parser.parse_args()
+
+    print(f"Tuning the text model on {args.csv_path}...")
+    start = time.perf_counter()
+    rows, ran, reused = search(args.csv_path, args.out, args.max_features, args.ngram, args.C,
+                               folds=args.folds, jobs=args.jobs, seed=args.seed, metric=args.metric)
+    print(f"  {ran} trials in {time.perf_counter() - start:.1f}s ({reused} reused from the log)")
+    print()
+
+    print(f"{'Rank':>4} {'max_features':>12} {'ngram':>6} {'C':>7} "
+          + ' '.join(f"{name:>15}" for name in METRICS))
+    print("-" * (33 + 16 * len(METRICS)))
+    for row in rows[:20]:
+        print(f"{row['rank']:>4} {row['max_features'] or 'all':>12} {'-'.join(map(str, row['ngram_range'])):>6} "
+              f"{row['C']:>7g} " + ' '.join(f"{row[name + '_mean']:>8.4f}±{row[name + '_std']:.4f}"
+                                            for name in METRICS))
+    print()
+    print(f"Results saved to {os.path.join(args.out, RESULTS_FILE)}")
+
+
+if __name__ == '__main__':
+    main()